@@ -0,0 +1,195 @@
+import os
+import math
+import time
+import asyncio
+import threading
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Callable, Optional
+from starlette.responses import StreamingResponse
+from api.metrics_utils import (
+    ADMISSION_IN_FLIGHT, ADMISSION_QUEUE_DEPTH, ADMISSION_WAIT_SECONDS, ADMISSION_REJECTED
+)
+
+# Chat requests answered at once; the rest wait in a bounded queue
+CHAT_MAX_CONCURRENCY = int(os.getenv("CHAT_MAX_CONCURRENCY", "16"))
+# Chat requests allowed to wait for a slot; beyond this they get a 503 at once
+CHAT_QUEUE_SIZE = int(os.getenv("CHAT_QUEUE_SIZE", "64"))
+# Longest a chat request waits for a slot before getting a 503, in seconds
+CHAT_QUEUE_TIMEOUT = float(os.getenv("CHAT_QUEUE_TIMEOUT", "15"))
+# Token buckets (sustained requests per minute and burst); a rate of 0 disables the limit.
+# Clients are told apart by address, so behind a proxy raise or disable the client limits.
+CHAT_SESSION_RATE_PER_MINUTE = float(os.getenv("CHAT_SESSION_RATE_PER_MINUTE", "20"))
+CHAT_SESSION_BURST = int(os.getenv("CHAT_SESSION_BURST", "5"))
+CHAT_CLIENT_RATE_PER_MINUTE = float(os.getenv("CHAT_CLIENT_RATE_PER_MINUTE", "120"))
+CHAT_CLIENT_BURST = int(os.getenv("CHAT_CLIENT_BURST", "20"))
+# Files uploaded per minute by one client
+UPLOAD_CLIENT_RATE_PER_MINUTE = float(os.getenv("UPLOAD_CLIENT_RATE_PER_MINUTE", "60"))
+UPLOAD_CLIENT_BURST = int(os.getenv("UPLOAD_CLIENT_BURST", "20"))
+
+
+class Overloaded(RuntimeError):
+    """Raised when a request can't get a slot: the queue is full or the wait timed out."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class RateLimited(RuntimeError):
+    """Raised when a session or client has used up its token bucket."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Caps the requests of one kind served at once, with a bounded FIFO queue
+    in front. Slots are handed straight to the next waiter on release, so a
+    burst can't overtake requests that are already queued.
+
+    Used from the event loop only, so it needs no locking.
+    """
+
+    def __init__(self, name: str, concurrency: int, queue_size: int, queue_timeout: float):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._waiters = deque()
+        # Moving average of how long a slot is held, to suggest a Retry-After
+        self._hold_seconds = 1.0
+        ADMISSION_IN_FLIGHT.labels(name).set_function(lambda: self.active)
+        ADMISSION_QUEUE_DEPTH.labels(name).set_function(lambda: len(self._waiters))
+
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self._hold_seconds * (len(self._waiters) + 1) / self.concurrency))
+
+    async def _acquire(self):
+        if self.active < self.concurrency and not self._waiters:
+            self.active += 1
+            ADMISSION_WAIT_SECONDS.labels(self.name).observe(0)
+            return
+        if len(self._waiters) >= self.queue_size:
+            ADMISSION_REJECTED.labels(self.name, "queue_full").inc()
+            raise Overloaded(f"Too many {self.name} requests queued.", self.retry_after())
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as the wait ended
+                self._release()
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                ADMISSION_REJECTED.labels(self.name, "queue_timeout").inc()
+                raise Overloaded(f"Timed out waiting for a {self.name} slot.", self.retry_after())
+            raise
+        ADMISSION_WAIT_SECONDS.labels(self.name).observe(time.perf_counter() - start)
+
+    def _release(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    async def acquire(self) -> Callable[[], None]:
+        """Waits for a slot (raising Overloaded if it can't get one) and returns
+        the function that gives it back; calling that more than once is harmless."""
+        await self._acquire()
+        start = time.perf_counter()
+        released = False
+
+        def release():
+            nonlocal released
+            if not released:
+                released = True
+                self._hold_seconds = 0.9 * self._hold_seconds + 0.1 * (time.perf_counter() - start)
+                self._release()
+        return release
+
+    @asynccontextmanager
+    async def slot(self):
+        release = await self.acquire()
+        try:
+            yield
+        finally:
+            release()
+
+    def stats(self) -> dict:
+        return {"in_flight": self.active, "queued": len(self._waiters),
+                "concurrency": self.concurrency, "queue_size": self.queue_size}
+
+
+class RateLimiter:
+    """Token buckets keyed by session or client: each holds up to `burst`
+    tokens and refills at `rate_per_minute`. Least recently seen keys are
+    dropped past `max_keys`, which only resets them to a full bucket."""
+
+    def __init__(self, name: str, rate_per_minute: float, burst: int, max_keys: int = 100_000):
+        self.name = name
+        self.rate = rate_per_minute / 60
+        self.burst = max(1, burst)
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, key: str, cost: int = 1):
+        """Takes `cost` tokens (at most a full bucket) from `key`'s bucket or raises RateLimited."""
+        if self.rate <= 0:
+            return
+        cost = min(cost, self.burst)
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        if not allowed:
+            ADMISSION_REJECTED.labels(self.name, "rate_limited").inc()
+            retry_after = max(1, math.ceil((cost - tokens) / self.rate))
+            raise RateLimited(f"Rate limit exceeded, retry in {retry_after}s.", retry_after)
+
+
+class SlotStreamingResponse(StreamingResponse):
+    """StreamingResponse that gives back an admission slot (`release`) once it
+    has been sent, even if the client went away before the body was started."""
+
+    def __init__(self, content, release: Callable[[], None], **kwargs):
+        super().__init__(content, **kwargs)
+        self.release = release
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.release()
+
+
+def upstream_retry_after(exc: Exception) -> Optional[int]:
+    """Seconds to suggest to the client if `exc` is Groq still rate limiting
+    or overloaded after our retries (see llm_registry), else None."""
+    if getattr(exc, "status_code", None) not in (429, 503):
+        return None
+    response = getattr(exc, "response", None)
+    try:
+        return max(1, math.ceil(float(response.headers["retry-after"])))
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return 5
+
+
+chat_admission = AdmissionController("chat", CHAT_MAX_CONCURRENCY, CHAT_QUEUE_SIZE, CHAT_QUEUE_TIMEOUT)
+chat_session_limiter = RateLimiter("chat_session", CHAT_SESSION_RATE_PER_MINUTE, CHAT_SESSION_BURST)
+chat_client_limiter = RateLimiter("chat_client", CHAT_CLIENT_RATE_PER_MINUTE, CHAT_CLIENT_BURST)
+upload_client_limiter = RateLimiter("upload_client", UPLOAD_CLIENT_RATE_PER_MINUTE, UPLOAD_CLIENT_BURST)
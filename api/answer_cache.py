@@ -0,0 +1,128 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Iterable, List, Optional
+import numpy as np
+
+ANSWER_CACHE_ENABLED = os.getenv(
+    "ANSWER_CACHE_ENABLED", "true").lower() == "true"
+# Minimum cosine similarity between standalone questions for a cache hit
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000"))
+
+
+class SemanticAnswerCache:
+    """In-memory cache of answers keyed by question embedding similarity.
+
+    Entries remember which `file_id`s their context came from so they can be
+    dropped when one of those documents is deleted or re-indexed. Expired
+    entries (TTL) are skipped and purged lazily; beyond `max_entries` the
+    least recently used entry is evicted.
+    """
+
+    def __init__(self, threshold: float = ANSWER_CACHE_THRESHOLD, ttl: float = ANSWER_CACHE_TTL,
+                 max_entries: int = ANSWER_CACHE_MAX_ENTRIES):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._next_key = 0
+        # Stacked unit vectors of all entries, rebuilt lazily after changes
+        self._matrix = None
+        self._matrix_keys = []
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _purge_expired(self):
+        cutoff = time.time() - self.ttl
+        expired = [key for key, entry in self._entries.items()
+                   if entry["created_at"] < cutoff]
+        for key in expired:
+            del self._entries[key]
+        if expired:
+            self.evictions += len(expired)
+            self._matrix = None
+
+    def lookup(self, vector, model: str) -> Optional[dict]:
+        """Returns the best entry for `model` above the similarity threshold, if any."""
+        query = self._normalize(vector)
+        with self._lock:
+            self._purge_expired()
+            if self._entries and self._matrix is None:
+                self._matrix_keys = list(self._entries)
+                self._matrix = np.stack(
+                    [self._entries[key]["vector"] for key in self._matrix_keys])
+
+            best = None
+            if self._entries:
+                scores = self._matrix @ query
+                for index in np.argsort(-scores):
+                    if scores[index] < self.threshold:
+                        break
+                    entry = self._entries[self._matrix_keys[index]]
+                    if entry["model"] == model:
+                        best = self._matrix_keys[index]
+                        break
+
+            if best is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(best)
+            return self._entries[best]
+
+    def store(self, vector, model: str, answer: str, context: List, file_ids: Iterable[int]):
+        with self._lock:
+            self._entries[self._next_key] = {
+                "vector": self._normalize(vector),
+                "model": model,
+                "answer": answer,
+                "context": context,
+                "file_ids": set(file_ids),
+                "created_at": time.time(),
+            }
+            self._next_key += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            self._matrix = None
+
+    def invalidate_file_ids(self, file_ids: Iterable[int]):
+        """Drops every entry whose answer was built from any of `file_ids`."""
+        file_ids = set(file_ids)
+        with self._lock:
+            stale = [key for key, entry in self._entries.items()
+                     if entry["file_ids"] & file_ids]
+            for key in stale:
+                del self._entries[key]
+            if stale:
+                self.invalidations += len(stale)
+                self._matrix = None
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": ANSWER_CACHE_ENABLED,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+        }
+
+
+answer_cache = SemanticAnswerCache()
@@ -0,0 +1,139 @@
+import os
+import re
+import math
+from collections import Counter
+from typing import Iterable, List, Tuple
+from api.sqlite_pool import SQLitePool
+
+BM25_INDEX_PATH = os.getenv("BM25_INDEX_PATH", "bm25_index.db")
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+
+# Identifiers like "PN-4821-B", "7.3.2" or "max_load" are kept whole (and also
+# split into their parts) so exact part numbers and clause ids match
+_TOKEN = re.compile(r"[a-z0-9]+(?:[-_./][a-z0-9]+)*")
+_PART = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have how in is it its of on or that the "
+    "this to was were what when where which who why will with".split())
+
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for match in _TOKEN.finditer(text.lower()):
+        token = match.group()
+        parts = _PART.findall(token)
+        if len(parts) > 1:
+            tokens.append(token)
+        tokens.extend(part for part in parts if part not in _STOPWORDS)
+    return tokens
+
+
+class BM25Index:
+    """Persistent BM25 inverted index over chunk texts, stored in SQLite.
+
+    Postings are keyed by the same chunk ids as the vector store, so lexical
+    hits can be fused with (and resolved through) Chroma results. Corpus
+    statistics are kept in a one-row table updated in the same transaction as
+    the postings, so scoring never scans the whole index.
+    """
+
+    def __init__(self, path: str = BM25_INDEX_PATH, k1: float = BM25_K1, b: float = BM25_B):
+        self.k1 = k1
+        self.b = b
+        self._pool = SQLitePool(path)
+        with self._pool.connection() as conn:
+            conn.execute('''CREATE TABLE IF NOT EXISTS bm25_docs
+                            (chunk_id TEXT PRIMARY KEY, file_id INTEGER, length INTEGER)''')
+            conn.execute('''CREATE TABLE IF NOT EXISTS bm25_postings
+                            (term TEXT, chunk_id TEXT, tf INTEGER,
+                             PRIMARY KEY (term, chunk_id)) WITHOUT ROWID''')
+            conn.execute('''CREATE TABLE IF NOT EXISTS bm25_stats
+                            (id INTEGER PRIMARY KEY CHECK (id = 0),
+                             doc_count INTEGER, total_length INTEGER)''')
+            conn.execute(
+                'CREATE INDEX IF NOT EXISTS idx_bm25_postings_chunk ON bm25_postings (chunk_id)')
+            conn.execute(
+                'CREATE INDEX IF NOT EXISTS idx_bm25_docs_file ON bm25_docs (file_id)')
+            conn.execute(
+                'INSERT OR IGNORE INTO bm25_stats (id, doc_count, total_length) VALUES (0, 0, 0)')
+
+    def add_chunks(self, file_id: int, chunks: Iterable[Tuple[str, str]]):
+        """Indexes (chunk_id, text) pairs; ids already in the index are skipped."""
+        with self._pool.connection() as conn:
+            added = total_length = 0
+            for chunk_id, text in chunks:
+                terms = Counter(tokenize(text))
+                length = sum(terms.values())
+                cursor = conn.execute('INSERT OR IGNORE INTO bm25_docs (chunk_id, file_id, length) VALUES (?, ?, ?)',
+                                      (chunk_id, file_id, length))
+                if not cursor.rowcount:
+                    continue
+                conn.executemany('INSERT INTO bm25_postings (term, chunk_id, tf) VALUES (?, ?, ?)',
+                                 [(term, chunk_id, tf) for term, tf in terms.items()])
+                added += 1
+                total_length += length
+            conn.execute('UPDATE bm25_stats SET doc_count = doc_count + ?, total_length = total_length + ? WHERE id = 0',
+                         (added, total_length))
+
+    def _delete(self, conn, where: str, params: tuple):
+        removed, length = conn.execute(
+            f'SELECT COUNT(*), COALESCE(SUM(length), 0) FROM bm25_docs WHERE {where}', params).fetchone()
+        if not removed:
+            return
+        conn.execute(
+            f'DELETE FROM bm25_postings WHERE chunk_id IN (SELECT chunk_id FROM bm25_docs WHERE {where})', params)
+        conn.execute(f'DELETE FROM bm25_docs WHERE {where}', params)
+        conn.execute('UPDATE bm25_stats SET doc_count = doc_count - ?, total_length = total_length - ? WHERE id = 0',
+                     (removed, length))
+
+    def delete_chunks(self, chunk_ids: List[str]):
+        with self._pool.connection() as conn:
+            # Stay well under SQLite's bound-parameter limit
+            for start in range(0, len(chunk_ids), 500):
+                batch = tuple(chunk_ids[start:start + 500])
+                self._delete(
+                    conn, f"chunk_id IN ({','.join('?' * len(batch))})", batch)
+
+    def delete_file(self, file_id: int):
+        with self._pool.connection() as conn:
+            self._delete(conn, 'file_id = ?', (file_id,))
+
+    def delete_files(self, file_ids: List[int]):
+        with self._pool.connection() as conn:
+            for start in range(0, len(file_ids), 500):
+                batch = tuple(file_ids[start:start + 500])
+                self._delete(
+                    conn, f"file_id IN ({','.join('?' * len(batch))})", batch)
+
+    def search(self, query: str, k: int) -> List[Tuple[str, float]]:
+        """Top `k` (chunk_id, score) pairs for `query`, best first."""
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+        with self._pool.connection() as conn:
+            doc_count, total_length = conn.execute(
+                'SELECT doc_count, total_length FROM bm25_stats WHERE id = 0').fetchone()
+            if not doc_count:
+                return []
+            placeholders = ','.join('?' * len(terms))
+            rows = conn.execute(f'''SELECT p.term, p.chunk_id, p.tf, d.length
+                                    FROM bm25_postings p JOIN bm25_docs d ON d.chunk_id = p.chunk_id
+                                    WHERE p.term IN ({placeholders})''', tuple(terms)).fetchall()
+
+        document_frequency = Counter(row['term'] for row in rows)
+        average_length = total_length / doc_count
+        scores = Counter()
+        for row in rows:
+            df = document_frequency[row['term']]
+            idf = math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+            tf = row['tf']
+            norm = self.k1 * (1 - self.b + self.b * row['length'] / average_length)
+            scores[row['chunk_id']] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return scores.most_common(k)
+
+    def stats(self) -> dict:
+        with self._pool.connection() as conn:
+            doc_count, total_length = conn.execute(
+                'SELECT doc_count, total_length FROM bm25_stats WHERE id = 0').fetchone()
+        return {"chunks": doc_count, "avg_length": total_length / doc_count if doc_count else 0.0}
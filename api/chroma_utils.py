@@ -1,51 +1,285 @@
 import os
-from typing import List
-from langchain_community.document_loaders import PyPDFLoader, Docx2txtLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_chroma import Chroma
+import time
+import hashlib
+import logging
+import threading
+from collections import Counter
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional
 from langchain_core.documents import Document
 from api.db_utils import insert_document_record
+from api.embedding_cache import CachedEmbeddings
+from api.embedding_backends import create_embeddings
+from api.answer_cache import answer_cache
+from api.bm25_index import BM25Index, BM25_INDEX_PATH
+from api.metrics_utils import INGESTION_STAGE_SECONDS, observe_stages
+from api.parsing_utils import iter_document_chunks
+from api.tenant_utils import DEFAULT_TENANT, collection_name, lexical_index_path, hnsw_configuration
 
-# Initialize Embeddings & Vectorstore
-embedding_function = HuggingFaceEmbeddings(
-    model_name="sentence-transformers/all-MiniLM-L6-v2")
-vectorstore = Chroma(persist_directory="./chroma_db",
-                     embedding_function=embedding_function)
-text_splitter = RecursiveCharacterTextSplitter(
-    chunk_size=1000, chunk_overlap=200, length_function=len)
+if TYPE_CHECKING:
+    from langchain_chroma import Chroma
+
+logger = logging.getLogger(__name__)
+
+CHROMA_PATH = "./chroma_db"
+# Number of chunks embedded and written per batch (also the progress granularity)
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+
+# Embeddings, vector stores and lexical indexes are built on first use (or by the
+# startup warm-up), not at import: loading the model takes seconds and hundreds of MB
+_lock = threading.Lock()
+_cached_embedding_function: Optional[CachedEmbeddings] = None
+_chroma_client = None
+# One shard (Chroma collection + BM25 index) per tenant, opened on first use
+_collections = {}
+_vectorstores: Dict[str, "Chroma"] = {}
+_lexical_indexes: Dict[str, BM25Index] = {}
+
+
+def get_cached_embedding_function() -> CachedEmbeddings:
+    """The embedding model (EMBEDDING_BACKEND picks PyTorch or ONNX) behind the
+    on-disk cache, so unchanged chunks are never re-embedded."""
+    global _cached_embedding_function
+    if _cached_embedding_function is None:
+        with _lock:
+            if _cached_embedding_function is None:
+                embedding_function, embedding_cache_name = create_embeddings()
+                _cached_embedding_function = CachedEmbeddings(
+                    embedding_function, embedding_cache_name)
+    return _cached_embedding_function
+
+
+def _get_client():
+    global _chroma_client
+    if _chroma_client is None:
+        import chromadb
+        # One client for every collection in ./chroma_db
+        _chroma_client = chromadb.PersistentClient(path=CHROMA_PATH)
+    return _chroma_client
+
+
+def get_collection(tenant_id: str = DEFAULT_TENANT):
+    """Raw Chroma collection of `tenant_id` (created if new), for id-only
+    operations that don't need the embedding model, e.g. deletes."""
+    collection = _collections.get(tenant_id)
+    if collection is None:
+        with _lock:
+            collection = _collections.get(tenant_id)
+            if collection is None:
+                configuration = hnsw_configuration(tenant_id)
+                collection = _get_client().get_or_create_collection(
+                    collection_name(tenant_id), embedding_function=None,
+                    configuration={"hnsw": configuration})
+                # Only search ef can change after creation; M and construction ef stay as created
+                current = (collection.configuration or {}).get("hnsw") or {}
+                if current.get("ef_search") not in (None, configuration["ef_search"]):
+                    try:
+                        collection.modify(
+                            configuration={"hnsw": {"ef_search": configuration["ef_search"]}})
+                    except Exception as e:
+                        logger.warning(
+                            f"Could not update ef_search of {collection_name(tenant_id)}: {str(e)}")
+                _collections[tenant_id] = collection
+    return collection
+
+
+def get_vectorstore(tenant_id: str = DEFAULT_TENANT):
+    """Chroma collection of `tenant_id` over the cached embeddings (created if new)."""
+    vectorstore = _vectorstores.get(tenant_id)
+    if vectorstore is None:
+        embeddings = get_cached_embedding_function()
+        get_collection(tenant_id)
+        with _lock:
+            vectorstore = _vectorstores.get(tenant_id)
+            if vectorstore is None:
+                from langchain_chroma import Chroma
+                vectorstore = _vectorstores[tenant_id] = Chroma(
+                    collection_name=collection_name(tenant_id), embedding_function=embeddings,
+                    client=_get_client())
+    return vectorstore
+
+
+def get_lexical_index(tenant_id: str = DEFAULT_TENANT) -> BM25Index:
+    """Lexical index over the same chunk ids, kept in step with the tenant's collection."""
+    lexical_index = _lexical_indexes.get(tenant_id)
+    if lexical_index is None:
+        with _lock:
+            lexical_index = _lexical_indexes.get(tenant_id)
+            if lexical_index is None:
+                lexical_index = _lexical_indexes[tenant_id] = BM25Index(
+                    lexical_index_path(tenant_id, BM25_INDEX_PATH))
+    return lexical_index
+
+
+def loaded_components() -> dict:
+    """Which of the lazily built components exist yet (for /readyz); the
+    vector store and lexical index are those of the default tenant."""
+    return {name: "loaded" if loaded else "not_loaded"
+            for name, loaded in [("embeddings", _cached_embedding_function is not None),
+                                 ("vectorstore", DEFAULT_TENANT in _vectorstores),
+                                 ("lexical_index", DEFAULT_TENANT in _lexical_indexes)]}
+
+
+def embedding_cache_stats() -> dict:
+    """Embedding cache counters, without loading the model just to report them."""
+    if _cached_embedding_function is None:
+        return {"loaded": False, "hits": 0, "misses": 0, "hit_rate": 0.0}
+    return {"loaded": True, **_cached_embedding_function.stats()}
 
 
 def load_and_split_document(file_path: str) -> List[Document]:
-    if file_path.endswith('.pdf'):
-        loader = PyPDFLoader(file_path)
-    elif file_path.endswith('.docx'):
-        loader = Docx2txtLoader(file_path)
-    else:
-        raise ValueError(f"Unsupported file type: {file_path}")
+    return [chunk for _, chunks in iter_document_chunks(file_path) for chunk in chunks]
+
+
+def chunk_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
 
-    return text_splitter.split_documents(loader.load())
+def get_chunk_ids(file_id: int, tenant_id: str = DEFAULT_TENANT) -> List[str]:
+    """Ids of a document's chunks, without fetching their text or metadata."""
+    return get_collection(tenant_id).get(where={"file_id": file_id}, include=[])['ids']
 
 
-def index_document_to_chroma(file_path: str, file_id: int) -> bool:
+def index_document_to_chroma(file_path: str, file_id: int, filename: Optional[str] = None,
+                             progress_callback: Optional[Callable[..., None]] = None,
+                             tenant_id: str = DEFAULT_TENANT) -> bool:
+    """Streams a document through the parser pool and embeds its chunks in batches
+    into the shard (collection and BM25 index) of `tenant_id`.
+
+    Chunk ids are derived from the chunk text (`<file_id>-<sha256>-<n>`, n counting
+    repeats), so re-indexing a new revision under the same `file_id` only adds
+    chunks whose text changed and deletes chunks that disappeared; unchanged
+    chunks are left in place. On failure, chunks added by this call are removed.
+
+    `progress_callback`, if given, is called with keyword progress fields
+    (stage, pages_parsed, chunks_total, chunks_embedded, chunks_unchanged) as
+    work completes; chunks_unchanged counts chunks kept from the previous
+    revision without embedding. chunks_total grows while pages are still being parsed.
+    """
+    def report(**progress):
+        if progress_callback:
+            progress_callback(**progress)
+
+    vectorstore = get_vectorstore(tenant_id)
+    collection = get_collection(tenant_id)
+    lexical_index = get_lexical_index(tenant_id)
+    added_ids = []
+    # Seconds per stage for this document, published as histograms on success
+    stage_seconds = Counter()
     try:
-        splits = load_and_split_document(file_path)
-        for split in splits:
-            split.metadata['file_id'] = file_id
-        vectorstore.add_documents(splits)
+        existing_ids = set(get_chunk_ids(file_id, tenant_id))
+        seen_ids = set()
+        occurrences = Counter()
+        pages_parsed = chunks_total = chunks_embedded = chunks_unchanged = 0
+        batch = []
+
+        def flush():
+            ids = [chunk.metadata['chunk_id'] for chunk in batch]
+            texts = [chunk.page_content for chunk in batch]
+            # Embedded here rather than in add_documents, to time the model apart from the write
+            start = time.perf_counter()
+            embeddings = vectorstore.embeddings.embed_documents(texts)
+            stage_seconds["embed"] += time.perf_counter() - start
+            start = time.perf_counter()
+            collection.upsert(ids=ids, embeddings=embeddings, documents=texts,
+                              metadatas=[chunk.metadata for chunk in batch])
+            added_ids.extend(ids)
+            stage_seconds["vector_write"] += time.perf_counter() - start
+            start = time.perf_counter()
+            lexical_index.add_chunks(file_id, list(zip(ids, texts)))
+            stage_seconds["lexical_write"] += time.perf_counter() - start
+            batch.clear()
+
+        start = time.perf_counter()
+        for pages, chunks in iter_document_chunks(file_path):
+            # Time spent waiting on the parser pool (load, extract and split)
+            stage_seconds["parse"] += time.perf_counter() - start
+            pages_parsed += pages
+            chunks_total += len(chunks)
+            report(pages_parsed=pages_parsed, chunks_total=chunks_total)
+            for chunk in chunks:
+                digest = chunk_hash(chunk.page_content)
+                occurrences[digest] += 1
+                chunk_id = f"{file_id}-{digest}-{occurrences[digest]}"
+                seen_ids.add(chunk_id)
+                if chunk_id in existing_ids:
+                    chunks_unchanged += 1
+                    continue  # Unchanged since the previous revision
+
+                chunk.metadata['file_id'] = file_id
+                chunk.metadata['chunk_hash'] = digest
+                chunk.metadata['chunk_id'] = chunk_id
+                if filename:
+                    chunk.metadata['filename'] = filename
+                batch.append(chunk)
+                chunks_embedded += 1
+                if len(batch) >= EMBED_BATCH_SIZE:
+                    flush()
+                    report(stage="embedding", chunks_embedded=chunks_embedded,
+                           chunks_unchanged=chunks_unchanged)
+            start = time.perf_counter()
+        if batch:
+            flush()
+        report(stage="embedding", chunks_embedded=chunks_embedded, chunks_unchanged=chunks_unchanged)
+
+        stale_ids = list(existing_ids - seen_ids)
+        if stale_ids:
+            start = time.perf_counter()
+            vectorstore.delete(ids=stale_ids)
+            lexical_index.delete_chunks(stale_ids)
+            stage_seconds["delete_stale"] += time.perf_counter() - start
+        if added_ids or stale_ids:
+            # Cached answers built from the previous revision are now stale
+            answer_cache.invalidate_file_ids([file_id])
+        observe_stages(INGESTION_STAGE_SECONDS, stage_seconds)
         return True
     except Exception as e:
-        print(f"Error indexing document: {e}")
+        logger.exception(f"Error indexing document {file_id}: {str(e)}")
+        if added_ids:
+            vectorstore.delete(ids=added_ids)
+            lexical_index.delete_chunks(added_ids)
         return False
 
 
-def delete_doc_from_chroma(file_id: int):
+def delete_files_from_chroma(file_ids: List[int], tenant_id: str = DEFAULT_TENANT):
+    """Removes every chunk of `file_ids` from the tenant's shard in one pass.
+
+    The vector store delete matches on metadata, so chunk texts and
+    embeddings are never fetched. Deleting already-removed files is a no-op.
+    """
+    if not file_ids:
+        return
+    get_collection(tenant_id).delete(where={"file_id": {"$in": list(file_ids)}})
+    get_lexical_index(tenant_id).delete_files(file_ids)
+    answer_cache.invalidate_file_ids(file_ids)
+
+
+def delete_doc_from_chroma(file_id: int, tenant_id: str = DEFAULT_TENANT):
     try:
-        # Check if chunks exist before deletion (from referencing project)
-        docs = vectorstore.get(where={"file_id": file_id})
-        if len(docs.get('ids', [])) > 0:
-            vectorstore._collection.delete(where={"file_id": file_id})
+        delete_files_from_chroma([file_id], tenant_id)
         return True
     except Exception as e:
-        print(f"Error deleting from Chroma: {str(e)}")
+        logger.exception(f"Error deleting file {file_id} from Chroma: {str(e)}")
         return False
+
+
+def backfill_lexical_index(page_size: int = 1000, tenant_id: str = DEFAULT_TENANT) -> int:
+    """Adds chunks indexed before the BM25 index existed; returns how many were added."""
+    collection = get_collection(tenant_id)
+    lexical_index = get_lexical_index(tenant_id)
+    if lexical_index.stats()["chunks"] >= collection.count():
+        return 0
+    before = lexical_index.stats()["chunks"]
+    offset = 0
+    while True:
+        page = collection.get(
+            include=["documents", "metadatas"], limit=page_size, offset=offset)
+        if not page["ids"]:
+            break
+        by_file = {}
+        for chunk_id, text, metadata in zip(page["ids"], page["documents"], page["metadatas"]):
+            file_id = (metadata or {}).get("file_id")
+            by_file.setdefault(file_id, []).append((chunk_id, text or ""))
+        for file_id, chunks in by_file.items():
+            lexical_index.add_chunks(file_id, chunks)
+        offset += page_size
+    return lexical_index.stats()["chunks"] - before
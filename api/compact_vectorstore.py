@@ -0,0 +1,179 @@
+"""Offline compaction of the vector store and the BM25 indexes.
+
+Chroma's HNSW index only marks deleted vectors, so after large deletes the
+segment files keep their size and searches walk a fragmented graph. This
+command rebuilds each collection from its stored embeddings (nothing is
+re-embedded) with the currently configured CHROMA_HNSW_* parameters, removes
+segment directories left behind by dropped collections, VACUUMs the SQLite
+files and reports the space reclaimed. Pending deletions from the outbox are
+applied first.
+
+Stop the API before running it, from the directory the API runs in:
+
+    python -m api.compact_vectorstore [--tenant acme] [--json]
+"""
+import os
+import re
+import sys
+import glob
+import json
+import shutil
+import sqlite3
+import argparse
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from api.bm25_index import BM25_INDEX_PATH  # noqa: E402
+from api.chroma_utils import CHROMA_PATH  # noqa: E402
+from api.deletion_utils import process_deletion_outbox  # noqa: E402
+from api.tenant_utils import DEFAULT_TENANT, DEFAULT_COLLECTION, collection_name, hnsw_configuration  # noqa: E402
+
+_UUID = re.compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$")
+
+
+def path_size(path: str) -> int:
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(directory, name))
+               for directory, _, names in os.walk(path) for name in names)
+
+
+def tenant_of(name: str):
+    if name == DEFAULT_COLLECTION:
+        return DEFAULT_TENANT
+    return name[len("tenant_"):] if name.startswith("tenant_") else None
+
+
+def recover_interrupted(client, name: str):
+    """Undoes a previous run that stopped between copying and swapping `name`."""
+    names = {collection.name for collection in client.list_collections()}
+    if f"{name}.new" in names:
+        client.delete_collection(f"{name}.new")
+    if f"{name}.old" in names:
+        if name in names:
+            client.delete_collection(f"{name}.old")
+        else:
+            client.get_collection(f"{name}.old").modify(name=name)
+
+
+def rebuild_collection(client, name: str, page_size: int = 1000) -> int:
+    """Copies a collection into a fresh HNSW index and swaps it in; returns the record count."""
+    old = client.get_collection(name)
+    configuration = dict((old.configuration or {}).get("hnsw") or {})
+    tenant_id = tenant_of(name)
+    if tenant_id is not None:
+        configuration.update(hnsw_configuration(tenant_id))
+    new = client.create_collection(f"{name}.new", embedding_function=None, metadata=old.metadata,
+                                   configuration={"hnsw": configuration})
+    offset = 0
+    while True:
+        page = old.get(include=["embeddings", "documents", "metadatas"], limit=page_size, offset=offset)
+        if not page["ids"]:
+            break
+        new.add(ids=page["ids"], embeddings=page["embeddings"],
+                documents=page["documents"], metadatas=page["metadatas"])
+        offset += page_size
+    if new.count() != old.count():
+        client.delete_collection(f"{name}.new")
+        raise RuntimeError(f"Copy of {name} is incomplete ({new.count()} of {old.count()} records)")
+    # Swap through a rename so the original survives until the copy is in place
+    old.modify(name=f"{name}.old")
+    new.modify(name=name)
+    client.delete_collection(f"{name}.old")
+    return new.count()
+
+
+def remove_orphaned_segments(chroma_path: str) -> int:
+    """Deletes segment directories no collection refers to any more; returns bytes freed."""
+    conn = sqlite3.connect(os.path.join(chroma_path, "chroma.sqlite3"))
+    try:
+        live = {row[0] for row in conn.execute("SELECT id FROM segments")}
+    finally:
+        conn.close()
+    freed = 0
+    for name in os.listdir(chroma_path):
+        path = os.path.join(chroma_path, name)
+        if os.path.isdir(path) and _UUID.match(name) and name not in live:
+            freed += path_size(path)
+            shutil.rmtree(path)
+    return freed
+
+
+def vacuum(path: str):
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("VACUUM")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    finally:
+        conn.close()
+
+
+def bm25_files():
+    root, ext = os.path.splitext(BM25_INDEX_PATH)
+    return [path for path in [BM25_INDEX_PATH, *glob.glob(f"{root}.*{ext}")] if os.path.isfile(path)]
+
+
+def sqlite_size(path: str) -> int:
+    return sum(path_size(path + suffix) for suffix in ("", "-wal") if os.path.exists(path + suffix))
+
+
+def compact(tenants=None, page_size: int = 1000) -> dict:
+    import chromadb
+    from chromadb.api.client import SharedSystemClient
+
+    report = {"outbox_applied": process_deletion_outbox(), "collections": [], "files": []}
+    before = {"chroma_db": path_size(CHROMA_PATH), **{path: sqlite_size(path) for path in bm25_files()}}
+
+    client = chromadb.PersistentClient(path=CHROMA_PATH)
+    if tenants:
+        names = [collection_name(tenant_id) for tenant_id in tenants]
+    else:
+        names = [collection.name for collection in client.list_collections()
+                 if not collection.name.endswith((".new", ".old"))]
+    for name in names:
+        recover_interrupted(client, name)
+        if name not in {collection.name for collection in client.list_collections()}:
+            continue
+        report["collections"].append({"name": name, "records": rebuild_collection(client, name, page_size)})
+    # Release the client's file handles before touching its files directly
+    del client
+    SharedSystemClient.clear_system_cache()
+
+    report["orphaned_segment_bytes"] = remove_orphaned_segments(CHROMA_PATH)
+    vacuum(os.path.join(CHROMA_PATH, "chroma.sqlite3"))
+    for path in bm25_files():
+        vacuum(path)
+
+    after = {"chroma_db": path_size(CHROMA_PATH), **{path: sqlite_size(path) for path in bm25_files()}}
+    for path in before:
+        report["files"].append({"path": path, "before_bytes": before[path], "after_bytes": after[path],
+                                "reclaimed_bytes": before[path] - after[path]})
+    report["reclaimed_bytes"] = sum(row["reclaimed_bytes"] for row in report["files"])
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tenant", action="append", help="only compact this tenant's collection (repeatable)")
+    parser.add_argument("--page-size", type=int, default=1000, help="records copied per batch")
+    parser.add_argument("--json", action="store_true", help="print the raw JSON report")
+    args = parser.parse_args()
+
+    report = compact(args.tenant, args.page_size)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    if report["outbox_applied"]:
+        print(f"applied {report['outbox_applied']} pending deletions")
+    for collection in report["collections"]:
+        print(f"rebuilt {collection['name']}: {collection['records']} records")
+    print(f"{'path':<32} {'before MB':>10} {'after MB':>9} {'reclaimed MB':>13}")
+    for row in report["files"]:
+        print(f"{row['path']:<32} {row['before_bytes'] / 1e6:>10.2f} {row['after_bytes'] / 1e6:>9.2f} "
+              f"{row['reclaimed_bytes'] / 1e6:>13.2f}")
+    print(f"total reclaimed: {report['reclaimed_bytes'] / 1e6:.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
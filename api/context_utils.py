@@ -0,0 +1,112 @@
+import os
+import re
+from typing import List, Optional
+from langchain_core.documents import Document
+from api.token_utils import count_tokens
+
+# Upper bound on the context sent to the LLM, in tokens
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+# Word-shingle Jaccard similarity above which a chunk counts as a near-duplicate
+CONTEXT_DEDUP_THRESHOLD = float(os.getenv("CONTEXT_DEDUP_THRESHOLD", "0.85"))
+# Shortest shared suffix/prefix (in characters) treated as chunk overlap;
+# the longest checked is a bit above the splitter's 200-character overlap
+CONTEXT_MIN_OVERLAP = int(os.getenv("CONTEXT_MIN_OVERLAP", "20"))
+CONTEXT_MAX_OVERLAP = int(os.getenv("CONTEXT_MAX_OVERLAP", "300"))
+
+CONTEXT_SEPARATOR = "\n\n"
+_WORD = re.compile(r"\w+")
+
+
+def format_context(docs: List[Document]) -> str:
+    return CONTEXT_SEPARATOR.join(doc.page_content for doc in docs)
+
+
+def count_context_tokens(docs: List[Document]) -> int:
+    """Tokens in the context block that `format_context` builds from `docs`."""
+    return count_tokens(format_context(docs))
+
+
+def _shingles(text: str, size: int = 3) -> frozenset:
+    words = _WORD.findall(text.lower())
+    if len(words) < size:
+        return frozenset([" ".join(words)])
+    return frozenset(" ".join(words[i:i + size]) for i in range(len(words) - size + 1))
+
+
+def _jaccard(a: frozenset, b: frozenset) -> float:
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+def _overlap(first: str, second: str) -> int:
+    """Length of the longest suffix of `first` that is a prefix of `second`."""
+    for size in range(min(len(first), len(second), CONTEXT_MAX_OVERLAP), CONTEXT_MIN_OVERLAP - 1, -1):
+        if first.endswith(second[:size]):
+            return size
+    return 0
+
+
+def _merge(selected: Document, doc: Document) -> Optional[str]:
+    """Text of `selected` and `doc` joined at their overlap, or None if they
+    aren't neighbouring (or nested) chunks of the same file."""
+    if selected.metadata.get("file_id") != doc.metadata.get("file_id"):
+        return None
+    a, b = selected.page_content, doc.page_content
+    if b in a:
+        return a
+    if a in b:
+        return b
+    overlap = _overlap(a, b)
+    if overlap:
+        return a + b[overlap:]
+    overlap = _overlap(b, a)
+    if overlap:
+        return b + a[overlap:]
+    return None
+
+
+def pack_context(docs: List[Document], top_n: int,
+                 budget: Optional[int] = CONTEXT_TOKEN_BUDGET) -> List[Document]:
+    """Assembles up to `top_n` context blocks from `docs` (best first) within `budget` tokens.
+
+    Overlapping or nested chunks of the same file are merged into one block,
+    near-duplicates of an already packed block are dropped, and blocks that
+    would overflow the budget are skipped in favour of smaller, lower-ranked
+    ones. The best chunk is always kept.
+    """
+    blocks, costs, shingles = [], [], []
+    separator_cost = count_tokens(CONTEXT_SEPARATOR)
+
+    def used():
+        return sum(costs) + separator_cost * max(len(costs) - 1, 0)
+
+    for doc in docs:
+        if len(blocks) >= top_n:
+            break
+        merged_into = None
+        for i, block in enumerate(blocks):
+            text = _merge(block, doc)
+            if text is None:
+                continue
+            merged_into = i
+            if text != block.page_content:
+                cost = count_tokens(text)
+                if budget is None or used() - costs[i] + cost <= budget:
+                    blocks[i] = Document(page_content=text, metadata=dict(block.metadata),
+                                         id=block.id)
+                    costs[i] = cost
+                    shingles[i] = _shingles(text)
+            break
+        if merged_into is not None:
+            continue
+
+        doc_shingles = _shingles(doc.page_content)
+        if any(_jaccard(doc_shingles, other) >= CONTEXT_DEDUP_THRESHOLD for other in shingles):
+            continue
+        cost = count_tokens(doc.page_content)
+        if blocks and budget is not None and used() + separator_cost + cost > budget:
+            continue
+        blocks.append(doc)
+        costs.append(cost)
+        shingles.append(doc_shingles)
+
+    return blocks
@@ -1,19 +1,48 @@
-import sqlite3
+import asyncio
 from datetime import datetime
-from langchain_core.messages import HumanMessage, AIMessage
+from api.history_utils import (
+    SessionHistoryCache, select_window, build_history_messages, HISTORY_MAX_TURNS
+)
+from api.sqlite_pool import SQLitePool, GroupCommitWriter
+from api.tenant_utils import DEFAULT_TENANT, DEFAULT_COLLECTION, collection_name
 
 DB_NAME = "rag_app.db"
 
+session_cache = SessionHistoryCache()
+
 
 def get_db_connection():
-    conn = sqlite3.connect(DB_NAME)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Checks out a pooled connection; commits on exit (rolls back on error)."""
+    return pool.connection()
+
+
+def init_db():
+    """Opens the first connection (creating the schema) ahead of the first request."""
+    with get_db_connection():
+        pass
+
+
+def close_db():
+    """Flushes pending log writes and closes idle connections (on shutdown)."""
+    log_writer.close()
+    pool.close()
 
 
-def create_tables():
-    """Initializes both the log and document store tables in a single call."""
-    conn = get_db_connection()
+def add_missing_columns(conn, table, columns):
+    """Lightweight migration: adds any of `columns` ({name: declaration}) that an
+    existing table created by an older version does not have yet."""
+    existing = {row['name']
+                for row in conn.execute(f'PRAGMA table_info({table})')}
+    for name, declaration in columns.items():
+        if name not in existing:
+            conn.execute(f'ALTER TABLE {table} ADD COLUMN {name} {declaration}')
+
+
+def create_tables(conn):
+    """Initializes both the log and document store tables in a single call.
+
+    Run by the pool on its first connection, so importing this module
+    doesn't touch the database file."""
     # Table for chat history and session tracking
     conn.execute('''CREATE TABLE IF NOT EXISTS application_logs
                     (id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -24,51 +53,250 @@ def create_tables():
     conn.execute('''CREATE TABLE IF NOT EXISTS document_store
                     (id INTEGER PRIMARY KEY AUTOINCREMENT,
                      filename TEXT, upload_timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
-    conn.commit()
-    conn.close()
+
+    # Table for background ingestion jobs and their per-stage progress
+    conn.execute('''CREATE TABLE IF NOT EXISTS ingestion_jobs
+                    (id TEXT PRIMARY KEY, filename TEXT, file_path TEXT, file_id INTEGER,
+                     status TEXT, stage TEXT,
+                     pages_parsed INTEGER DEFAULT 0, chunks_total INTEGER DEFAULT 0,
+                     chunks_embedded INTEGER DEFAULT 0, error TEXT,
+                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+
+    # Content hashes let identical re-uploads be detected without re-indexing
+    add_missing_columns(conn, 'document_store', {'content_hash': 'TEXT'})
+    add_missing_columns(conn, 'ingestion_jobs', {
+        'content_hash': 'TEXT', 'is_revision': 'INTEGER DEFAULT 0'})
+    conn.execute(
+        'CREATE INDEX IF NOT EXISTS idx_document_store_content_hash ON document_store (content_hash)')
+    conn.execute(
+        'CREATE INDEX IF NOT EXISTS idx_document_store_filename ON document_store (filename)')
+
+    # Collection membership: documents from before tenants existed belong to the default one
+    add_missing_columns(conn, 'document_store', {
+        'tenant_id': f"TEXT DEFAULT '{DEFAULT_TENANT}'", 'collection': f"TEXT DEFAULT '{DEFAULT_COLLECTION}'"})
+    add_missing_columns(conn, 'ingestion_jobs', {'tenant_id': f"TEXT DEFAULT '{DEFAULT_TENANT}'"})
+    # Listing pages through a tenant's documents newest first, ties broken by id
+    conn.execute('DROP INDEX IF EXISTS idx_document_store_tenant')
+    conn.execute(
+        'CREATE INDEX IF NOT EXISTS idx_document_store_listing ON document_store (tenant_id, upload_timestamp, id)')
+
+    # History reads fetch the latest turns of one session
+    conn.execute(
+        'CREATE INDEX IF NOT EXISTS idx_application_logs_session ON application_logs (session_id, created_at)')
+    # Listing documents and resuming jobs both sort on these columns
+    conn.execute(
+        'CREATE INDEX IF NOT EXISTS idx_document_store_upload_timestamp ON document_store (upload_timestamp)')
+    conn.execute(
+        'CREATE INDEX IF NOT EXISTS idx_ingestion_jobs_status ON ingestion_jobs (status, created_at)')
+    # Outbox of document deletions committed here but not yet applied to the vector store
+    conn.execute('''CREATE TABLE IF NOT EXISTS deletion_outbox
+                    (id INTEGER PRIMARY KEY AUTOINCREMENT, file_id INTEGER, tenant_id TEXT,
+                     attempts INTEGER DEFAULT 0, error TEXT,
+                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+    # Chunked uploads in progress; the bytes received so far are the size of the .part file
+    conn.execute('''CREATE TABLE IF NOT EXISTS upload_sessions
+                    (id TEXT PRIMARY KEY, filename TEXT, tenant_id TEXT, size INTEGER,
+                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+    # Recorded when indexing completes, so listing doesn't have to ask the vector store
+    add_missing_columns(conn, 'document_store', {'file_size': 'INTEGER', 'chunk_count': 'INTEGER'})
+    # Chunks of a revision kept as they were, counted apart from those embedded
+    add_missing_columns(conn, 'ingestion_jobs', {'chunks_unchanged': 'INTEGER DEFAULT 0'})
+    # Trigram index for substring search on filenames, kept in step with document_store
+    search_exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = 'document_search'").fetchone()
+    conn.execute('''CREATE VIRTUAL TABLE IF NOT EXISTS document_search USING fts5
+                    (filename, content='document_store', content_rowid='id', tokenize='trigram')''')
+    if not search_exists:
+        conn.execute("INSERT INTO document_search (document_search) VALUES ('rebuild')")
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS document_search_insert AFTER INSERT ON document_store BEGIN
+                      INSERT INTO document_search (rowid, filename) VALUES (new.id, new.filename);
+                    END''')
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS document_search_delete AFTER DELETE ON document_store BEGIN
+                      INSERT INTO document_search (document_search, rowid, filename)
+                      VALUES ('delete', old.id, old.filename);
+                    END''')
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS document_search_update AFTER UPDATE OF filename ON document_store BEGIN
+                      INSERT INTO document_search (document_search, rowid, filename)
+                      VALUES ('delete', old.id, old.filename);
+                      INSERT INTO document_search (rowid, filename) VALUES (new.id, new.filename);
+                    END''')
+    # Bumped on every change to a tenant's documents; the ETag of its listings
+    conn.execute('''CREATE TABLE IF NOT EXISTS document_listing_versions
+                    (tenant_id TEXT PRIMARY KEY, version INTEGER DEFAULT 0)''')
+    for event, row in (("INSERT", "new"), ("UPDATE", "new"), ("DELETE", "old")):
+        conn.execute(f'''CREATE TRIGGER IF NOT EXISTS document_listing_{event.lower()} AFTER {event} ON document_store BEGIN
+                          INSERT INTO document_listing_versions (tenant_id, version) VALUES ({row}.tenant_id, 1)
+                          ON CONFLICT (tenant_id) DO UPDATE SET version = version + 1;
+                        END''')
+    # Running summary of turns that fell out of a session's history window
+    conn.execute('''CREATE TABLE IF NOT EXISTS session_summaries
+                    (session_id TEXT PRIMARY KEY, summary TEXT,
+                     summarized_until INTEGER DEFAULT 0,
+                     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+
+
+# Long-lived WAL connections shared by every request thread; the schema is
+# created on the first connection rather than at import
+pool = SQLitePool(DB_NAME, setup=create_tables)
+# Chat logs from concurrent requests are committed together in small batches
+log_writer = GroupCommitWriter(
+    pool, 'INSERT INTO application_logs (session_id, user_query, gpt_response, model) VALUES (?, ?, ?, ?)',
+    name="application-log-writer")
 
 
 def insert_application_logs(session_id, user_query, gpt_response, model):
-    conn = get_db_connection()
-    conn.execute('INSERT INTO application_logs (session_id, user_query, gpt_response, model) VALUES (?, ?, ?, ?)',
-                 (session_id, user_query, gpt_response, model))
-    conn.commit()
-    conn.close()
+    """Queues the log row for the group-commit writer and waits until it is committed."""
+    log_id = log_writer.submit(
+        (session_id, user_query, gpt_response, model)).result()
+    # Write-through so hot sessions never need to be re-read
+    session_cache.append_turn(session_id, (log_id, user_query, gpt_response))
+
+
+def _load_session(session_id):
+    """Reads a session's recent turns and summary into the history cache."""
+    with get_db_connection() as conn:
+        # Newest HISTORY_MAX_TURNS rows via the (session_id, created_at) index; the
+        # rowid tie-break keeps turns logged within the same second in order
+        rows = conn.execute('SELECT id, user_query, gpt_response FROM application_logs WHERE session_id = ? ORDER BY created_at DESC, id DESC LIMIT ?',
+                            (session_id, HISTORY_MAX_TURNS)).fetchall()
+        summary = conn.execute('SELECT summary, summarized_until FROM session_summaries WHERE session_id = ?',
+                               (session_id,)).fetchone()
+    state = {
+        "turns": [(row['id'], row['user_query'], row['gpt_response']) for row in reversed(rows)],
+        "summary": summary['summary'] if summary else None,
+        "summarized_until": summary['summarized_until'] if summary else 0,
+    }
+    session_cache.put(session_id, **state)
+    return state
+
+
+def _get_session_state(session_id):
+    return session_cache.get(session_id) or _load_session(session_id)
 
 
 def get_chat_history(session_id):
-    """Returns chat history as a list of LangChain message objects for the RAG chain."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        'SELECT user_query, gpt_response FROM application_logs WHERE session_id = ? ORDER BY created_at', (session_id,))
-    history = []
-    for row in cursor.fetchall():
-        # Using objects (HumanMessage/AIMessage) is best for LangChain's latest LCEL logic
-        history.append(HumanMessage(content=row['user_query']))
-        history.append(AIMessage(content=row['gpt_response']))
-    conn.close()
-    return history
-
-
-def insert_document_record(filename):
-    """Registers a new document and returns its unique database ID."""
-    conn = get_db_connection()
-    cursor = conn.execute(
-        'INSERT INTO document_store (filename) VALUES (?)', (filename,))
-    file_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
+    """Returns chat history as a list of LangChain message objects for the RAG chain.
+
+    Only the newest turns that fit HISTORY_TOKEN_BUDGET are included, preceded
+    by the session's running summary when one exists.
+    """
+    state = _get_session_state(session_id)
+    window = select_window(state['turns'])
+    return build_history_messages(window, state['summary'])
+
+
+def get_turns_to_summarize(session_id, limit=50):
+    """Turns older than the current history window that the summary doesn't cover yet.
+
+    Returns (previous_summary, turns).
+    """
+    state = _get_session_state(session_id)
+    window = select_window(state['turns'])
+    if not window:
+        return state['summary'], []
+    with get_db_connection() as conn:
+        rows = conn.execute('SELECT id, user_query, gpt_response FROM application_logs WHERE session_id = ? AND id > ? AND id < ? ORDER BY id LIMIT ?',
+                            (session_id, state['summarized_until'], window[0][0], limit)).fetchall()
+    return state['summary'], [(row['id'], row['user_query'], row['gpt_response']) for row in rows]
+
+
+def update_session_summary(session_id, summary, summarized_until):
+    with get_db_connection() as conn:
+        conn.execute('''INSERT INTO session_summaries (session_id, summary, summarized_until) VALUES (?, ?, ?)
+                        ON CONFLICT(session_id) DO UPDATE SET summary = excluded.summary,
+                        summarized_until = excluded.summarized_until, updated_at = CURRENT_TIMESTAMP''',
+                     (session_id, summary, summarized_until))
+    session_cache.set_summary(session_id, summary, summarized_until)
+
+
+async def ainsert_application_logs(session_id, user_query, gpt_response, model):
+    """Non-blocking variant for async endpoints: awaits the batched commit
+    without tying up a worker thread."""
+    log_id = await asyncio.wrap_future(log_writer.submit(
+        (session_id, user_query, gpt_response, model)))
+    session_cache.append_turn(session_id, (log_id, user_query, gpt_response))
+
+
+async def aget_chat_history(session_id):
+    """Non-blocking variant of `get_chat_history` for async endpoints."""
+    return await asyncio.to_thread(get_chat_history, session_id)
+
+
+def insert_document_record(filename, tenant_id=DEFAULT_TENANT):
+    """Registers a new document in `tenant_id`'s collection and returns its unique database ID."""
+    with get_db_connection() as conn:
+        cursor = conn.execute(
+            'INSERT INTO document_store (filename, tenant_id, collection) VALUES (?, ?, ?)',
+            (filename, tenant_id, collection_name(tenant_id)))
+        file_id = cursor.lastrowid
     return file_id
 
 
-def get_all_documents():
-    """Fetches all indexed documents, sorted by most recent upload."""
-    conn = get_db_connection()
-    # Sorting ensures the newest files appear at the top of your Streamlit sidebar
-    docs = conn.execute(
-        'SELECT id, filename, upload_timestamp FROM document_store ORDER BY upload_timestamp DESC').fetchall()
-    conn.close()
+def mark_document_indexed(file_id, content_hash, file_size, chunk_count):
+    """Marks a document as fully indexed at `content_hash` with its size and
+    chunk count (also bumps its timestamp). Returns False if the document was
+    deleted in the meantime."""
+    with get_db_connection() as conn:
+        cursor = conn.execute('UPDATE document_store SET content_hash = ?, file_size = ?, chunk_count = ?, '
+                              'upload_timestamp = CURRENT_TIMESTAMP WHERE id = ?',
+                              (content_hash, file_size, chunk_count, file_id))
+    return cursor.rowcount > 0
+
+
+def document_exists(file_id):
+    with get_db_connection() as conn:
+        row = conn.execute('SELECT 1 FROM document_store WHERE id = ?', (file_id,)).fetchone()
+    return row is not None
+
+
+def get_document_by_hash(content_hash, tenant_id=DEFAULT_TENANT):
+    with get_db_connection() as conn:
+        doc = conn.execute('SELECT id, filename, upload_timestamp FROM document_store WHERE content_hash = ? AND tenant_id = ?',
+                           (content_hash, tenant_id)).fetchone()
+    return dict(doc) if doc else None
+
+
+def get_document_by_filename(filename, tenant_id=DEFAULT_TENANT):
+    """Latest document uploaded under `filename`, used to detect new revisions."""
+    with get_db_connection() as conn:
+        doc = conn.execute('SELECT id, filename, upload_timestamp FROM document_store WHERE filename = ? AND tenant_id = ? ORDER BY upload_timestamp DESC LIMIT 1',
+                           (filename, tenant_id)).fetchone()
+    return dict(doc) if doc else None
+
+
+def get_document_listing_version(tenant_id=DEFAULT_TENANT):
+    """Counter that changes whenever any of the tenant's documents does."""
+    with get_db_connection() as conn:
+        row = conn.execute('SELECT version FROM document_listing_versions WHERE tenant_id = ?',
+                           (tenant_id,)).fetchone()
+    return row['version'] if row else 0
+
+
+def list_documents_page(tenant_id=DEFAULT_TENANT, limit=50, after=None, search=None):
+    """One page of a tenant's documents, most recent upload first.
+
+    `after` is the (upload_timestamp, id) of the last document of the previous
+    page; pages are read by seeking the listing index, so later pages cost the
+    same as the first. `search` matches a case-insensitive substring of the
+    filename through the trigram index (searches under three characters, which
+    trigrams can't match, scan the tenant's filenames instead).
+    """
+    conditions, params = ['tenant_id = ?'], [tenant_id]
+    if after is not None:
+        conditions.append('(upload_timestamp, id) < (?, ?)')
+        params.extend(after)
+    if search and len(search) >= 3:
+        conditions.append('id IN (SELECT rowid FROM document_search WHERE document_search MATCH ?)')
+        params.append('"' + search.replace('"', '""') + '"')
+    elif search:
+        conditions.append('instr(lower(filename), ?) > 0')
+        params.append(search.lower())
+    with get_db_connection() as conn:
+        docs = conn.execute(
+            'SELECT id, filename, upload_timestamp, tenant_id, file_size, chunk_count FROM document_store '
+            f'WHERE {" AND ".join(conditions)} ORDER BY upload_timestamp DESC, id DESC LIMIT ?',
+            (*params, limit)).fetchall()
     return [dict(doc) for doc in docs]
 
 
@@ -76,15 +304,118 @@ def delete_document_record(file_id):
     """Removes a document record from the SQL database. 
     Note: Ensure you also delete from Chroma in your main logic."""
     try:
-        conn = get_db_connection()
-        conn.execute('DELETE FROM document_store WHERE id = ?', (file_id,))
-        conn.commit()
-        conn.close()
+        with get_db_connection() as conn:
+            conn.execute('DELETE FROM document_store WHERE id = ?', (file_id,))
         return True
     except Exception as e:
         print(f"Error deleting record: {e}")
         return False
 
 
-# CRITICAL: Always initialize tables when the script is imported
-create_tables()
+def stage_document_deletions(file_ids, tenant_id=DEFAULT_TENANT):
+    """Phase one of a bulk delete: in a single transaction, removes the tenant's
+    document rows for `file_ids` and records each one in the deletion outbox.
+
+    Returns the outbox entries ({"id", "file_id", "tenant_id"}); ids that don't
+    exist or belong to another tenant are left alone.
+    """
+    entries = []
+    with get_db_connection() as conn:
+        for start in range(0, len(file_ids), 500):
+            batch = tuple(file_ids[start:start + 500])
+            rows = conn.execute(
+                f'SELECT id FROM document_store WHERE tenant_id = ? AND id IN ({",".join("?" * len(batch))})',
+                (tenant_id, *batch)).fetchall()
+            for row in rows:
+                cursor = conn.execute('INSERT INTO deletion_outbox (file_id, tenant_id) VALUES (?, ?)',
+                                      (row['id'], tenant_id))
+                entries.append({"id": cursor.lastrowid, "file_id": row['id'], "tenant_id": tenant_id})
+            conn.executemany('DELETE FROM document_store WHERE id = ?', [(row['id'],) for row in rows])
+    return entries
+
+
+def get_pending_deletions(limit=1000):
+    with get_db_connection() as conn:
+        rows = conn.execute(
+            'SELECT id, file_id, tenant_id FROM deletion_outbox ORDER BY id LIMIT ?', (limit,)).fetchall()
+    return [dict(row) for row in rows]
+
+
+def complete_deletions(outbox_ids):
+    with get_db_connection() as conn:
+        conn.executemany('DELETE FROM deletion_outbox WHERE id = ?', [(outbox_id,) for outbox_id in outbox_ids])
+
+
+def record_deletion_failure(outbox_ids, error):
+    with get_db_connection() as conn:
+        conn.executemany('UPDATE deletion_outbox SET attempts = attempts + 1, error = ? WHERE id = ?',
+                         [(error, outbox_id) for outbox_id in outbox_ids])
+
+
+def insert_ingestion_job(job_id, filename, file_path, content_hash=None, tenant_id=DEFAULT_TENANT):
+    """Registers a queued ingestion job for an uploaded file."""
+    with get_db_connection() as conn:
+        conn.execute(
+            "INSERT INTO ingestion_jobs (id, filename, file_path, content_hash, tenant_id, status, stage) VALUES (?, ?, ?, ?, ?, 'queued', 'queued')",
+            (job_id, filename, file_path, content_hash, tenant_id))
+
+
+def update_ingestion_job(job_id, **fields):
+    """Updates status/progress columns of a job and bumps its updated_at timestamp."""
+    if not fields:
+        return
+    assignments = ", ".join(f"{column} = ?" for column in fields)
+    with get_db_connection() as conn:
+        conn.execute(
+            f'UPDATE ingestion_jobs SET {assignments}, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
+            (*fields.values(), job_id))
+
+
+def get_ingestion_job(job_id):
+    with get_db_connection() as conn:
+        job = conn.execute(
+            'SELECT * FROM ingestion_jobs WHERE id = ?', (job_id,)).fetchone()
+    return dict(job) if job else None
+
+
+def get_all_ingestion_jobs(limit=100):
+    """Fetches the most recent ingestion jobs, newest first."""
+    with get_db_connection() as conn:
+        jobs = conn.execute(
+            'SELECT * FROM ingestion_jobs ORDER BY created_at DESC LIMIT ?', (limit,)).fetchall()
+    return [dict(job) for job in jobs]
+
+
+def get_unfinished_ingestion_jobs():
+    """Jobs that were queued or running when the process last stopped."""
+    with get_db_connection() as conn:
+        jobs = conn.execute(
+            "SELECT * FROM ingestion_jobs WHERE status IN ('queued', 'running') ORDER BY created_at").fetchall()
+    return [dict(job) for job in jobs]
+
+
+def insert_upload_session(upload_id, filename, tenant_id, size):
+    with get_db_connection() as conn:
+        conn.execute('INSERT INTO upload_sessions (id, filename, tenant_id, size) VALUES (?, ?, ?, ?)',
+                     (upload_id, filename, tenant_id, size))
+
+
+def get_upload_session(upload_id):
+    with get_db_connection() as conn:
+        session = conn.execute(
+            'SELECT * FROM upload_sessions WHERE id = ?', (upload_id,)).fetchone()
+    return dict(session) if session else None
+
+
+def delete_upload_session(upload_id):
+    with get_db_connection() as conn:
+        conn.execute('DELETE FROM upload_sessions WHERE id = ?', (upload_id,))
+
+
+def get_expired_upload_sessions(max_age_hours):
+    """Upload sessions started more than `max_age_hours` ago and never completed."""
+    with get_db_connection() as conn:
+        sessions = conn.execute(
+            "SELECT * FROM upload_sessions WHERE created_at < datetime('now', ?)",
+            (f"-{max_age_hours} hours",)).fetchall()
+    return [dict(session) for session in sessions]
@@ -0,0 +1,86 @@
+import os
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Dict, List
+from api.chroma_utils import delete_files_from_chroma
+from api.db_utils import (
+    stage_document_deletions, get_pending_deletions, complete_deletions, record_deletion_failure
+)
+from api.tenant_utils import DEFAULT_TENANT
+
+logger = logging.getLogger(__name__)
+
+# Files removed from the vector store and BM25 index per call
+DELETE_BATCH_SIZE = int(os.getenv("DELETE_BATCH_SIZE", "500"))
+# Seconds between retries of deletions left in the outbox while the API runs
+DELETION_RETRY_SECONDS = float(os.getenv("DELETION_RETRY_SECONDS", "30"))
+
+
+def apply_deletions(entries: List[dict]) -> List[int]:
+    """Phase two: deletes the outbox entries' chunks from their tenants' shards
+    and clears the entries. Returns the file ids that failed and stay pending."""
+    by_tenant: Dict[str, List[dict]] = defaultdict(list)
+    for entry in entries:
+        by_tenant[entry['tenant_id']].append(entry)
+
+    pending = []
+    for tenant_id, tenant_entries in by_tenant.items():
+        for start in range(0, len(tenant_entries), DELETE_BATCH_SIZE):
+            batch = tenant_entries[start:start + DELETE_BATCH_SIZE]
+            file_ids = [entry['file_id'] for entry in batch]
+            try:
+                delete_files_from_chroma(file_ids, tenant_id)
+            except Exception as e:
+                logger.error(f"Deleting {len(file_ids)} files from tenant {tenant_id} failed, "
+                             f"left in the outbox: {str(e)}")
+                record_deletion_failure([entry['id'] for entry in batch], str(e))
+                pending.extend(file_ids)
+                continue
+            complete_deletions([entry['id'] for entry in batch])
+    return pending
+
+
+def delete_documents(file_ids: List[int], tenant_id: str = DEFAULT_TENANT) -> dict:
+    """Deletes many documents of a tenant, keeping SQLite and the vector store consistent.
+
+    The document rows are removed and the deletions recorded in the outbox in
+    one transaction, then applied to the shard. If that second step fails,
+    the entries stay in the outbox and `process_deletion_outbox` finishes them.
+    Returns {"deleted", "not_found", "pending"} lists of file ids.
+    """
+    file_ids = list(dict.fromkeys(file_ids))
+    entries = stage_document_deletions(file_ids, tenant_id)
+    staged = {entry['file_id'] for entry in entries}
+    pending = apply_deletions(entries)
+    return {"deleted": [file_id for file_id in file_ids if file_id in staged and file_id not in pending],
+            "not_found": [file_id for file_id in file_ids if file_id not in staged],
+            "pending": pending}
+
+
+def process_deletion_outbox(batch_size: int = 1000) -> int:
+    """Applies deletions left over from a crash or a failed request (run at
+    startup, periodically and before compaction); returns how many were completed."""
+    completed = 0
+    while True:
+        entries = get_pending_deletions(batch_size)
+        if not entries:
+            return completed
+        pending = apply_deletions(entries)
+        completed += len(entries) - len(pending)
+        if pending:
+            # Still failing; retried on the next run
+            return completed
+
+
+async def retry_pending_deletions(interval: float = DELETION_RETRY_SECONDS):
+    """Drains the outbox every `interval` seconds until cancelled, so a document
+    whose vector store delete failed stops being retrievable without a restart."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            completed = await asyncio.to_thread(process_deletion_outbox)
+            if completed:
+                logger.info(f"Applied {completed} pending document deletions")
+        except Exception as e:
+            logger.warning(f"Deletion outbox not processed: {str(e)}")
@@ -0,0 +1,118 @@
+import os
+import logging
+from typing import List, Tuple
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL_NAME = os.getenv(
+    "EMBEDDING_MODEL_NAME", "sentence-transformers/all-MiniLM-L6-v2")
+# "torch" (sentence-transformers, full precision) or "onnx" (ONNX Runtime, int8 by default)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+# Intra-op threads for encoding; 0 keeps the runtime default (all cores)
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0"))
+# Longest input in tokens (all-MiniLM-L6-v2 is trained up to 256)
+EMBEDDING_MAX_TOKENS = int(os.getenv("EMBEDDING_MAX_TOKENS", "256"))
+# ONNX model: a local directory holding the .onnx file and tokenizer.json, or
+# empty to fetch EMBEDDING_ONNX_FILE from the model's Hugging Face repository
+EMBEDDING_ONNX_PATH = os.getenv("EMBEDDING_ONNX_PATH", "")
+EMBEDDING_ONNX_FILE = os.getenv(
+    "EMBEDDING_ONNX_FILE", "onnx/model_quint8_avx2.onnx")
+
+
+class OnnxEmbeddings(Embeddings):
+    """Sentence embeddings from an ONNX export of a BERT-style encoder.
+
+    Reproduces the sentence-transformers pipeline of all-MiniLM-L6-v2 (mean
+    pooling over the attention mask, then L2 normalization), so vectors live
+    in the same space as the PyTorch model and can share a Chroma collection.
+    Texts are bucketed by token length before batching, so each batch is only
+    padded to the length of its own longest text.
+    """
+
+    def __init__(self, model_path: str, tokenizer_path: str, batch_size: int = EMBEDDING_BATCH_SIZE,
+                 threads: int = EMBEDDING_THREADS, max_tokens: int = EMBEDDING_MAX_TOKENS):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        self.batch_size = batch_size
+        self.tokenizer = Tokenizer.from_file(tokenizer_path)
+        self.tokenizer.enable_truncation(max_tokens)
+        self.tokenizer.no_padding()
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(
+            model_path, options, providers=["CPUExecutionProvider"])
+        self._input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+    def _encode_batch(self, encodings) -> np.ndarray:
+        length = max(len(encoding.ids) for encoding in encodings)
+        input_ids = np.zeros((len(encodings), length), dtype=np.int64)
+        attention_mask = np.zeros((len(encodings), length), dtype=np.int64)
+        for row, encoding in enumerate(encodings):
+            input_ids[row, :len(encoding.ids)] = encoding.ids
+            attention_mask[row, :len(encoding.ids)] = 1
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask,
+                 "token_type_ids": np.zeros_like(input_ids)}
+        hidden = self.session.run(
+            None, {name: value for name, value in feeds.items() if name in self._input_names})[0]
+        mask = attention_mask[..., None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        return pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        encodings = self.tokenizer.encode_batch(texts)
+        order = sorted(range(len(texts)), key=lambda i: len(encodings[i].ids))
+        vectors = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            for i, vector in zip(batch, self._encode_batch([encodings[i] for i in batch])):
+                vectors[i] = vector.tolist()
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._encode_batch([self.tokenizer.encode(text)])[0].tolist()
+
+
+def _onnx_files() -> Tuple[str, str]:
+    if EMBEDDING_ONNX_PATH:
+        if os.path.isfile(EMBEDDING_ONNX_PATH):
+            directory, model_path = os.path.dirname(EMBEDDING_ONNX_PATH), EMBEDDING_ONNX_PATH
+        else:
+            directory = EMBEDDING_ONNX_PATH
+            model_path = os.path.join(directory, os.path.basename(EMBEDDING_ONNX_FILE))
+        return model_path, os.path.join(directory, "tokenizer.json")
+    from huggingface_hub import hf_hub_download
+    return (hf_hub_download(EMBEDDING_MODEL_NAME, EMBEDDING_ONNX_FILE),
+            hf_hub_download(EMBEDDING_MODEL_NAME, "tokenizer.json"))
+
+
+def create_embeddings(backend: str = EMBEDDING_BACKEND) -> Tuple[Embeddings, str]:
+    """Builds the configured embedding backend.
+
+    Returns (embeddings, cache_name). The cache name keys the on-disk
+    embedding cache, so vectors from different backends are never mixed up
+    (the PyTorch backend keeps the plain model name used so far).
+    """
+    if backend == "onnx":
+        model_path, tokenizer_path = _onnx_files()
+        logger.info(f"Using ONNX embeddings from {model_path}")
+        return (OnnxEmbeddings(model_path, tokenizer_path),
+                f"{EMBEDDING_MODEL_NAME}#onnx:{os.path.basename(model_path)}")
+    if backend != "torch":
+        raise ValueError(f"Unknown EMBEDDING_BACKEND: {backend}")
+
+    from langchain_huggingface import HuggingFaceEmbeddings
+    if EMBEDDING_THREADS:
+        import torch
+        torch.set_num_threads(EMBEDDING_THREADS)
+    # sentence-transformers already sorts each call's texts by length before batching
+    return (HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_NAME,
+                                  encode_kwargs={"batch_size": EMBEDDING_BATCH_SIZE}),
+            EMBEDDING_MODEL_NAME)
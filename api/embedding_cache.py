@@ -0,0 +1,133 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+EMBEDDING_CACHE_PATH = os.getenv(
+    "EMBEDDING_CACHE_PATH", "embedding_cache.db")
+# ~1.5 KB per entry for a 384-dim MiniLM vector
+EMBEDDING_CACHE_MAX_ENTRIES = int(
+    os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "100000"))
+# Recent query embeddings kept in memory (the answer cache and the retriever
+# embed the same question back to back)
+QUERY_EMBEDDING_CACHE_SIZE = int(
+    os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "256"))
+# SQLite caps the number of bound parameters per statement
+_LOOKUP_BATCH = 500
+
+
+def embedding_cache_key(model_name: str, text: str) -> str:
+    return hashlib.sha256(f"{model_name}\0{text}".encode("utf-8")).hexdigest()
+
+
+class CachedEmbeddings(Embeddings):
+    """Content-addressed, size-bounded on-disk cache in front of another embedder.
+
+    Document embeddings are stored as float32 blobs keyed by
+    sha256(model_name, text); only cache misses reach the wrapped model.
+    Least-recently-used rows are evicted once `max_entries` is exceeded.
+    Query embeddings are only memoized in a small in-process LRU.
+    """
+
+    def __init__(self, embeddings: Embeddings, model_name: str,
+                 path: str = EMBEDDING_CACHE_PATH, max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._recent_queries = OrderedDict()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('''CREATE TABLE IF NOT EXISTS embeddings
+                              (key TEXT PRIMARY KEY, vector BLOB, last_used REAL)''')
+        self._conn.execute(
+            'CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)')
+        self._conn.commit()
+        self._entries = self._conn.execute(
+            'SELECT COUNT(*) FROM embeddings').fetchone()[0]
+
+    def _lookup(self, keys: List[str]) -> Dict[str, List[float]]:
+        found = {}
+        for start in range(0, len(keys), _LOOKUP_BATCH):
+            batch = keys[start:start + _LOOKUP_BATCH]
+            placeholders = ", ".join("?" * len(batch))
+            rows = self._conn.execute(
+                f'SELECT key, vector FROM embeddings WHERE key IN ({placeholders})', batch)
+            for key, blob in rows:
+                found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+        return found
+
+    def _evict(self):
+        overflow = self._entries - self.max_entries
+        if overflow <= 0:
+            return
+        # Evict a little extra so we don't pay for a DELETE on every insert
+        overflow += self.max_entries // 20
+        self._conn.execute('''DELETE FROM embeddings WHERE key IN
+                              (SELECT key FROM embeddings ORDER BY last_used LIMIT ?)''', (overflow,))
+        remaining = self._conn.execute(
+            'SELECT COUNT(*) FROM embeddings').fetchone()[0]
+        self.evictions += self._entries - remaining
+        self._entries = remaining
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [embedding_cache_key(self.model_name, text) for text in texts]
+        with self._lock:
+            cached = self._lookup(keys)
+
+        # Deduplicate misses so repeated chunks within one batch are embedded once
+        missing = {key: text for key, text in zip(keys, texts) if key not in cached}
+        computed = {}
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+
+        now = time.time()
+        with self._lock:
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+            if cached:
+                self._conn.executemany('UPDATE embeddings SET last_used = ? WHERE key = ?',
+                                       [(now, key) for key in cached])
+            if computed:
+                # Another worker may have stored the same chunk meanwhile
+                inserted = self._conn.executemany(
+                    'INSERT OR IGNORE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)',
+                    [(key, np.asarray(vector, dtype=np.float32).tobytes(), now)
+                     for key, vector in computed.items()])
+                self._entries += inserted.rowcount
+                self._evict()
+            self._conn.commit()
+
+        return [cached[key] if key in cached else computed[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        with self._lock:
+            if text in self._recent_queries:
+                self._recent_queries.move_to_end(text)
+                return self._recent_queries[text]
+        vector = self.embeddings.embed_query(text)
+        with self._lock:
+            self._recent_queries[text] = vector
+            if len(self._recent_queries) > QUERY_EMBEDDING_CACHE_SIZE:
+                self._recent_queries.popitem(last=False)
+        return vector
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "model": self.model_name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": self._entries,
+            "max_entries": self.max_entries,
+        }
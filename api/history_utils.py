@@ -0,0 +1,109 @@
+import os
+import threading
+from collections import OrderedDict, deque
+from typing import List, Optional, Tuple
+from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
+from api.token_utils import count_tokens
+
+# Most recent turns kept per session (and the most ever sent to the LLM)
+HISTORY_MAX_TURNS = int(os.getenv("HISTORY_MAX_TURNS", "20"))
+# Token budget for the history window; older turns are dropped (or summarized)
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "1500"))
+# Sessions kept in the in-process LRU cache
+HISTORY_CACHE_SESSIONS = int(os.getenv("HISTORY_CACHE_SESSIONS", "1000"))
+# Roll turns that fall out of the window into a running summary (costs an LLM call)
+HISTORY_SUMMARY_ENABLED = os.getenv(
+    "HISTORY_SUMMARY_ENABLED", "false").lower() == "true"
+
+# A turn is (log id, user_query, gpt_response)
+Turn = Tuple[int, str, str]
+
+
+class SessionHistoryCache:
+    """LRU cache of the recent turns and running summary of hot sessions.
+
+    Kept write-through by `insert_application_logs`, so a cached session
+    never has to be re-read from SQLite.
+    """
+
+    def __init__(self, max_sessions: int = HISTORY_CACHE_SESSIONS):
+        self.max_sessions = max_sessions
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._sessions = OrderedDict()
+
+    def get(self, session_id: str) -> Optional[dict]:
+        with self._lock:
+            state = self._sessions.get(session_id)
+            if state is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._sessions.move_to_end(session_id)
+            return {"turns": list(state["turns"]), "summary": state["summary"],
+                    "summarized_until": state["summarized_until"]}
+
+    def put(self, session_id: str, turns: List[Turn], summary: Optional[str], summarized_until: int):
+        with self._lock:
+            self._sessions[session_id] = {
+                "turns": deque(turns, maxlen=HISTORY_MAX_TURNS),
+                "summary": summary,
+                "summarized_until": summarized_until,
+            }
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def append_turn(self, session_id: str, turn: Turn):
+        # Uncached sessions are loaded in full on their next read instead
+        with self._lock:
+            state = self._sessions.get(session_id)
+            # A concurrent load may already have read this turn from the database
+            if state is not None and (not state["turns"] or state["turns"][-1][0] < turn[0]):
+                state["turns"].append(turn)
+
+    def set_summary(self, session_id: str, summary: str, summarized_until: int):
+        with self._lock:
+            if session_id in self._sessions:
+                self._sessions[session_id]["summary"] = summary
+                self._sessions[session_id]["summarized_until"] = summarized_until
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "sessions": len(self._sessions),
+            "max_sessions": self.max_sessions,
+        }
+
+
+def select_window(turns: List[Turn], budget: int = HISTORY_TOKEN_BUDGET) -> List[Turn]:
+    """Newest turns that fit in `budget` tokens, oldest first.
+
+    The latest turn is always kept so follow-up questions keep their referent.
+    """
+    window, used = [], 0
+    for turn in reversed(turns):
+        cost = count_tokens(turn[1]) + count_tokens(turn[2])
+        if window and used + cost > budget:
+            break
+        window.append(turn)
+        used += cost
+    window.reverse()
+    return window
+
+
+def build_history_messages(window: List[Turn], summary: Optional[str]) -> list:
+    """LangChain message objects for the RAG chain (summary first, if any)."""
+    messages = []
+    if summary:
+        messages.append(SystemMessage(
+            content=f"Summary of the earlier conversation: {summary}"))
+    for _, user_query, gpt_response in window:
+        # Using objects (HumanMessage/AIMessage) is best for LangChain's latest LCEL logic
+        messages.append(HumanMessage(content=user_query))
+        messages.append(AIMessage(content=gpt_response))
+    return messages
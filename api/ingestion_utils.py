@@ -0,0 +1,265 @@
+import os
+import time
+import uuid
+import hashlib
+import logging
+import threading
+import contextvars
+from contextlib import ExitStack, contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from api.chroma_utils import index_document_to_chroma, delete_doc_from_chroma
+from api.db_utils import (
+    insert_document_record, delete_document_record, insert_ingestion_job,
+    update_ingestion_job, get_unfinished_ingestion_jobs, get_document_by_hash,
+    get_document_by_filename, mark_document_indexed, document_exists
+)
+from api.metrics_utils import (
+    ADMISSION_IN_FLIGHT, ADMISSION_QUEUE_DEPTH, ADMISSION_WAIT_SECONDS, ADMISSION_REJECTED
+)
+from api.tenant_utils import DEFAULT_TENANT
+
+logger = logging.getLogger(__name__)
+
+# Worker pool configuration: INGEST_WORKERS jobs run at once and up to
+# INGEST_QUEUE_SIZE more may wait; anything beyond that is rejected.
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "16"))
+# Uploads are kept here until their job finishes so interrupted jobs can be resumed
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "./uploads")
+# Largest file accepted, through multipart and chunked uploads alike
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(200 * 1024 * 1024)))
+_COPY_BUFFER_SIZE = 1024 * 1024
+
+_executor = ThreadPoolExecutor(
+    max_workers=INGEST_WORKERS, thread_name_prefix="ingest")
+_slots = threading.BoundedSemaphore(INGEST_WORKERS + INGEST_QUEUE_SIZE)
+# Locks held by running jobs, keyed by filename and by content hash, with the
+# number of jobs holding or waiting for each (entries go once that drops to 0)
+_document_locks = {}
+_document_locks_guard = threading.Lock()
+
+
+class IngestionQueueFull(RuntimeError):
+    """Raised when the ingestion backlog is at capacity."""
+
+
+class IngestionCancelled(RuntimeError):
+    """Raised inside a job whose document was deleted while it was indexing."""
+
+
+class UploadTooLarge(ValueError):
+    """Raised when an upload exceeds MAX_UPLOAD_BYTES."""
+
+    def __init__(self):
+        super().__init__(f"File exceeds the {MAX_UPLOAD_BYTES // (1024 * 1024)} MB upload limit.")
+
+
+def _run_ingestion_job(job: dict):
+    job_id, file_path, filename = job['id'], job['file_path'], job['filename']
+    file_id = job.get('file_id')
+    is_revision = bool(job.get('is_revision'))
+    tenant_id = job.get('tenant_id') or DEFAULT_TENANT
+    try:
+        update_ingestion_job(job_id, status="running", stage="parsing")
+
+        # An identical file may have finished indexing while this job was queued
+        duplicate = get_document_by_hash(job['content_hash'], tenant_id)
+        if duplicate is not None:
+            update_ingestion_job(job_id, status="completed", stage="done",
+                                 file_id=duplicate['id'])
+            logger.info(
+                f"Ingestion job {job_id}: identical to file {duplicate['id']}, skipped")
+            return
+
+        if file_id is None:
+            # A new revision of a known filename is re-indexed incrementally in place
+            previous = get_document_by_filename(filename, tenant_id)
+            is_revision = previous is not None
+            file_id = previous['id'] if is_revision else insert_document_record(
+                filename, tenant_id)
+            update_ingestion_job(job_id, file_id=file_id,
+                                 is_revision=int(is_revision))
+
+        progress = {}
+
+        def record_progress(**fields):
+            progress.update(fields)
+            update_ingestion_job(job_id, **fields)
+            # Stop embedding a document that was deleted meanwhile (checked once per batch)
+            if 'chunks_embedded' in fields and not document_exists(file_id):
+                raise IngestionCancelled(f"File {file_id} was deleted while indexing")
+
+        success = index_document_to_chroma(
+            file_path, file_id, filename=filename,
+            progress_callback=record_progress, tenant_id=tenant_id)
+
+        # The record is only marked indexed if it still exists, so a delete
+        # staged before this point is always caught below
+        if success and mark_document_indexed(file_id, job['content_hash'], os.path.getsize(file_path),
+                                             progress.get('chunks_total', 0)):
+            update_ingestion_job(job_id, status="completed", stage="done")
+            logger.info(f"Ingestion job {job_id} indexed: {filename}")
+        elif not document_exists(file_id):
+            _cancel_ingestion_job(job_id, file_id, tenant_id)
+        else:
+            # A failed revision keeps the previous version (its new chunks were
+            # rolled back); a failed new document is removed entirely
+            if not is_revision:
+                delete_doc_from_chroma(file_id, tenant_id)
+                delete_document_record(file_id)
+            update_ingestion_job(job_id, status="failed",
+                                 error="Document indexing failed.")
+    except Exception as e:
+        logger.error(f"Ingestion job {job_id} crashed: {str(e)}", exc_info=True)
+        if file_id is not None and not document_exists(file_id):
+            _cancel_ingestion_job(job_id, file_id, tenant_id)
+        else:
+            update_ingestion_job(job_id, status="failed", error=str(e))
+    finally:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        _slots.release()
+
+
+def _cancel_ingestion_job(job_id: str, file_id: int, tenant_id: str):
+    """Finishes a job whose document was deleted while it was indexing. The
+    deletion outbox may have been applied before the job's last writes, so
+    the chunks are removed again here rather than left orphaned."""
+    delete_doc_from_chroma(file_id, tenant_id)
+    update_ingestion_job(job_id, status="cancelled", stage="done",
+                         error="Document was deleted while it was being indexed.")
+    logger.info(f"Ingestion job {job_id} cancelled: file {file_id} was deleted")
+
+
+def _reserve_slot():
+    if not _slots.acquire(blocking=False):
+        ADMISSION_REJECTED.labels("ingestion", "queue_full").inc()
+        raise IngestionQueueFull(
+            f"Ingestion queue is full ({INGEST_WORKERS + INGEST_QUEUE_SIZE} jobs).")
+
+
+@contextmanager
+def _document_lock(job: dict):
+    """Runs jobs for the same filename or the same content of a tenant one at a
+    time. The duplicate and revision checks only see finished jobs, so two such
+    jobs at once would both index the file, or race on the same chunk ids."""
+    tenant_id = job.get('tenant_id') or DEFAULT_TENANT
+    keys = sorted({("filename", tenant_id, job['filename'])} |
+                  ({("hash", tenant_id, job['content_hash'])} if job.get('content_hash') else set()))
+    with _document_locks_guard:
+        entries = [_document_locks.setdefault(key, [threading.Lock(), 0]) for key in keys]
+        for entry in entries:
+            entry[1] += 1
+    try:
+        # Taken in sorted order, so two jobs can't each hold the lock the other needs
+        with ExitStack() as stack:
+            for lock, _ in entries:
+                stack.enter_context(lock)
+            yield
+    finally:
+        with _document_locks_guard:
+            for key, entry in zip(keys, entries):
+                entry[1] -= 1
+                if not entry[1]:
+                    del _document_locks[key]
+
+
+def _run_queued_job(job: dict, queued_at: float):
+    ADMISSION_QUEUE_DEPTH.labels("ingestion").dec()
+    with _document_lock(job):
+        ADMISSION_WAIT_SECONDS.labels("ingestion").observe(time.perf_counter() - queued_at)
+        with ADMISSION_IN_FLIGHT.labels("ingestion").track_inprogress():
+            _run_ingestion_job(job)
+
+
+def _submit(job: dict):
+    """Runs `job` on the worker pool; a slot must have been reserved for it."""
+    ADMISSION_QUEUE_DEPTH.labels("ingestion").inc()
+    # Run in the submitting request's context, so the job's log lines carry its trace id
+    _executor.submit(contextvars.copy_context().run, _run_queued_job, job, time.perf_counter())
+
+
+def upload_path(job_id: str, filename: str) -> str:
+    return os.path.join(UPLOAD_DIR, f"{job_id}_{os.path.basename(filename)}")
+
+
+def save_upload(file_obj, file_path: str) -> str:
+    """Copies an upload to disk, hashing it on the way. Returns the sha256 hex digest.
+
+    Raises UploadTooLarge past MAX_UPLOAD_BYTES, leaving the partial file for the caller.
+    """
+    digest = hashlib.sha256()
+    written = 0
+    with open(file_path, "wb") as buffer:
+        while block := file_obj.read(_COPY_BUFFER_SIZE):
+            written += len(block)
+            if written > MAX_UPLOAD_BYTES:
+                raise UploadTooLarge()
+            digest.update(block)
+            buffer.write(block)
+    return digest.hexdigest()
+
+
+def enqueue_file(job_id: str, file_path: str, filename: str, content_hash: str,
+                 tenant_id: str = DEFAULT_TENANT) -> dict:
+    """Queues a file already stored at `file_path` in UPLOAD_DIR for indexing
+    into `tenant_id`'s collection, under `job_id`.
+
+    Returns `{"job_id", "file_id", "duplicate"}` immediately. If a file with
+    identical content is already indexed for the tenant, nothing is queued,
+    the file is removed and its existing `file_id` is returned. Otherwise the
+    job owns the file and progress is tracked in `ingestion_jobs`. Raises
+    IngestionQueueFull, leaving the file in place, when the backlog is full.
+    """
+    duplicate = get_document_by_hash(content_hash, tenant_id)
+    if duplicate is not None:
+        os.remove(file_path)
+        return {"job_id": None, "file_id": duplicate['id'], "duplicate": True}
+
+    _reserve_slot()
+    insert_ingestion_job(job_id, filename, file_path, content_hash, tenant_id)
+    _submit({"id": job_id, "file_path": file_path, "filename": filename,
+             "content_hash": content_hash, "tenant_id": tenant_id})
+    return {"job_id": job_id, "file_id": None, "duplicate": False}
+
+
+def enqueue_upload(file_obj, filename: str, tenant_id: str = DEFAULT_TENANT) -> dict:
+    """Persists an uploaded file into UPLOAD_DIR and queues it for indexing
+    (see `enqueue_file`)."""
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    job_id = str(uuid.uuid4())
+    file_path = upload_path(job_id, filename)
+    try:
+        content_hash = save_upload(file_obj, file_path)
+        return enqueue_file(job_id, file_path, filename, content_hash, tenant_id)
+    except (UploadTooLarge, IngestionQueueFull):
+        os.remove(file_path)
+        raise
+
+
+def resume_unfinished_jobs():
+    """Re-queues jobs interrupted by a restart, or marks them failed if the
+    upload is gone. Indexing is idempotent per chunk id, so a resumed job
+    skips chunks that were already embedded before the interruption."""
+    for job in get_unfinished_ingestion_jobs():
+        if not job['file_path'] or not os.path.exists(job['file_path']):
+            if job['file_id'] is not None and not job['is_revision']:
+                delete_doc_from_chroma(job['file_id'], job['tenant_id'] or DEFAULT_TENANT)
+                delete_document_record(job['file_id'])
+            update_ingestion_job(job['id'], status="failed",
+                                 error="Interrupted by restart; upload no longer available.")
+            continue
+
+        update_ingestion_job(job['id'], status="queued", stage="queued", pages_parsed=0,
+                             chunks_total=0, chunks_embedded=0, chunks_unchanged=0)
+        try:
+            _reserve_slot()
+            _submit(job)
+            logger.info(f"Resumed ingestion job {job['id']}")
+        except IngestionQueueFull as e:
+            update_ingestion_job(job['id'], status="failed", error=str(e))
+
+
+def shutdown_ingestion_workers():
+    # Running jobs are left 'running' and picked up by resume_unfinished_jobs
+    _executor.shutdown(wait=False, cancel_futures=True)
@@ -1,12 +1,45 @@
 import os
-from langchain_groq import ChatGroq
+import time
+import asyncio
+import logging
+import threading
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.runnables import RunnableLambda
-from api.chroma_utils import vectorstore
+from api.chroma_utils import get_vectorstore, get_lexical_index, get_cached_embedding_function
+from api.retrieval_utils import HybridRetriever, ShardedRetriever, RETRIEVAL_K
+from api.tenant_utils import DEFAULT_TENANT
+from api.rerank_utils import reranker, RERANK_ENABLED, RERANK_CANDIDATES
+from api.context_utils import pack_context, format_context, count_context_tokens
+from api.answer_cache import answer_cache, ANSWER_CACHE_ENABLED
+from api.llm_registry import get_llm
+from api.metrics_utils import RAG_STAGE_SECONDS, observe_stages
+from api.rephrase_utils import needs_rephrase, is_cacheable_question, REPHRASE_MODEL
+from api.history_utils import HISTORY_SUMMARY_ENABLED
+from api.db_utils import get_turns_to_summarize, update_session_summary
+
+logger = logging.getLogger(__name__)
+
+_retriever_lock = threading.Lock()
+_retrievers = {}
+
+
+def _shard_retriever(tenant_id):
+    retriever = _retrievers.get(tenant_id)
+    if retriever is None:
+        vectorstore, lexical_index = get_vectorstore(tenant_id), get_lexical_index(tenant_id)
+        with _retriever_lock:
+            retriever = _retrievers.setdefault(tenant_id, HybridRetriever(
+                vectorstore=vectorstore, lexical_index=lexical_index))
+    return retriever
+
+
+def get_retriever(tenant_ids=(DEFAULT_TENANT,)):
+    """BM25 + dense retriever over the tenants' shards, fused (k can be overridden
+    per request). Shards are opened on first use; several are searched in parallel."""
+    shards = [_shard_retriever(tenant_id) for tenant_id in dict.fromkeys(tenant_ids)]
+    return shards[0] if len(shards) == 1 else ShardedRetriever(shards=shards)
 
-# Initialize retriever
-retriever = vectorstore.as_retriever(search_kwargs={"k": 2})
 
 # Prompt to rephrase the question into a standalone version
 rephrase_prompt = ChatPromptTemplate.from_messages([
@@ -15,6 +48,13 @@ rephrase_prompt = ChatPromptTemplate.from_messages([
     ("human", "{input}"),
 ])
 
+# Prompt to fold turns that left the history window into the running summary
+summary_prompt = ChatPromptTemplate.from_messages([
+    ("system", "Update the running summary of a conversation with the new turns. "
+               "Keep names, numbers and decisions; stay under 150 words."),
+    ("human", "Current summary:\n{summary}\n\nNew turns:\n{turns}"),
+])
+
 # Prompt for the final Q&A answer
 qa_prompt = ChatPromptTemplate.from_messages([
     ("system",
@@ -24,34 +64,312 @@ qa_prompt = ChatPromptTemplate.from_messages([
 ])
 
 
-def get_rag_chain(model="llama-3.3-70b-versatile"):
-    llm = ChatGroq(model=model, temperature=0)
+_chains_lock = threading.Lock()
+_chains = {}
+
+
+def get_model_chains(model="llama-3.3-70b-versatile"):
+    """Prebuilt runnables for `model`, composed once and shared across requests.
+
+    Returns a dict with the shared `llm` client, the `rephrase_model` name and
+    the `rephrase`, `answer` and full `rag` runnables.
+    """
+    with _chains_lock:
+        if model not in _chains:
+            llm = get_llm(model)
+            # Rephrasing is a small task, so it can be routed to a faster model
+            rephrase_model = REPHRASE_MODEL or model
+            chains = {
+                "llm": llm,
+                "rephrase_model": rephrase_model,
+                "rephrase": rephrase_prompt | get_llm(rephrase_model) | StrOutputParser(),
+                "answer": qa_prompt | llm | StrOutputParser(),
+            }
+            chains["rag"] = _build_rag_runnable(model, chains)
+            _chains[model] = chains
+        return _chains[model]
+
+
+def warm_up_chains(models):
+    """Creates clients and runnables ahead of the first request (called at startup)."""
+    for model in models:
+        get_model_chains(model)
+
+
+def _embed_query(text):
+    # Resolved per call, so the model is loaded on the calling worker thread
+    return get_cached_embedding_function().embed_query(text)
+
+
+def _ms(start):
+    return round((time.perf_counter() - start) * 1000, 1)
+
+
+def record_timings(model, timings, rephrase_path):
+    logger.info(f"RAG timings - Model: {model}, Rephrase: {rephrase_path}, " +
+                ", ".join(f"{stage}: {value}ms" for stage, value in timings.items()))
+    observe_stages(RAG_STAGE_SECONDS, {stage: value / 1000 for stage, value in timings.items()})
+
+
+def rephrase_question(chains, input_data, timings):
+    """Step A: Rephrase into a standalone question, but only when it's needed.
+
+    Returns (question, path) where path is "none" (no history), "skipped:<reason>"
+    or "rephrased:<model>:<reason>".
+    """
+    start = time.perf_counter()
+    rephrase, reason = needs_rephrase(
+        input_data["input"], input_data.get("chat_history"), _embed_query)
+    if rephrase:
+        standalone_q = chains["rephrase"].invoke(input_data)
+    else:
+        standalone_q = input_data["input"]
+    timings["rephrase"] = _ms(start)
+    return standalone_q, _rephrase_path(chains, rephrase, reason)
+
+
+async def arephrase_question(chains, input_data, timings):
+    start = time.perf_counter()
+    rephrase, reason = False, "no_history"
+    if input_data.get("chat_history"):
+        # The decision may embed the question (CPU), so keep it off the event loop
+        rephrase, reason = await asyncio.to_thread(
+            needs_rephrase, input_data["input"], input_data["chat_history"], _embed_query)
+    if rephrase:
+        standalone_q = await chains["rephrase"].ainvoke(input_data)
+    else:
+        standalone_q = input_data["input"]
+    timings["rephrase"] = _ms(start)
+    return standalone_q, _rephrase_path(chains, rephrase, reason)
+
+
+def _rephrase_path(chains, rephrased, reason):
+    if reason == "no_history":
+        return "none"
+    if rephrased:
+        return f"rephrased:{chains['rephrase_model']}:{reason}"
+    return f"skipped:{reason}"
+
+
+def _candidate_count(top_n):
+    # With reranking, the first stage fetches a wider set for the cross-encoder
+    return max(RERANK_CANDIDATES, top_n) if RERANK_ENABLED else top_n
+
+
+def _rerank_and_select(question, candidates, top_n, timings):
+    if RERANK_ENABLED:
+        start = time.perf_counter()
+        candidates, status = reranker.rerank(question, candidates)
+        timings["rerank"] = _ms(start)
+        if status != "reranked":
+            logger.info(f"Rerank skipped ({status}), using retriever order")
+    # Merge overlapping chunks, drop near-duplicates, fit the token budget
+    start = time.perf_counter()
+    docs = pack_context(candidates, top_n)
+    timings["pack"] = _ms(start)
+    return docs
+
+
+def retrieve_documents(question, timings, k=None, tenant_ids=None):
+    """Step B: Retrieve candidates from the tenants' shards, rerank them and keep
+    the best `k` that fit the context token budget (`k` overrides the default count)."""
+    top_n = k or RETRIEVAL_K
+    start = time.perf_counter()
+    candidates = get_retriever(tenant_ids or [DEFAULT_TENANT]).invoke(
+        question, k=_candidate_count(top_n))
+    timings["retrieve"] = _ms(start)
+    return _rerank_and_select(question, candidates, top_n, timings)
+
 
+async def aretrieve_documents(question, timings, k=None, tenant_ids=None):
+    top_n = k or RETRIEVAL_K
+    tenant_ids = tenant_ids or [DEFAULT_TENANT]
+    start = time.perf_counter()
+    if all(tenant_id in _retrievers for tenant_id in tenant_ids):
+        retriever = get_retriever(tenant_ids)
+    else:
+        # Opening a shard may load the embedding model, so not on the event loop
+        retriever = await asyncio.to_thread(get_retriever, tenant_ids)
+    candidates = await retriever.ainvoke(question, k=_candidate_count(top_n))
+    timings["retrieve"] = _ms(start)
+    # Cross-encoder scoring is CPU-bound, so keep it off the event loop
+    return await asyncio.to_thread(_rerank_and_select, question, candidates, top_n, timings)
+
+
+def _cache_key(model, input_data):
+    # Answers built from a different number of chunks, or from other tenants'
+    # documents, aren't interchangeable
+    key = model
+    tenant_ids = input_data.get("tenant_ids")
+    if tenant_ids and list(tenant_ids) != [DEFAULT_TENANT]:
+        key += "@tenants=" + ",".join(sorted(set(tenant_ids)))
+    k = input_data.get("k")
+    return f"{key}@k={k}" if k else key
+
+
+def _use_answer_cache(question, rephrase_path):
+    return ANSWER_CACHE_ENABLED and is_cacheable_question(
+        question, rephrase_path.startswith("rephrased:"))
+
+
+def lookup_cached_answer(question, model, timings, rephrase_path="none"):
+    """Semantic cache lookup on the standalone question.
+
+    Returns (question_vector, entry); the vector is reused when storing the
+    answer on a miss. Both are None when the cache is disabled or the question
+    is too short to share (see `is_cacheable_question`).
+    """
+    if not _use_answer_cache(question, rephrase_path):
+        return None, None
+    start = time.perf_counter()
+    # Memoized, so the retriever's own embedding of this question is free
+    vector = get_cached_embedding_function().embed_query(question)
+    entry = answer_cache.lookup(vector, model)
+    timings["cache_lookup"] = _ms(start)
+    return vector, entry
+
+
+async def alookup_cached_answer(question, model, timings, rephrase_path="none"):
+    if not _use_answer_cache(question, rephrase_path):
+        return None, None
+    return await asyncio.to_thread(lookup_cached_answer, question, model, timings, rephrase_path)
+
+
+def cache_answer(vector, model, answer, docs):
+    # Answers without context can't be invalidated by document changes, so skip them
+    if vector is not None and docs:
+        answer_cache.store(vector, model, answer, docs,
+                           {d.metadata.get('file_id') for d in docs})
+
+
+def build_qa_inputs(docs, input_data):
+    return {
+        "context": format_context(docs),
+        "chat_history": input_data["chat_history"],
+        "input": input_data["input"]
+    }
+
+
+def _build_rag_runnable(model, chains):
     def rag_logic(input_data):
-        # Step A: Rephrase if history exists
-        if input_data.get("chat_history"):
-            rephrase_chain = rephrase_prompt | llm | StrOutputParser()
-            standalone_q = rephrase_chain.invoke(input_data)
-        else:
-            standalone_q = input_data["input"]
+        timings = {}
+        question, rephrase_path = rephrase_question(
+            chains, input_data, timings)
+        cache_key = _cache_key(model, input_data)
+        vector, cached = lookup_cached_answer(question, cache_key, timings, rephrase_path)
+        if cached:
+            record_timings(model, timings, rephrase_path)
+            return {"answer": cached["answer"], "context": cached["context"],
+                    "context_tokens": count_context_tokens(cached["context"]),
+                    "timings": timings, "cached": True, "rephrase_path": rephrase_path}
 
-        # Step B: Retrieve relevant documents
-        docs = retriever.invoke(standalone_q)
-        context_text = "\n\n".join(d.page_content for d in docs)
+        docs = retrieve_documents(question, timings, input_data.get("k"), input_data.get("tenant_ids"))
 
         # Step C: Generate Answer
-        final_chain = qa_prompt | llm | StrOutputParser()
-        answer = final_chain.invoke({
-            "context": context_text,
-            "chat_history": input_data["chat_history"],
-            "input": input_data["input"]
-        })
+        start = time.perf_counter()
+        answer = chains["answer"].invoke(build_qa_inputs(docs, input_data))
+        timings["generate"] = _ms(start)
+        record_timings(model, timings, rephrase_path)
+        cache_answer(vector, cache_key, answer, docs)
 
         # CRITICAL UPDATE: Return a dictionary to match referencing project structure
         # This allows main.py to extract result['answer'] and metadata for sources
         return {
             "answer": answer,
-            "context": docs  # Pass the original Doc objects so metadata can be extracted
+            "context": docs,  # Pass the original Doc objects so metadata can be extracted
+            "context_tokens": count_context_tokens(docs),
+            "timings": timings,
+            "cached": False,
+            "rephrase_path": rephrase_path
         }
 
-    return RunnableLambda(rag_logic)
+    async def arag_logic(input_data):
+        timings = {}
+        question, rephrase_path = await arephrase_question(
+            chains, input_data, timings)
+        cache_key = _cache_key(model, input_data)
+        vector, cached = await alookup_cached_answer(question, cache_key, timings, rephrase_path)
+        if cached:
+            record_timings(model, timings, rephrase_path)
+            return {"answer": cached["answer"], "context": cached["context"],
+                    "context_tokens": count_context_tokens(cached["context"]),
+                    "timings": timings, "cached": True, "rephrase_path": rephrase_path}
+
+        docs = await aretrieve_documents(question, timings, input_data.get("k"), input_data.get("tenant_ids"))
+
+        start = time.perf_counter()
+        answer = await chains["answer"].ainvoke(build_qa_inputs(docs, input_data))
+        timings["generate"] = _ms(start)
+        record_timings(model, timings, rephrase_path)
+        cache_answer(vector, cache_key, answer, docs)
+        return {"answer": answer, "context": docs, "context_tokens": count_context_tokens(docs),
+                "timings": timings, "cached": False, "rephrase_path": rephrase_path}
+
+    # `ainvoke` on this runnable uses the async path end to end
+    return RunnableLambda(rag_logic, afunc=arag_logic)
+
+
+def get_rag_chain(model="llama-3.3-70b-versatile"):
+    return get_model_chains(model)["rag"]
+
+
+async def astream_rag_answer(input_data, model="llama-3.3-70b-versatile"):
+    """Streaming variant of the RAG chain (async generator).
+
+    Yields ("rephrase_path", path), then ("context", docs) once retrieval is
+    done, so sources can be shown before generation starts, then ("token", text)
+    for each chunk of the answer.
+    """
+    chains = get_model_chains(model)
+    timings = {}
+    question, rephrase_path = await arephrase_question(chains, input_data, timings)
+    yield "rephrase_path", rephrase_path
+    cache_key = _cache_key(model, input_data)
+    vector, cached = await alookup_cached_answer(question, cache_key, timings, rephrase_path)
+    if cached:
+        record_timings(model, timings, rephrase_path)
+        yield "context", cached["context"]
+        yield "token", cached["answer"]
+        return
+
+    docs = await aretrieve_documents(question, timings, input_data.get("k"), input_data.get("tenant_ids"))
+    yield "context", docs
+
+    tokens = []
+    start = time.perf_counter()
+    async for token in chains["answer"].astream(build_qa_inputs(docs, input_data)):
+        if "first_token" not in timings:
+            timings["first_token"] = _ms(start)
+        tokens.append(token)
+        yield "token", token
+    timings["generate"] = _ms(start)
+    record_timings(model, timings, rephrase_path)
+    cache_answer(vector, cache_key, "".join(tokens), docs)
+
+
+_summarizing = set()
+
+
+async def aupdate_history_summary(session_id, model="llama-3.3-70b-versatile"):
+    """Rolls turns that fell out of the history window into the session summary.
+
+    Runs as a background task after a response; no-op unless HISTORY_SUMMARY_ENABLED.
+    """
+    if not HISTORY_SUMMARY_ENABLED or session_id in _summarizing:
+        return
+    _summarizing.add(session_id)
+    try:
+        summary, turns = await asyncio.to_thread(get_turns_to_summarize, session_id)
+        if not turns:
+            return
+        chain = summary_prompt | get_llm(
+            REPHRASE_MODEL or model) | StrOutputParser()
+        new_summary = await chain.ainvoke({
+            "summary": summary or "(none)",
+            "turns": "\n".join(f"User: {q}\nAssistant: {a}" for _, q, a in turns)
+        })
+        await asyncio.to_thread(update_session_summary, session_id, new_summary, turns[-1][0])
+    except Exception as e:
+        logger.warning(f"History summary update failed for {session_id}: {str(e)}")
+    finally:
+        _summarizing.discard(session_id)
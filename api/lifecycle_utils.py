@@ -0,0 +1,90 @@
+import os
+import time
+import logging
+import threading
+from typing import List
+from api.db_utils import init_db, pool
+from api.chroma_utils import get_cached_embedding_function, backfill_lexical_index, loaded_components
+from api.langchain_utils import get_retriever, warm_up_chains
+from api.rerank_utils import reranker, RERANK_ENABLED
+from api.token_utils import load_tokenizer, tokenizer_status
+from api.llm_registry import loaded_llm_models
+
+logger = logging.getLogger(__name__)
+
+# "background": serve at once and load models in a thread (/readyz is 503 until
+# they are loaded); "blocking": load them before accepting requests;
+# "off": each model is loaded by the first request that needs it
+WARMUP_MODE = os.getenv("WARMUP_MODE", "background").lower()
+
+# Components a request needs; "unavailable" ones have a fallback and don't block readiness
+REQUIRED_COMPONENTS = ("database", "embeddings", "vectorstore", "lexical_index", "reranker", "tokenizer")
+
+_lock = threading.Lock()
+_thread = None
+_state = {"status": "pending", "steps": {}, "duration_ms": None}
+
+
+def _backfill_lexical_index():
+    # One-time migration: chunks indexed before the BM25 index existed
+    backfilled = backfill_lexical_index()
+    if backfilled:
+        logger.info(f"Added {backfilled} existing chunks to the BM25 index")
+
+
+def _step(name, func):
+    start = time.perf_counter()
+    try:
+        func()
+        _state["steps"][name] = {"ms": round((time.perf_counter() - start) * 1000, 1)}
+    except Exception as e:
+        logger.warning(f"Warm-up step {name} failed: {str(e)}")
+        _state["steps"][name] = {"ms": round((time.perf_counter() - start) * 1000, 1),
+                                 "error": str(e)}
+
+
+def run_warm_up(models: List[str]):
+    """Loads every model and client ahead of the first request, one step at a time.
+
+    A failed step is logged and recorded, and the component is retried lazily
+    by the first request that needs it.
+    """
+    start = time.perf_counter()
+    _state["status"] = "running"
+    _step("database", init_db)
+    # Embeds once too, so one-off kernel setup isn't paid by the first query
+    _step("embeddings", lambda: get_cached_embedding_function().embed_query("warm-up"))
+    _step("retriever", get_retriever)
+    _step("bm25_backfill", _backfill_lexical_index)
+    _step("tokenizer", load_tokenizer)
+    if RERANK_ENABLED:
+        _step("reranker", reranker.warm_up)
+    _step("llm_clients", lambda: warm_up_chains(models))
+    _state["duration_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    _state["status"] = "done"
+    logger.info(f"Warm-up finished in {_state['duration_ms']}ms")
+
+
+def start_warm_up(models: List[str]):
+    """Runs the warm-up on a daemon thread, so startup isn't held up by model loading."""
+    global _thread
+    with _lock:
+        if _thread is None or not _thread.is_alive():
+            _thread = threading.Thread(target=run_warm_up, args=(models,),
+                                       name="model-warm-up", daemon=True)
+            _thread.start()
+
+
+def readiness() -> dict:
+    """Load state of each component; `ready` once everything a request needs is loaded."""
+    components = {"database": "loaded" if pool.initialized else "not_loaded",
+                  **loaded_components(),
+                  "reranker": reranker.status(),
+                  "tokenizer": tokenizer_status()}
+    ready = WARMUP_MODE == "off" or all(
+        components[name] in ("loaded", "disabled", "unavailable") for name in REQUIRED_COMPONENTS)
+    return {"ready": ready,
+            "warmup": {"mode": WARMUP_MODE, "status": _state["status"],
+                       "steps": dict(_state["steps"]), "duration_ms": _state["duration_ms"]},
+            "components": components,
+            "llm_clients": loaded_llm_models()}
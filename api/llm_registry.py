@@ -0,0 +1,142 @@
+import os
+import time
+import random
+import asyncio
+import logging
+import threading
+from typing import TYPE_CHECKING, Dict, List, Optional
+import httpx
+from api.metrics_utils import LLM_RETRIES, TokenUsageHandler
+
+if TYPE_CHECKING:
+    from langchain_groq import ChatGroq
+
+logger = logging.getLogger(__name__)
+
+# Connection-pool limits shared by every Groq client in the process
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(
+    os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "20"))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+# Retries of a Groq request that hit a rate limit (429), a server error or a
+# failed connection, with jittered exponential backoff starting at
+# LLM_RETRY_BASE_DELAY seconds. A Retry-After longer than LLM_RETRY_MAX_DELAY
+# is not waited for; the error goes back to the client instead.
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5"))
+LLM_RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "20"))
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+_lock = threading.Lock()
+_clients: Dict[str, "ChatGroq"] = {}
+_http_client = None
+_http_async_client = None
+
+
+def _retry_delay(attempt: int, response: Optional[httpx.Response]) -> Optional[float]:
+    """Seconds to wait before retry number `attempt` (from 0), or None to give up."""
+    if attempt >= LLM_MAX_RETRIES:
+        return None
+    retry_after = 0.0
+    if response is not None:
+        try:
+            retry_after = float(response.headers.get("retry-after", 0))
+        except ValueError:
+            pass
+        if retry_after > LLM_RETRY_MAX_DELAY:
+            return None
+    backoff = min(LLM_RETRY_MAX_DELAY, LLM_RETRY_BASE_DELAY * 2 ** attempt)
+    # Random jitter on top of Retry-After, so requests throttled together don't all come back together
+    return retry_after + random.uniform(0, backoff)
+
+
+class _RetryTransport(httpx.HTTPTransport):
+    def handle_request(self, request):
+        attempt = 0
+        while True:
+            try:
+                response = super().handle_request(request)
+            except httpx.ConnectError:
+                response = None
+                delay = _retry_delay(attempt, None)
+                if delay is None:
+                    raise
+            else:
+                if response.status_code not in RETRY_STATUSES:
+                    return response
+                delay = _retry_delay(attempt, response)
+                if delay is None:
+                    return response
+                response.close()
+            LLM_RETRIES.labels(str(response.status_code) if response is not None else "connect_error").inc()
+            time.sleep(delay)
+            attempt += 1
+
+
+class _AsyncRetryTransport(httpx.AsyncHTTPTransport):
+    async def handle_async_request(self, request):
+        attempt = 0
+        while True:
+            try:
+                response = await super().handle_async_request(request)
+            except httpx.ConnectError:
+                response = None
+                delay = _retry_delay(attempt, None)
+                if delay is None:
+                    raise
+            else:
+                if response.status_code not in RETRY_STATUSES:
+                    return response
+                delay = _retry_delay(attempt, response)
+                if delay is None:
+                    return response
+                await response.aclose()
+            LLM_RETRIES.labels(str(response.status_code) if response is not None else "connect_error").inc()
+            await asyncio.sleep(delay)
+            attempt += 1
+
+
+def _http_clients():
+    """Keep-alive HTTP pools reused across models, so TLS handshakes happen once.
+    Their transports retry rate-limited and failed requests (the SDK's own
+    retries are turned off, so attempts don't multiply)."""
+    global _http_client, _http_async_client
+    if _http_client is None:
+        limits = httpx.Limits(max_connections=LLM_MAX_CONNECTIONS,
+                              max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+                              keepalive_expiry=LLM_KEEPALIVE_EXPIRY)
+        _http_client = httpx.Client(transport=_RetryTransport(limits=limits), timeout=LLM_TIMEOUT)
+        _http_async_client = httpx.AsyncClient(
+            transport=_AsyncRetryTransport(limits=limits), timeout=LLM_TIMEOUT)
+    return _http_client, _http_async_client
+
+
+def get_llm(model: str) -> "ChatGroq":
+    """Returns the long-lived client for `model`, creating it on first use."""
+    with _lock:
+        if model not in _clients:
+            # Imported here so the Groq SDK isn't loaded until a client is needed
+            from langchain_groq import ChatGroq
+            http_client, http_async_client = _http_clients()
+            _clients[model] = ChatGroq(model=model, temperature=0, timeout=LLM_TIMEOUT, max_retries=0,
+                                       http_client=http_client, http_async_client=http_async_client,
+                                       callbacks=[TokenUsageHandler(model)])
+            logger.info(f"Created LLM client for {model}")
+        return _clients[model]
+
+
+def loaded_llm_models() -> List[str]:
+    with _lock:
+        return list(_clients)
+
+
+async def close_llm_clients():
+    global _http_client, _http_async_client
+    with _lock:
+        _clients.clear()
+        http_client, http_async_client = _http_client, _http_async_client
+        _http_client = _http_async_client = None
+    if http_client is not None:
+        http_client.close()
+        await http_async_client.aclose()
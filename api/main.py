@@ -1,33 +1,86 @@
+import asyncio
 import numpy as np
 import os
 import uuid
-import shutil
 import logging
 import sys
+import json
+import base64
+import hashlib
+from typing import List, Optional
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 
 # FastAPI and Pydantic imports
-from fastapi import FastAPI, File, UploadFile, HTTPException, Request
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, File, Form, Query, UploadFile, HTTPException, Request, BackgroundTasks
+from fastapi.responses import JSONResponse, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from starlette.background import BackgroundTask
 
 # --- SMART IMPORT BLOCK ---
 # This allows the code to run from the root (Docker) OR from inside /api (Local)
 try:
-    from api.chroma_utils import index_document_to_chroma, delete_doc_from_chroma
+    from api.chroma_utils import embedding_cache_stats
+    from api.deletion_utils import delete_documents, process_deletion_outbox, retry_pending_deletions
     from api.db_utils import (
-        insert_application_logs, get_chat_history, get_all_documents,
-        insert_document_record, delete_document_record
+        ainsert_application_logs, aget_chat_history, list_documents_page, get_document_listing_version,
+        get_ingestion_job, get_all_ingestion_jobs, session_cache, close_db
+    )
+    from api.ingestion_utils import (
+        enqueue_upload, resume_unfinished_jobs, shutdown_ingestion_workers, IngestionQueueFull, UploadTooLarge
+    )
+    from api.upload_utils import (
+        create_upload_session, upload_status, append_chunk, complete_upload, abort_upload,
+        expire_stale_uploads, upload_slot, UploadsBusy, UploadConflict
+    )
+    from api.admission_utils import (
+        chat_admission, chat_session_limiter, chat_client_limiter, upload_client_limiter,
+        Overloaded, RateLimited, SlotStreamingResponse, upstream_retry_after
+    )
+    from api.langchain_utils import get_rag_chain, astream_rag_answer, aupdate_history_summary
+    from api.llm_registry import close_llm_clients
+    from api.answer_cache import answer_cache
+    from api.rerank_utils import reranker
+    from api.lifecycle_utils import run_warm_up, start_warm_up, readiness, WARMUP_MODE
+    from api.metrics_utils import RequestTracingMiddleware, TraceIdFilter, register_cache_stats
+    from api.context_utils import count_context_tokens
+    from api.tenant_utils import DEFAULT_TENANT, TENANT_ID_PATTERN
+    from api.parsing_utils import shutdown_parse_pool
+    from api.pydantic_models import (
+        ModelName, QueryInput, QueryResponse, DocumentPage, DeleteFileRequest, IngestionJobInfo, UploadResponse,
+        BulkUploadResponse, BulkDeleteRequest, BulkDeleteResponse, UploadSessionRequest, UploadSessionInfo
     )
-    from api.langchain_utils import get_rag_chain
-    from api.pydantic_models import QueryInput, QueryResponse, DocumentInfo, DeleteFileRequest
 except ModuleNotFoundError:
-    from chroma_utils import index_document_to_chroma, delete_doc_from_chroma
+    from chroma_utils import embedding_cache_stats
+    from deletion_utils import delete_documents, process_deletion_outbox, retry_pending_deletions
     from db_utils import (
-        insert_application_logs, get_chat_history, get_all_documents,
-        insert_document_record, delete_document_record
+        ainsert_application_logs, aget_chat_history, list_documents_page, get_document_listing_version,
+        get_ingestion_job, get_all_ingestion_jobs, session_cache, close_db
+    )
+    from ingestion_utils import (
+        enqueue_upload, resume_unfinished_jobs, shutdown_ingestion_workers, IngestionQueueFull, UploadTooLarge
+    )
+    from upload_utils import (
+        create_upload_session, upload_status, append_chunk, complete_upload, abort_upload,
+        expire_stale_uploads, upload_slot, UploadsBusy, UploadConflict
+    )
+    from admission_utils import (
+        chat_admission, chat_session_limiter, chat_client_limiter, upload_client_limiter,
+        Overloaded, RateLimited, SlotStreamingResponse, upstream_retry_after
+    )
+    from langchain_utils import get_rag_chain, astream_rag_answer, aupdate_history_summary
+    from llm_registry import close_llm_clients
+    from answer_cache import answer_cache
+    from rerank_utils import reranker
+    from lifecycle_utils import run_warm_up, start_warm_up, readiness, WARMUP_MODE
+    from metrics_utils import RequestTracingMiddleware, TraceIdFilter, register_cache_stats
+    from context_utils import count_context_tokens
+    from tenant_utils import DEFAULT_TENANT, TENANT_ID_PATTERN
+    from parsing_utils import shutdown_parse_pool
+    from pydantic_models import (
+        ModelName, QueryInput, QueryResponse, DocumentPage, DeleteFileRequest, IngestionJobInfo, UploadResponse,
+        BulkUploadResponse, BulkDeleteRequest, BulkDeleteResponse, UploadSessionRequest, UploadSessionInfo
     )
-    from langchain_utils import get_rag_chain
-    from pydantic_models import QueryInput, QueryResponse, DocumentInfo, DeleteFileRequest
 
 # Load variables from .env file
 load_dotenv()
@@ -37,17 +90,58 @@ if int(np.__version__.split('.')[0]) >= 2:
     os.environ["NUMPY_EXPERIMENTAL_ARRAY_FUNCTION"] = "0"
 
 # 1. Advanced Logging Configuration
+# Every line carries the trace id of the request it was logged for ("-" outside requests)
+log_handlers = [logging.FileHandler("app.log"), logging.StreamHandler()]
+for handler in log_handlers:
+    handler.addFilter(TraceIdFilter())
 logging.basicConfig(
     level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.FileHandler("app.log"),
-        logging.StreamHandler()
-    ]
+    format="%(asctime)s - %(name)s - %(levelname)s - [%(trace_id)s] %(message)s",
+    handlers=log_handlers
 )
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="RAG Chatbot Production API")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Pick up ingestion jobs that were interrupted by the last shutdown/crash
+    resume_unfinished_jobs()
+    expired = expire_stale_uploads()
+    if expired:
+        logger.info(f"Discarded {expired} abandoned chunked uploads")
+    # Finish deletions committed to SQLite but not yet applied to the vector store
+    try:
+        completed = process_deletion_outbox()
+        if completed:
+            logger.info(f"Applied {completed} pending document deletions")
+    except Exception as e:
+        logger.warning(f"Deletion outbox not processed: {str(e)}")
+    # Keep retrying deletions that fail while the API runs
+    deletion_retries = asyncio.create_task(retry_pending_deletions())
+    # Load models, indexes and LLM clients before the first request needs them
+    models = [model.value for model in ModelName]
+    if WARMUP_MODE == "blocking":
+        await asyncio.to_thread(run_warm_up, models)
+    elif WARMUP_MODE == "background":
+        start_warm_up(models)
+    yield
+    deletion_retries.cancel()
+    shutdown_ingestion_workers()
+    shutdown_parse_pool()
+    await close_llm_clients()
+    # Last, so logs written by in-flight requests are still flushed
+    close_db()
+
+
+app = FastAPI(title="RAG Chatbot Production API", lifespan=lifespan)
+# Trace id per request (X-Request-ID) and request latency histograms
+app.add_middleware(RequestTracingMiddleware)
+
+# Cache hit/miss counters on /metrics, read from the caches when scraped
+register_cache_stats("embedding", embedding_cache_stats)
+register_cache_stats("answer", answer_cache.stats)
+register_cache_stats("history", session_cache.stats)
+register_cache_stats("rerank", reranker.stats)
 
 # 2. Global Exception Handler
 
@@ -62,92 +156,403 @@ async def global_exception_handler(request: Request, exc: Exception):
     )
 
 
+def get_sources(docs):
+    return list(set([doc.metadata.get('filename', 'Unknown') for doc in docs]))
+
+
+def query_tenants(query_input: QueryInput) -> List[str]:
+    return query_input.tenant_ids or [query_input.tenant_id]
+
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def client_key(request: Request) -> str:
+    return request.client.host if request.client else "unknown"
+
+
+def rate_limit(limiter, key: str, cost: int = 1):
+    try:
+        limiter.acquire(key, cost)
+    except RateLimited as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+
+def admit_chat(request: Request, session_id: Optional[str]):
+    """Token buckets per client and per session; a 429 once either is used up."""
+    rate_limit(chat_client_limiter, client_key(request))
+    if session_id:
+        rate_limit(chat_session_limiter, session_id)
+
+
+def overloaded_error(e: Overloaded) -> HTTPException:
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+
+def upstream_rate_limited_error(retry_after: int) -> HTTPException:
+    return HTTPException(status_code=503, detail="The language model is rate limiting requests.",
+                         headers={"Retry-After": str(retry_after)})
+
+
 @app.post("/chat", response_model=QueryResponse)
-def chat(query_input: QueryInput):
+async def chat(query_input: QueryInput, request: Request, background_tasks: BackgroundTasks):
     session_id = query_input.session_id or str(uuid.uuid4())
     logger.info(
         f"Chat Request - Session: {session_id}, Model: {query_input.model.value}")
+    admit_chat(request, query_input.session_id)
 
     try:
-        chat_history = get_chat_history(session_id)
-        rag_chain = get_rag_chain(query_input.model.value)
+        # At most CHAT_MAX_CONCURRENCY requests retrieve and generate at once
+        async with chat_admission.slot():
+            chat_history = await aget_chat_history(session_id)
+            rag_chain = get_rag_chain(query_input.model.value)
 
-        result = rag_chain.invoke({
-            "input": query_input.question,
-            "chat_history": chat_history
-        })
+            result = await rag_chain.ainvoke({
+                "input": query_input.question,
+                "chat_history": chat_history,
+                "k": query_input.k,
+                "tenant_ids": query_tenants(query_input)
+            })
 
         answer = result.get(
             'answer', "I'm sorry, I couldn't generate an answer.")
-        sources = list(set([doc.metadata.get('filename', 'Unknown')
-                       for doc in result.get('context', [])]))
+        sources = get_sources(result.get('context', []))
 
-        insert_application_logs(
+        await ainsert_application_logs(
             session_id, query_input.question, answer, query_input.model.value)
+        background_tasks.add_task(
+            aupdate_history_summary, session_id, query_input.model.value)
 
         return QueryResponse(
             answer=answer,
             session_id=session_id,
             model=query_input.model,
-            sources=sources
+            sources=sources,
+            cached=result.get('cached', False),
+            rephrase_path=result.get('rephrase_path'),
+            context_tokens=result.get('context_tokens')
         )
 
+    except Overloaded as e:
+        raise overloaded_error(e)
     except Exception as e:
+        retry_after = upstream_retry_after(e)
+        if retry_after is not None:
+            logger.warning(f"Groq rate limit in /chat endpoint: {str(e)}")
+            raise upstream_rate_limited_error(retry_after)
         logger.error(f"Error in /chat endpoint: {str(e)}")
         raise HTTPException(
             status_code=500, detail="Failed to process chat request.")
 
 
-@app.post("/upload-doc")
-def upload_and_index_document(file: UploadFile = File(...)):
-    allowed_extensions = ['.pdf', '.docx']
-    file_extension = os.path.splitext(file.filename)[1].lower()
+@app.post("/chat/stream")
+async def chat_stream(query_input: QueryInput, request: Request):
+    """Server-Sent Events variant of /chat.
+
+    Emits a `metadata` event (session id, model, sources, rephrase path, context
+    tokens) as soon as retrieval finishes, then one `token` event per generated
+    chunk, then `done`. The full answer is logged to the session history once
+    the stream completes.
+    """
+    session_id = query_input.session_id or str(uuid.uuid4())
+    logger.info(
+        f"Streaming Chat Request - Session: {session_id}, Model: {query_input.model.value}")
+    admit_chat(request, query_input.session_id)
+    try:
+        # Held until the answer has been streamed (see event_stream)
+        release = await chat_admission.acquire()
+    except Overloaded as e:
+        raise overloaded_error(e)
+    try:
+        chat_history = await aget_chat_history(session_id)
+    except BaseException:
+        release()
+        raise
+
+    async def event_stream():
+        tokens = []
+        rephrase_path = None
+        try:
+            async for kind, payload in astream_rag_answer(
+                    {"input": query_input.question, "chat_history": chat_history,
+                     "k": query_input.k, "tenant_ids": query_tenants(query_input)},
+                    query_input.model.value):
+                if kind == "rephrase_path":
+                    rephrase_path = payload
+                elif kind == "context":
+                    yield sse_event("metadata", {
+                        "session_id": session_id,
+                        "model": query_input.model.value,
+                        "sources": get_sources(payload),
+                        "rephrase_path": rephrase_path,
+                        "context_tokens": count_context_tokens(payload)
+                    })
+                elif payload:
+                    tokens.append(payload)
+                    yield sse_event("token", {"text": payload})
+        except Exception as e:
+            retry_after = upstream_retry_after(e)
+            if retry_after is not None:
+                logger.warning(f"Groq rate limit in /chat/stream endpoint: {str(e)}")
+                yield sse_event("error", {"detail": "The language model is rate limiting requests.",
+                                          "retry_after": retry_after})
+                return
+            logger.error(f"Error in /chat/stream endpoint: {str(e)}")
+            yield sse_event("error", {"detail": "Failed to process chat request."})
+            return
+        finally:
+            release()
+
+        await ainsert_application_logs(
+            session_id, query_input.question, "".join(tokens), query_input.model.value)
+        yield sse_event("done", {"session_id": session_id})
+
+    return SlotStreamingResponse(event_stream(), release, media_type="text/event-stream",
+                                 headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+                                 background=BackgroundTask(aupdate_history_summary, session_id, query_input.model.value))
+
+
+ALLOWED_EXTENSIONS = ['.pdf', '.docx']
+
+
+def is_supported_file(filename: str) -> bool:
+    return os.path.splitext(filename)[1].lower() in ALLOWED_EXTENSIONS
 
-    if file_extension not in allowed_extensions:
+
+@app.post("/upload-doc", response_model=UploadResponse, status_code=202)
+def upload_and_index_document(request: Request, file: UploadFile = File(...),
+                               tenant_id: str = Form(DEFAULT_TENANT, pattern=TENANT_ID_PATTERN)):
+    if not is_supported_file(file.filename):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported file type. Allowed: {', '.join(ALLOWED_EXTENSIONS)}"
+        )
+
+    rate_limit(upload_client_limiter, client_key(request))
+    try:
+        with upload_slot():
+            result = enqueue_upload(file.file, file.filename, tenant_id)
+    except (IngestionQueueFull, UploadsBusy) as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    return queued_upload_response(result, file.filename)
+
+
+def queued_upload_response(result: dict, filename: str) -> UploadResponse:
+    if result['duplicate']:
+        logger.info(
+            f"Skipped identical upload of {filename} (file ID {result['file_id']})")
+        return UploadResponse(message="Identical file already indexed.", file_id=result['file_id'],
+                              duplicate=True)
+
+    logger.info(f"Queued ingestion job {result['job_id']} for: {filename}")
+    return UploadResponse(message="File queued for indexing.", job_id=result['job_id'])
+
+
+@app.post("/upload-docs", response_model=BulkUploadResponse, status_code=202)
+def upload_and_index_documents(request: Request, files: List[UploadFile] = File(...),
+                                tenant_id: str = Form(DEFAULT_TENANT, pattern=TENANT_ID_PATTERN)):
+    """Queues many files at once; they are parsed in parallel across the parser pool."""
+    rate_limit(upload_client_limiter, client_key(request), len(files))
+    job_ids, duplicates, rejected = [], {}, []
+    queue_full = False
+    try:
+        with upload_slot():
+            for file in files:
+                if not is_supported_file(file.filename):
+                    rejected.append(file.filename)
+                    continue
+                try:
+                    result = enqueue_upload(file.file, file.filename, tenant_id)
+                except (IngestionQueueFull, UploadTooLarge) as e:
+                    queue_full = queue_full or isinstance(e, IngestionQueueFull)
+                    rejected.append(file.filename)
+                    continue
+                if result['duplicate']:
+                    duplicates[file.filename] = result['file_id']
+                else:
+                    job_ids.append(result['job_id'])
+    except UploadsBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
+    if not job_ids and not duplicates and rejected:
+        raise HTTPException(
+            status_code=503 if queue_full else 400,
+            detail=f"No files were queued. Rejected: {', '.join(rejected)}")
+
+    logger.info(f"Queued {len(job_ids)} ingestion jobs ({len(rejected)} rejected)")
+    return BulkUploadResponse(
+        message=f"{len(job_ids)} file(s) queued for indexing.", job_ids=job_ids,
+        duplicates=duplicates, rejected=rejected)
+
+
+@app.post("/uploads", response_model=UploadSessionInfo, status_code=201)
+def start_chunked_upload(upload: UploadSessionRequest, request: Request):
+    """Starts a resumable upload for large files: send the bytes in order with
+    PUT /uploads/{upload_id}?offset=N, then POST /uploads/{upload_id}/complete."""
+    if not is_supported_file(upload.filename):
         raise HTTPException(
             status_code=400,
-            detail=f"Unsupported file type. Allowed: {', '.join(allowed_extensions)}"
+            detail=f"Unsupported file type. Allowed: {', '.join(ALLOWED_EXTENSIONS)}"
         )
+    rate_limit(upload_client_limiter, client_key(request))
+    try:
+        return create_upload_session(upload.filename, upload.size, upload.tenant_id)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+
+@app.get("/uploads/{upload_id}", response_model=UploadSessionInfo)
+def get_chunked_upload(upload_id: str):
+    """Progress of a chunked upload; `offset` is where the next chunk starts."""
+    status = upload_status(upload_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Upload not found.")
+    return status
 
-    temp_file_path = f"temp_{uuid.uuid4()}_{file.filename}"
 
+@app.put("/uploads/{upload_id}", response_model=UploadSessionInfo)
+async def upload_chunk(upload_id: str, request: Request, offset: int = Query(..., ge=0)):
+    """Appends the raw request body at `offset`, streamed to disk as it arrives.
+    409 if `offset` isn't where the upload stands (GET it and resume from there)."""
     try:
-        with open(temp_file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        status = await append_chunk(upload_id, offset, request.stream())
+    except UploadsBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except UploadConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if status is None:
+        raise HTTPException(status_code=404, detail="Upload not found.")
+    return status
 
-        file_id = insert_document_record(file.filename)
-        success = index_document_to_chroma(temp_file_path, file_id)
 
-        if success:
-            logger.info(f"Successfully uploaded and indexed: {file.filename}")
-            return {"message": "File indexed successfully.", "file_id": file_id}
-        else:
-            delete_document_record(file_id)
-            raise HTTPException(
-                status_code=500, detail="Document indexing failed.")
-    finally:
-        if os.path.exists(temp_file_path):
-            os.remove(temp_file_path)
+@app.post("/uploads/{upload_id}/complete", response_model=UploadResponse, status_code=202)
+def complete_chunked_upload(upload_id: str):
+    """Queues a fully received chunked upload for indexing, like /upload-doc."""
+    try:
+        result = complete_upload(upload_id)
+    except UploadConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except IngestionQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    if result is None:
+        raise HTTPException(status_code=404, detail="Upload not found.")
+    return queued_upload_response(result, result['filename'])
 
 
-@app.get("/list-docs", response_model=list[DocumentInfo])
-def list_documents():
-    return get_all_documents()
+@app.delete("/uploads/{upload_id}")
+def abort_chunked_upload(upload_id: str):
+    try:
+        found = abort_upload(upload_id)
+    except UploadConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if not found:
+        raise HTTPException(status_code=404, detail="Upload not found.")
+    return {"message": "Upload discarded."}
+
+
+@app.get("/jobs/{job_id}", response_model=IngestionJobInfo)
+def get_job(job_id: str):
+    job = get_ingestion_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job
+
+
+@app.get("/jobs", response_model=list[IngestionJobInfo])
+def list_jobs(limit: int = 100):
+    return get_all_ingestion_jobs(limit)
+
+
+def encode_cursor(doc: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps([doc['upload_timestamp'], doc['id']]).encode()).decode()
+
+
+def decode_cursor(cursor: str):
+    try:
+        upload_timestamp, file_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return str(upload_timestamp), int(file_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+
+
+@app.get("/list-docs", response_model=DocumentPage)
+def list_documents(request: Request, response: Response,
+                   tenant_id: str = Query(DEFAULT_TENANT, pattern=TENANT_ID_PATTERN),
+                   limit: int = Query(50, ge=1, le=500),
+                   cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+                   search: Optional[str] = Query(None, max_length=200, description="Filename substring")):
+    """A page of the tenant's documents, newest first. The ETag is tied to the
+    query and changes with any change to the tenant's documents, so a client
+    sending it back in If-None-Match gets a 304 without the listing being read."""
+    query = hashlib.sha256(json.dumps([tenant_id, limit, cursor, search or None]).encode()).hexdigest()[:16]
+    etag = f'"{get_document_listing_version(tenant_id)}-{query}"'
+    if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+    after = decode_cursor(cursor) if cursor else None
+    docs = list_documents_page(tenant_id, limit + 1, after, search or None)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+    return DocumentPage(documents=docs[:limit],
+                        next_cursor=encode_cursor(docs[limit - 1]) if len(docs) > limit else None)
+
+
+@app.get("/cache-stats")
+def cache_stats():
+    """Hit/miss counters for the caches, suitable for scraping."""
+    return {"embedding_cache": embedding_cache_stats(),
+            "answer_cache": answer_cache.stats(),
+            "history_cache": session_cache.stats(),
+            "reranker": reranker.stats()}
+
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus metrics: per-stage latency of chat and ingestion, tokens,
+    retrieval result sizes, cache hits and HTTP latency."""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and serving; never touches models or storage."""
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+def readyz():
+    """Readiness: 200 once the models a request needs are loaded, 503 until then."""
+    report = readiness()
+    return JSONResponse(status_code=200 if report["ready"] else 503, content=report)
 
 
 @app.post("/delete-doc")
 def delete_document(request: DeleteFileRequest):
     logger.info(f"Deletion Request for File ID: {request.file_id}")
-    chroma_success = delete_doc_from_chroma(request.file_id)
-    if chroma_success:
-        db_success = delete_document_record(request.file_id)
-        if db_success:
-            return {"message": f"Successfully deleted document {request.file_id}"}
+    result = delete_documents([request.file_id], request.tenant_id)
+    if result['not_found']:
+        raise HTTPException(status_code=404, detail="Document not found.")
+    if result['deleted']:
+        return {"message": f"Successfully deleted document {request.file_id}"}
 
     raise HTTPException(
         status_code=500, detail="System failed to delete the document.")
 
 
+@app.post("/delete-docs", response_model=BulkDeleteResponse)
+def delete_documents_bulk(request: BulkDeleteRequest):
+    """Deletes many documents in one request, in batches of id-only deletes."""
+    logger.info(f"Bulk deletion request for {len(request.file_ids)} file IDs")
+    result = delete_documents(request.file_ids, request.tenant_id)
+    message = f"{len(result['deleted'])} document(s) deleted."
+    if result['pending']:
+        logger.warning(f"{len(result['pending'])} deletions left in the outbox for retry")
+        message += f" {len(result['pending'])} pending, retried on the next startup."
+    return BulkDeleteResponse(message=message, **result)
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,143 @@
+import os
+import re
+import time
+import uuid
+import logging
+import contextvars
+from typing import Callable, Dict
+from langchain_core.callbacks import BaseCallbackHandler
+from prometheus_client import Counter, Gauge, Histogram, REGISTRY
+from prometheus_client.core import CounterMetricFamily
+
+# Header carrying the request's trace id; a valid id sent by the client is
+# reused, otherwise one is generated. Echoed on every response.
+TRACE_ID_HEADER = os.getenv("TRACE_ID_HEADER", "X-Request-ID")
+
+_TRACE_ID_PATTERN = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+_trace_id = contextvars.ContextVar("trace_id", default="-")
+
+# Stage latencies span a cached embedding lookup (~1 ms) to an LLM call (seconds)
+STAGE_BUCKETS = (.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30, 60)
+
+RAG_STAGE_SECONDS = Histogram(
+    "rag_stage_duration_seconds", "Time spent in each stage of the RAG pipeline",
+    ["stage"], buckets=STAGE_BUCKETS)
+INGESTION_STAGE_SECONDS = Histogram(
+    "ingestion_stage_duration_seconds", "Time spent per document in each indexing stage",
+    ["stage"], buckets=STAGE_BUCKETS + (120, 300))
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "HTTP request latency, until the response body is sent",
+    ["method", "route", "status"], buckets=STAGE_BUCKETS)
+LLM_TOKENS = Counter(
+    "llm_tokens", "Tokens sent to (input) and generated by (output) the LLM, as reported by Groq",
+    ["model", "direction"])
+LLM_RETRIES = Counter(
+    "llm_retries", "Groq requests retried after a rate limit, server error or failed connection",
+    ["reason"])
+ADMISSION_IN_FLIGHT = Gauge(
+    "admission_in_flight", "Requests holding a slot (chat) or jobs running (ingestion)", ["queue"])
+ADMISSION_QUEUE_DEPTH = Gauge(
+    "admission_queue_depth", "Requests or jobs waiting for a slot", ["queue"])
+ADMISSION_WAIT_SECONDS = Histogram(
+    "admission_wait_seconds", "Time spent waiting for a slot before being served",
+    ["queue"], buckets=STAGE_BUCKETS)
+ADMISSION_REJECTED = Counter(
+    "admission_rejected", "Requests turned away: queue_full, queue_timeout or rate_limited",
+    ["queue", "reason"])
+RETRIEVAL_RESULTS = Histogram(
+    "retrieval_results", "Documents returned per search of one shard",
+    ["source"], buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200))
+
+
+class TraceIdFilter(logging.Filter):
+    """Adds the current request's trace id to log records as `trace_id`."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.trace_id = _trace_id.get()
+        return True
+
+
+class RequestTracingMiddleware:
+    """ASGI middleware: binds a trace id to each HTTP request for its log lines,
+    returns it in TRACE_ID_HEADER and records the request latency by route."""
+
+    def __init__(self, app):
+        self.app = app
+        self.header = TRACE_ID_HEADER.lower().encode("latin-1")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        incoming = dict(scope["headers"]).get(self.header, b"").decode("latin-1")
+        trace_id = incoming if _TRACE_ID_PATTERN.match(incoming) else uuid.uuid4().hex
+        token = _trace_id.set(trace_id)
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_trace_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = [*message.get("headers", []),
+                                      (self.header, trace_id.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_trace_id)
+        finally:
+            # Route templates, not raw paths, so job ids don't each get a series
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUEST_SECONDS.labels(scope["method"], route, str(status)).observe(
+                time.perf_counter() - start)
+            _trace_id.reset(token)
+
+
+class TokenUsageHandler(BaseCallbackHandler):
+    """Counts the token usage Groq reports for each call of one model
+    (streamed calls report it in the final chunk)."""
+
+    run_inline = True
+
+    def __init__(self, model: str):
+        self.model = model
+
+    def on_llm_end(self, response, **kwargs):
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    LLM_TOKENS.labels(self.model, "input").inc(usage.get("input_tokens", 0))
+                    LLM_TOKENS.labels(self.model, "output").inc(usage.get("output_tokens", 0))
+
+
+def observe_stages(histogram: Histogram, seconds: Dict[str, float]):
+    for stage, value in seconds.items():
+        histogram.labels(stage).observe(value)
+
+
+class _CacheStatsCollector:
+    """Exposes the hit/miss counters the caches already keep (see /cache-stats)
+    as cache_hits_total / cache_misses_total, read at scrape time."""
+
+    def __init__(self):
+        self.sources: Dict[str, Callable[[], dict]] = {}
+
+    def collect(self):
+        hits = CounterMetricFamily("cache_hits", "Cache hits", labels=["cache"])
+        misses = CounterMetricFamily("cache_misses", "Cache misses", labels=["cache"])
+        for name, stats in list(self.sources.items()):
+            values = stats()
+            hits.add_metric([name], values.get("hits", values.get("cache_hits", 0)))
+            misses.add_metric([name], values.get("misses", values.get("cache_misses", 0)))
+        yield hits
+        yield misses
+
+
+_cache_stats_collector = _CacheStatsCollector()
+REGISTRY.register(_cache_stats_collector)
+
+
+def register_cache_stats(name: str, stats: Callable[[], dict]):
+    """Publishes the `hits`/`misses` (or `cache_hits`/`cache_misses`) of `stats()` on /metrics."""
+    _cache_stats_collector.sources[name] = stats
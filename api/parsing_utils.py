@@ -0,0 +1,96 @@
+import os
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Tuple
+import docx2txt
+from pypdf import PdfReader
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from langchain_core.documents import Document
+
+# NOTE: This module is imported by the parser worker processes, so it must stay
+# free of heavy imports (torch, sentence-transformers, Chroma).
+
+# Number of parser processes shared by all ingestion jobs
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", str(os.cpu_count() or 2)))
+# Pages handed to a worker per task; smaller means smoother progress and less memory
+PAGES_PER_TASK = int(os.getenv("PARSE_PAGES_PER_TASK", "8"))
+# Tasks in flight per document; bounds how many parsed pages sit in memory at once
+MAX_PENDING_TASKS = int(os.getenv("PARSE_MAX_PENDING_TASKS",
+                                  str(PARSE_WORKERS * 2)))
+
+text_splitter = RecursiveCharacterTextSplitter(
+    chunk_size=1000, chunk_overlap=200, length_function=len)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_parse_pool() -> ProcessPoolExecutor:
+    """Returns the shared parser pool, starting it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # 'spawn' keeps workers from inheriting the API's threads and model weights
+            _pool = ProcessPoolExecutor(
+                max_workers=PARSE_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def shutdown_parse_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def _split_pdf_pages(file_path: str, start: int, stop: int) -> Tuple[int, List[Document]]:
+    """Worker task: extracts pages [start, stop) of a PDF and splits them."""
+    reader = PdfReader(file_path)
+    pages = [
+        Document(page_content=reader.pages[number].extract_text(),
+                 metadata={"source": file_path, "page": number, "total_pages": len(reader.pages)})
+        for number in range(start, stop)
+    ]
+    return len(pages), text_splitter.split_documents(pages)
+
+
+def _split_docx(file_path: str) -> Tuple[int, List[Document]]:
+    """Worker task: DOCX has no page structure, so the whole body is one unit."""
+    document = Document(page_content=docx2txt.process(file_path),
+                        metadata={"source": file_path})
+    return 1, text_splitter.split_documents([document])
+
+
+def iter_document_chunks(file_path: str) -> Iterator[Tuple[int, List[Document]]]:
+    """Streams a document through the parser pool.
+
+    Yields `(pages_parsed, chunks)` per completed task, in page order. At most
+    MAX_PENDING_TASKS tasks are outstanding, so memory stays bounded by the
+    page window rather than the file size.
+    """
+    pool = get_parse_pool()
+
+    if file_path.endswith('.pdf'):
+        total_pages = len(PdfReader(file_path).pages)
+        tasks = ((_split_pdf_pages, file_path, start, min(start + PAGES_PER_TASK, total_pages))
+                 for start in range(0, total_pages, PAGES_PER_TASK))
+    elif file_path.endswith('.docx'):
+        tasks = iter([(_split_docx, file_path)])
+    else:
+        raise ValueError(f"Unsupported file type: {file_path}")
+
+    pending = deque()
+    try:
+        for task in tasks:
+            pending.append(pool.submit(*task))
+            if len(pending) >= MAX_PENDING_TASKS:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        # Consumer stopped early (error or cancellation): drop queued work
+        for future in pending:
+            future.cancel()
@@ -1,7 +1,10 @@
 from pydantic import BaseModel, Field, ConfigDict
 from enum import Enum
 from datetime import datetime
-from typing import List, Optional
+from typing import Annotated, Dict, List, Optional
+from api.tenant_utils import DEFAULT_TENANT, TENANT_ID_PATTERN
+
+TenantId = Annotated[str, Field(pattern=TENANT_ID_PATTERN)]
 
 
 class ModelName(str, Enum):
@@ -14,6 +17,13 @@ class QueryInput(BaseModel):
     session_id: Optional[str] = Field(
         default=None, description="The unique session ID for the chat history")
     model: ModelName = Field(default=ModelName.LLAMA_3_3)
+    k: Optional[int] = Field(
+        default=None, ge=1, le=20, description="Number of chunks to retrieve (server default if omitted)")
+    tenant_id: TenantId = Field(
+        default=DEFAULT_TENANT, description="Tenant (workspace) whose documents are searched")
+    tenant_ids: Optional[List[TenantId]] = Field(
+        default=None, min_length=1, max_length=16,
+        description="Search several tenants' collections at once (overrides tenant_id)")
 
 
 class QueryResponse(BaseModel):
@@ -23,6 +33,12 @@ class QueryResponse(BaseModel):
     # ADDED: Optional list of document sources for better UI feedback
     sources: Optional[List[str]] = Field(
         default=[], description="List of filenames used to generate the answer")
+    cached: bool = Field(
+        default=False, description="True if served from the semantic answer cache")
+    rephrase_path: Optional[str] = Field(
+        default=None, description="How the question was prepared: 'none', 'skipped:<reason>' or 'rephrased:<model>:<reason>'")
+    context_tokens: Optional[int] = Field(
+        default=None, description="Tokens of retrieved context packed into the prompt")
 
 
 class DocumentInfo(BaseModel):
@@ -32,10 +48,94 @@ class DocumentInfo(BaseModel):
     # ADDED: To help the UI display file size or type if needed
     file_size: Optional[int] = Field(
         default=None, description="Size of the file in bytes")
+    chunk_count: Optional[int] = Field(
+        default=None, description="Number of chunks indexed (unset until indexing completes)")
+    tenant_id: Optional[str] = None
+
+
+class DocumentPage(BaseModel):
+    documents: List[DocumentInfo]
+    next_cursor: Optional[str] = Field(
+        default=None, description="Pass as `cursor` to fetch the next page; unset on the last page")
+
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    # The document was deleted while it was being indexed
+    CANCELLED = "cancelled"
+
+
+class IngestionJobInfo(BaseModel):
+    id: str
+    filename: str
+    file_id: Optional[int] = None
+    tenant_id: Optional[str] = None
+    status: JobStatus
+    # One of: queued, parsing, embedding, done
+    stage: str
+    pages_parsed: int = 0
+    chunks_total: int = 0
+    chunks_embedded: int = 0
+    # Chunks of a new revision left as they were instead of being embedded again
+    chunks_unchanged: int = 0
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
+
+class UploadResponse(BaseModel):
+    message: str
+    job_id: Optional[str] = None
+    # Set when an identical file was already indexed and nothing was queued
+    file_id: Optional[int] = None
+    duplicate: bool = False
+
+
+class UploadSessionRequest(BaseModel):
+    filename: str
+    size: int = Field(gt=0, description="Total size of the file in bytes")
+    tenant_id: TenantId = DEFAULT_TENANT
+
+
+class UploadSessionInfo(BaseModel):
+    upload_id: str
+    filename: str
+    tenant_id: str
+    size: int
+    # Bytes received so far; the next chunk must start here
+    offset: int
+    chunk_size: int = Field(description="Suggested chunk size in bytes")
+
+
+class BulkUploadResponse(BaseModel):
+    message: str
+    job_ids: List[str]
+    # Filename -> existing file_id for files that were already indexed
+    duplicates: Dict[str, int] = Field(default={})
+    # Files that were not queued (unsupported type or ingestion queue full)
+    rejected: List[str] = Field(default=[])
 
 
 class DeleteFileRequest(BaseModel):
     file_id: int
+    tenant_id: TenantId = DEFAULT_TENANT
+
+
+class BulkDeleteRequest(BaseModel):
+    file_ids: List[int] = Field(..., min_length=1, max_length=10000)
+    tenant_id: TenantId = DEFAULT_TENANT
+
+
+class BulkDeleteResponse(BaseModel):
+    message: str
+    deleted: List[int]
+    # Unknown ids, or ids owned by another tenant
+    not_found: List[int] = Field(default=[])
+    # Removed from the document list but still in the vector store; retried at startup
+    pending: List[int] = Field(default=[])
 
 # ADDED: A standard success/failure response model for general API actions
 
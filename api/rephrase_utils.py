@@ -0,0 +1,74 @@
+import os
+import re
+from typing import Callable, List, Tuple
+import numpy as np
+from langchain_core.messages import HumanMessage
+
+# Model used for the rephrase step; empty means "same model as the answer"
+REPHRASE_MODEL = os.getenv("REPHRASE_MODEL", "llama-3.1-8b-instant")
+# Questions shorter than this (in words) are checked against the previous turn
+REPHRASE_MIN_WORDS = int(os.getenv("REPHRASE_MIN_WORDS", "6"))
+# Questions of at most this many words ("Why?", "How much?") are always rephrased
+REPHRASE_TERSE_MAX_WORDS = int(os.getenv("REPHRASE_TERSE_MAX_WORDS", "3"))
+# Short questions at least this similar to the previous question count as follow-ups
+REPHRASE_SIMILARITY_THRESHOLD = float(
+    os.getenv("REPHRASE_SIMILARITY_THRESHOLD", "0.5"))
+
+# Pronouns that only make sense with the previous turns in view
+_ANAPHORA = re.compile(
+    r"\b(it|its|they|them|their|theirs|he|him|his|she|her|hers|"
+    r"former|latter|aforementioned)\b", re.IGNORECASE)
+# Demonstratives standing alone at the start or end ("That one?", "Why is that?");
+# elsewhere ("the policy that applies", "is there a limit") they are left to the
+# length and similarity checks
+_DEMONSTRATIVE = re.compile(
+    r"^\s*(this|that|these|those|same|such)\b|\b(this|that|these|those)\s*[?.!]*\s*$", re.IGNORECASE)
+# Openers that continue the previous question rather than ask a new one
+_CONTINUATION = re.compile(
+    r"^\s*(and|also|but|so|then|what about|how about|why not|what else|anything else|"
+    r"more|elaborate|explain further|go on|continue)\b", re.IGNORECASE)
+
+
+def _cosine(a, b) -> float:
+    a, b = np.asarray(a, dtype=np.float32), np.asarray(b, dtype=np.float32)
+    denominator = np.linalg.norm(a) * np.linalg.norm(b)
+    return float(a @ b / denominator) if denominator else 0.0
+
+
+def needs_rephrase(question: str, chat_history: List,
+                   embed_query: Callable[[str], List[float]]) -> Tuple[bool, str]:
+    """Cheap local check for whether `question` depends on the chat history.
+
+    Returns (decision, reason). Pronouns, leading or trailing demonstratives and
+    continuation openers always trigger a rephrase, as do terse questions of a
+    few words, which can't be compared meaningfully with the previous one.
+    Other short questions are rephrased only when they are semantically close
+    to the previous question (a short follow-up). Anything else is treated as
+    already standalone.
+    """
+    if not chat_history:
+        return False, "no_history"
+    if _ANAPHORA.search(question) or _DEMONSTRATIVE.search(question):
+        return True, "anaphora"
+    if _CONTINUATION.search(question):
+        return True, "continuation"
+    words = len(question.split())
+    if words <= REPHRASE_TERSE_MAX_WORDS:
+        return True, "terse"
+    if words < REPHRASE_MIN_WORDS:
+        previous = next((m.content for m in reversed(chat_history)
+                         if isinstance(m, HumanMessage)), None)
+        if previous is None:
+            return True, "short_question"
+        if _cosine(embed_query(question), embed_query(previous)) >= REPHRASE_SIMILARITY_THRESHOLD:
+            return True, "short_follow_up"
+    return False, "standalone"
+
+
+def is_cacheable_question(question: str, rephrased: bool) -> bool:
+    """Whether answers to `question` may be shared through the answer cache.
+
+    A short question that wasn't rewritten ("Why?" with no history, or one
+    judged standalone) may still mean different things in different sessions.
+    """
+    return rephrased or len(question.split()) >= REPHRASE_MIN_WORDS
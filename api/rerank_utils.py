@@ -0,0 +1,150 @@
+import os
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import List, Tuple
+from langchain_core.documents import Document
+
+logger = logging.getLogger(__name__)
+
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "true").lower() == "true"
+RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+# First-stage candidates fetched before reranking
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "30"))
+# Skip reranking (keep retriever order) when scoring would take longer than this
+RERANK_LATENCY_BUDGET_MS = float(os.getenv("RERANK_LATENCY_BUDGET_MS", "400"))
+# Each latency fallback shrinks the per-pair estimate by this factor
+RERANK_FALLBACK_DECAY = float(os.getenv("RERANK_FALLBACK_DECAY", "0.8"))
+RERANK_SCORE_CACHE_SIZE = int(os.getenv("RERANK_SCORE_CACHE_SIZE", "20000"))
+
+
+def _content_key(doc: Document) -> str:
+    return doc.metadata.get("chunk_hash") or hashlib.sha256(
+        doc.page_content.encode("utf-8")).hexdigest()
+
+
+class CrossEncoderReranker:
+    """Scores (question, chunk) pairs with a small CPU cross-encoder.
+
+    All uncached candidates of a request are scored as one batch. Scores are
+    memoized per (question, chunk content) in an LRU, and the per-pair cost is
+    tracked (EWMA) so a request that would exceed `latency_budget_ms` keeps the
+    retriever's order instead; the estimate decays on each such fallback, so
+    reranking resumes once scoring is fast enough again. The model is loaded on first use; if it can't
+    be loaded, reranking is disabled for the life of the process.
+    """
+
+    def __init__(self, model_name: str = RERANK_MODEL, latency_budget_ms: float = RERANK_LATENCY_BUDGET_MS,
+                 cache_size: int = RERANK_SCORE_CACHE_SIZE):
+        self.model_name = model_name
+        self.latency_budget_ms = latency_budget_ms
+        self.cache_size = cache_size
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.fallbacks = 0
+        self._model = None
+        self._unavailable = False
+        self._ms_per_pair = None
+        self._load_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._scores = OrderedDict()
+
+    def _get_model(self):
+        with self._load_lock:
+            if self._model is None and not self._unavailable:
+                try:
+                    from sentence_transformers import CrossEncoder
+                    self._model = CrossEncoder(self.model_name, device="cpu")
+                except Exception as e:
+                    self._unavailable = True
+                    logger.warning(
+                        f"Reranker {self.model_name} unavailable, keeping retriever order: {str(e)}")
+            return self._model
+
+    def warm_up(self):
+        model = self._get_model()
+        if model is not None:
+            # The first call pays one-off setup costs and isn't timed; the cost
+            # estimate is then taken from a batch the size of a real request
+            model.predict([("warm up", "warm up")], show_progress_bar=False)
+            self._timed_predict(model, [("warm up question", "warm up passage of a typical chunk")]
+                                * RERANK_CANDIDATES)
+
+    def _timed_predict(self, model, pairs):
+        start = time.perf_counter()
+        scores = model.predict(pairs, batch_size=len(pairs),
+                               show_progress_bar=False)
+        per_pair = (time.perf_counter() - start) * 1000 / len(pairs)
+        self._ms_per_pair = per_pair if self._ms_per_pair is None else (
+            0.8 * self._ms_per_pair + 0.2 * per_pair)
+        return [float(score) for score in scores]
+
+    def rerank(self, question: str, docs: List[Document]) -> Tuple[List[Document], str]:
+        """Returns (docs best first, status); status is "reranked", "disabled" or "fallback:<why>"."""
+        if not docs:
+            return docs, "reranked"
+        model = self._get_model()
+        if model is None:
+            return docs, "disabled"
+
+        question_key = hashlib.sha256(question.encode("utf-8")).hexdigest()
+        keys = [(question_key, _content_key(doc)) for doc in docs]
+        with self._lock:
+            scores = {key: self._scores[key]
+                      for key in keys if key in self._scores}
+            for key in scores:
+                self._scores.move_to_end(key)
+            self.cache_hits += len(scores)
+        missing = [(key, doc)
+                   for key, doc in zip(keys, docs) if key not in scores]
+
+        if missing:
+            self.cache_misses += len(missing)
+            if self._ms_per_pair is not None and self._ms_per_pair * len(missing) > self.latency_budget_ms:
+                self.fallbacks += 1
+                # Only scoring measures the cost again, so let the estimate decay: after a
+                # few fallbacks a request is scored and a transient slowdown is forgotten
+                self._ms_per_pair *= RERANK_FALLBACK_DECAY
+                return docs, "fallback:latency_budget"
+            try:
+                new_scores = self._timed_predict(
+                    model, [(question, doc.page_content) for _, doc in missing])
+            except Exception as e:
+                logger.warning(f"Reranking failed, keeping retriever order: {str(e)}")
+                self.fallbacks += 1
+                return docs, "fallback:error"
+            with self._lock:
+                for (key, _), score in zip(missing, new_scores):
+                    scores[key] = self._scores[key] = score
+                while len(self._scores) > self.cache_size:
+                    self._scores.popitem(last=False)
+
+        # Stable sort, so equal scores keep the retriever's order
+        order = sorted(range(len(docs)), key=lambda i: -scores[keys[i]])
+        return [docs[i] for i in order], "reranked"
+
+    def status(self) -> str:
+        """"disabled", "unavailable" (falls back to retriever order), "loaded" or "not_loaded"."""
+        if not RERANK_ENABLED:
+            return "disabled"
+        if self._unavailable:
+            return "unavailable"
+        return "loaded" if self._model is not None else "not_loaded"
+
+    def stats(self) -> dict:
+        lookups = self.cache_hits + self.cache_misses
+        return {
+            "enabled": RERANK_ENABLED and not self._unavailable,
+            "model": self.model_name,
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "cache_hit_rate": self.cache_hits / lookups if lookups else 0.0,
+            "cache_entries": len(self._scores),
+            "fallbacks": self.fallbacks,
+            "ms_per_pair": round(self._ms_per_pair, 3) if self._ms_per_pair is not None else None,
+        }
+
+
+reranker = CrossEncoderReranker()
@@ -0,0 +1,159 @@
+import os
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+)
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.vectorstores import VectorStore
+from api.bm25_index import BM25Index, tokenize
+from api.metrics_utils import RAG_STAGE_SECONDS, RETRIEVAL_RESULTS
+
+# "hybrid" (BM25 + vectors, fused), "vector" or "lexical"
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")
+# Chunks passed to the LLM when the request doesn't set k
+RETRIEVAL_K = int(os.getenv("RETRIEVAL_K", "2"))
+# Candidates fetched from each retriever before fusion, per returned chunk
+RETRIEVAL_CANDIDATES_PER_K = int(os.getenv("RETRIEVAL_CANDIDATES_PER_K", "5"))
+# Reciprocal-rank-fusion constant; larger values flatten the rank weighting
+RRF_K = int(os.getenv("RRF_K", "60"))
+# Weight of the BM25 ranking in the fusion when the question contains an
+# identifier (part number, clause id, code), where dense search is weakest
+RRF_IDENTIFIER_LEXICAL_WEIGHT = float(
+    os.getenv("RRF_IDENTIFIER_LEXICAL_WEIGHT", "2.0"))
+# Threads searching shards concurrently when a query spans several tenants
+RETRIEVAL_FANOUT_WORKERS = int(os.getenv("RETRIEVAL_FANOUT_WORKERS", "8"))
+
+_fanout_executor = ThreadPoolExecutor(
+    max_workers=RETRIEVAL_FANOUT_WORKERS, thread_name_prefix="shard-search")
+
+
+def chunk_key(doc: Document) -> Optional[str]:
+    return doc.metadata.get("chunk_id") or doc.id
+
+
+def has_identifier(query: str) -> bool:
+    """True if `query` has a token mixing digits with letters or separators,
+    e.g. "HX-4821-B", "X200" or "7.3.2" (but not a bare number like "2023")."""
+    return any(not token.isdigit() and any(c.isdigit() for c in token)
+               for token in tokenize(query))
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], rrf_k: int = RRF_K,
+                           weights: Optional[List[float]] = None) -> List[str]:
+    """Merges ranked id lists: each id scores sum(weight / (rrf_k + rank)).
+
+    Ties keep the order in which ids first appear, so the first ranking wins them.
+    """
+    weights = weights or [1.0] * len(rankings)
+    scores: Dict[str, float] = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, key in enumerate(ranking, start=1):
+            scores[key] = scores.get(key, 0.0) + weight / (rrf_k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+class HybridRetriever(BaseRetriever):
+    """Fuses dense (Chroma) and lexical (BM25) candidates with reciprocal-rank fusion.
+
+    Dense search handles paraphrases; BM25 catches exact part numbers, clause
+    ids and names that MiniLM embeds poorly. `k` can be overridden per call:
+    `retriever.invoke(question, k=5)`.
+    """
+
+    vectorstore: VectorStore
+    lexical_index: BM25Index
+    k: int = RETRIEVAL_K
+    mode: str = RETRIEVAL_MODE
+    candidates_per_k: int = RETRIEVAL_CANDIDATES_PER_K
+    rrf_k: int = RRF_K
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun,
+                                k: Optional[int] = None, mode: Optional[str] = None) -> List[Document]:
+        return self._search(query, k, mode)
+
+    async def _aget_relevant_documents(self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun,
+                                       k: Optional[int] = None, mode: Optional[str] = None) -> List[Document]:
+        # Both searches are local and blocking (Chroma, SQLite, embedding)
+        return await asyncio.to_thread(self._search, query, k, mode)
+
+    def _search(self, query: str, k: Optional[int], mode: Optional[str]) -> List[Document]:
+        k = k or self.k
+        mode = mode or self.mode
+        fetch_k = max(k * self.candidates_per_k, k)
+
+        dense = []
+        if mode != "lexical":
+            # Embedded separately so its cost shows apart from the HNSW search
+            with RAG_STAGE_SECONDS.labels("embed_query").time():
+                embedding = self.vectorstore.embeddings.embed_query(query)
+            with RAG_STAGE_SECONDS.labels("vector_search").time():
+                dense = self.vectorstore.similarity_search_by_vector(embedding, k=fetch_k)
+            RETRIEVAL_RESULTS.labels("vector").observe(len(dense))
+            if mode == "vector":
+                return dense[:k]
+        with RAG_STAGE_SECONDS.labels("lexical_search").time():
+            lexical_ids = [chunk_id for chunk_id,
+                           _ in self.lexical_index.search(query, fetch_k)]
+        RETRIEVAL_RESULTS.labels("lexical").observe(len(lexical_ids))
+        if mode == "lexical":
+            return self._load(lexical_ids[:k], {})
+
+        by_key = {chunk_key(doc): doc for doc in dense}
+        lexical_weight = RRF_IDENTIFIER_LEXICAL_WEIGHT if has_identifier(
+            query) else 1.0
+        fused = reciprocal_rank_fusion(
+            [lexical_ids, list(by_key)], self.rrf_k, [lexical_weight, 1.0])[:k]
+        return self._load(fused, by_key)
+
+    def _load(self, keys: List[str], known: Dict[str, Document]) -> List[Document]:
+        """Documents for `keys` in order, fetching lexical-only hits from the vector store."""
+        missing = [key for key in keys if key not in known]
+        if missing:
+            with RAG_STAGE_SECONDS.labels("fetch_chunks").time():
+                found = self.vectorstore.get(
+                    ids=missing, include=["documents", "metadatas"])
+            for key, text, metadata in zip(found["ids"], found["documents"], found["metadatas"]):
+                known[key] = Document(id=key, page_content=text,
+                                      metadata=metadata or {})
+        # Ids removed from Chroma but not yet from the index are dropped here
+        return [known[key] for key in keys if key in known]
+
+
+class ShardedRetriever(BaseRetriever):
+    """Searches several shards (one `HybridRetriever` per tenant collection) in
+    parallel and merges their rankings with reciprocal-rank fusion.
+
+    Each shard returns its own top `k`, so the merge interleaves the shards'
+    best hits rather than comparing scores from different indexes.
+    """
+
+    shards: List[HybridRetriever]
+    k: int = RETRIEVAL_K
+    rrf_k: int = RRF_K
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun,
+                                k: Optional[int] = None, mode: Optional[str] = None) -> List[Document]:
+        k = k or self.k
+        results = _fanout_executor.map(lambda shard: shard._search(query, k, mode), self.shards)
+        return self._merge(list(results), k)
+
+    async def _aget_relevant_documents(self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun,
+                                       k: Optional[int] = None, mode: Optional[str] = None) -> List[Document]:
+        k = k or self.k
+        results = await asyncio.gather(
+            *(asyncio.to_thread(shard._search, query, k, mode) for shard in self.shards))
+        return self._merge(results, k)
+
+    def _merge(self, results: List[List[Document]], k: int) -> List[Document]:
+        by_key = {}
+        for docs in results:
+            for doc in docs:
+                by_key.setdefault(chunk_key(doc), doc)
+        fused = reciprocal_rank_fusion(
+            [[chunk_key(doc) for doc in docs] for docs in results], self.rrf_k)
+        return [by_key[key] for key in fused[:k]]
@@ -0,0 +1,193 @@
+import os
+import queue
+import sqlite3
+import logging
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Connections kept open per database; callers beyond this wait for a free one
+SQLITE_POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", "8"))
+# How long SQLite retries on a locked database before raising
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+# Page cache per connection, in KiB
+SQLITE_CACHE_KIB = int(os.getenv("SQLITE_CACHE_KIB", "16384"))
+SQLITE_MMAP_BYTES = int(os.getenv("SQLITE_MMAP_BYTES", str(64 * 1024 * 1024)))
+# Group commit: rows queued while the previous batch commits form the next
+# batch (up to BATCH_SIZE). A non-zero delay also waits for late arrivals,
+# trading per-row latency for larger batches.
+LOG_WRITER_BATCH_SIZE = int(os.getenv("LOG_WRITER_BATCH_SIZE", "128"))
+LOG_WRITER_MAX_DELAY_MS = float(os.getenv("LOG_WRITER_MAX_DELAY_MS", "0"))
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, timeout=SQLITE_BUSY_TIMEOUT_MS / 1000,
+                           check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    # WAL lets readers run alongside the single writer; NORMAL only fsyncs at
+    # checkpoints, which is still crash-safe in WAL mode
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    conn.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_KIB}")
+    conn.execute(f"PRAGMA mmap_size={SQLITE_MMAP_BYTES}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA foreign_keys=ON")
+    return conn
+
+
+class SQLitePool:
+    """Fixed-size pool of tuned, long-lived SQLite connections.
+
+    A connection is used by one thread at a time; `connection()` commits on
+    success and rolls back on error before handing it back. Nothing is opened
+    until first use; `setup`, if given, runs once on the first connection
+    (e.g. CREATE TABLE IF NOT EXISTS) before any caller sees the database.
+    """
+
+    def __init__(self, path: str, size: int = SQLITE_POOL_SIZE,
+                 setup: Optional[Callable[[sqlite3.Connection], None]] = None):
+        self.path = path
+        self.size = size
+        self.setup = setup
+        self.initialized = setup is None
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+
+    def _acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                try:
+                    conn = _connect(self.path)
+                    if not self.initialized:
+                        try:
+                            self.setup(conn)
+                            conn.commit()
+                        except BaseException:
+                            conn.close()
+                            raise
+                        self.initialized = True
+                    return conn
+                except Exception:
+                    self._created -= 1
+                    raise
+        return self._idle.get()
+
+    @contextmanager
+    def connection(self):
+        conn = self._acquire()
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            self._idle.put(conn)
+
+    def close(self):
+        """Closes idle connections; the pool reopens them on next use."""
+        with self._lock:
+            while True:
+                try:
+                    conn = self._idle.get_nowait()
+                except queue.Empty:
+                    break
+                conn.close()
+                self._created -= 1
+
+
+class GroupCommitWriter:
+    """Background writer that batches single-row INSERTs into one transaction.
+
+    `submit()` returns a Future resolved with the new row id once the batch
+    containing it has committed, so callers keep read-your-writes semantics
+    while concurrent requests share one commit (and one WAL sync).
+    """
+
+    def __init__(self, pool: SQLitePool, sql: str, batch_size: int = LOG_WRITER_BATCH_SIZE,
+                 max_delay_ms: float = LOG_WRITER_MAX_DELAY_MS, name: str = "sqlite-writer"):
+        self.pool = pool
+        self.sql = sql
+        self.batch_size = batch_size
+        self.max_delay = max_delay_ms / 1000
+        self.name = name
+        self.batches = 0
+        self.rows = 0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, params: tuple) -> Future:
+        future = Future()
+        # Enqueue under the lock so a concurrent close() can't strand the item
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+            self._queue.put((params, future))
+        return future
+
+    def _run(self):
+        stop = False
+        while not stop:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            # Collect whatever else is queued (or arrives within the delay window)
+            while len(batch) < self.batch_size:
+                try:
+                    item = (self._queue.get(timeout=self.max_delay) if self.max_delay
+                            else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            self._write(batch)
+
+    def _write(self, batch):
+        try:
+            with self.pool.connection() as conn:
+                row_ids = [conn.execute(self.sql, params).lastrowid
+                           for params, _ in batch]
+        except Exception as e:
+            logger.error(f"{self.name}: batch of {len(batch)} failed: {e}")
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        self.batches += 1
+        self.rows += len(batch)
+        for (_, future), row_id in zip(batch, row_ids):
+            future.set_result(row_id)
+
+    def close(self, timeout: Optional[float] = None):
+        """Flushes everything queued so far and stops the writer thread.
+
+        A later `submit()` starts a fresh thread.
+        """
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                self._queue.put(None)
+                self._thread.join(timeout)
+            self._thread = None
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "rows": self.rows,
+            "avg_batch_size": self.rows / self.batches if self.batches else 0.0,
+            "pending": self._queue.qsize(),
+        }
@@ -0,0 +1,40 @@
+import os
+import json
+
+# Tenants (workspaces) each get their own Chroma collection and BM25 index
+DEFAULT_TENANT = "default"
+# Tenant ids become part of collection and file names: 1-48 letters, digits,
+# '_' or '-', starting and ending with a letter or digit
+TENANT_ID_PATTERN = r"^[A-Za-z0-9](?:[A-Za-z0-9_-]{0,46}[A-Za-z0-9])?$"
+# The default tenant keeps the collection everything was indexed into before tenants existed
+DEFAULT_COLLECTION = "langchain"
+
+# HNSW parameters for new collections. M (max_neighbors) and construction ef are
+# fixed when a collection is created; search ef is also applied to existing ones.
+CHROMA_HNSW_M = int(os.getenv("CHROMA_HNSW_M", "16"))
+CHROMA_HNSW_CONSTRUCTION_EF = int(os.getenv("CHROMA_HNSW_CONSTRUCTION_EF", "100"))
+CHROMA_HNSW_SEARCH_EF = int(os.getenv("CHROMA_HNSW_SEARCH_EF", "100"))
+# Per-tenant overrides, e.g. '{"big-customer": {"M": 32, "search_ef": 200}}'
+CHROMA_HNSW_OVERRIDES = json.loads(os.getenv("CHROMA_HNSW_OVERRIDES", "{}"))
+
+
+def collection_name(tenant_id: str) -> str:
+    return DEFAULT_COLLECTION if tenant_id == DEFAULT_TENANT else f"tenant_{tenant_id}"
+
+
+def lexical_index_path(tenant_id: str, base_path: str) -> str:
+    """BM25 database of a tenant: `base_path` itself for the default tenant,
+    e.g. bm25_index.acme.db for the others."""
+    if tenant_id == DEFAULT_TENANT:
+        return base_path
+    root, ext = os.path.splitext(base_path)
+    return f"{root}.{tenant_id}{ext}"
+
+
+def hnsw_configuration(tenant_id: str) -> dict:
+    """Chroma `hnsw` collection configuration for a tenant's shard."""
+    overrides = CHROMA_HNSW_OVERRIDES.get(tenant_id, {})
+    return {"space": "l2",
+            "max_neighbors": int(overrides.get("M", CHROMA_HNSW_M)),
+            "ef_construction": int(overrides.get("construction_ef", CHROMA_HNSW_CONSTRUCTION_EF)),
+            "ef_search": int(overrides.get("search_ef", CHROMA_HNSW_SEARCH_EF))}
@@ -1,5 +1,18 @@
+import uuid
 from fastapi.testclient import TestClient
-from main import app
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from main import app, chat_session_limiter, RateLimited
+from rephrase_utils import needs_rephrase, is_cacheable_question
+from api import chroma_utils
+from api.answer_cache import SemanticAnswerCache, answer_cache
+from api.context_utils import pack_context, CONTEXT_SEPARATOR
+from api.db_utils import (
+    insert_application_logs, get_chat_history, get_turns_to_summarize, update_session_summary
+)
+from api.history_utils import SessionHistoryCache, select_window, HISTORY_TOKEN_BUDGET
+from api.sqlite_pool import SQLitePool, GroupCommitWriter
+from api.token_utils import count_tokens
 
 client = TestClient(app)
 
@@ -8,4 +21,234 @@ def test_read_main():
     # Tests if the server is alive
     response = client.get("/list-docs")
     assert response.status_code == 200
-#
+
+
+def test_list_docs_revalidates_with_etag():
+    params = {"limit": 10, "search": "report"}
+    response = client.get("/list-docs", params=params)
+    assert "documents" in response.json()
+    etag = response.headers["ETag"]
+    assert client.get("/list-docs", params=params, headers={"If-None-Match": etag}).status_code == 304
+    # Another page or search is a different listing
+    assert client.get("/list-docs", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_unknown_ingestion_job():
+    response = client.get("/jobs/does-not-exist")
+    assert response.status_code == 404
+
+
+def test_cache_stats():
+    response = client.get("/cache-stats")
+    assert response.status_code == 200
+    assert "hits" in response.json()["embedding_cache"]
+
+
+def test_chat_rejects_invalid_k():
+    response = client.post("/chat", json={"question": "hi", "k": 0})
+    assert response.status_code == 422
+
+
+def test_healthz():
+    response = client.get("/healthz")
+    assert response.status_code == 200
+    assert response.json() == {"status": "ok"}
+
+
+def test_list_docs_rejects_invalid_tenant():
+    response = client.get("/list-docs", params={"tenant_id": "../other"})
+    assert response.status_code == 422
+
+
+def test_bulk_delete_reports_unknown_ids():
+    response = client.post("/delete-docs", json={"file_ids": [987654321]})
+    assert response.status_code == 200
+    assert response.json()["not_found"] == [987654321]
+
+
+def test_metrics_and_trace_id():
+    response = client.get("/metrics", headers={"X-Request-ID": "trace-123"})
+    assert response.status_code == 200
+    assert response.headers["X-Request-ID"] == "trace-123"
+    assert "rag_stage_duration_seconds" in response.text
+
+
+def test_chunked_upload_rejects_wrong_offset():
+    response = client.post("/uploads", json={"filename": "notes.pdf", "size": 10})
+    assert response.status_code == 201
+    upload_id = response.json()["upload_id"]
+    response = client.put(f"/uploads/{upload_id}", params={"offset": 5}, content=b"12345")
+    assert response.status_code == 409
+    assert client.delete(f"/uploads/{upload_id}").status_code == 200
+
+
+def test_admission_metrics_exposed():
+    response = client.get("/metrics")
+    assert 'admission_queue_depth{queue="chat"}' in response.text
+
+
+def test_chat_over_rate_limit_gets_429():
+    # Use up the session's token bucket without running the chain
+    try:
+        while True:
+            chat_session_limiter.acquire("test-rate-limited")
+    except RateLimited:
+        pass
+    response = client.post("/chat", json={"question": "hi", "session_id": "test-rate-limited"})
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+
+
+HISTORY = [HumanMessage("What is the travel policy for employees?"), AIMessage("Flights are booked ...")]
+
+
+def unrelated_embedding(text):
+    # Only the previous question maps to [1, 0], so nothing counts as a similar follow-up
+    return [1.0, 0.0] if text == HISTORY[0].content else [0.0, 1.0]
+
+
+def test_needs_rephrase_skips_standalone_questions():
+    for question in ("What is the policy that applies to contractors?", "Is there a refund limit?"):
+        assert needs_rephrase(question, HISTORY, unrelated_embedding) == (False, "standalone")
+    assert needs_rephrase("What does it cover?", [], unrelated_embedding) == (False, "no_history")
+
+
+def test_needs_rephrase_catches_follow_ups():
+    assert needs_rephrase("Does it cover contractors too?", HISTORY, unrelated_embedding)[0]
+    assert needs_rephrase("Why is that?", HISTORY, unrelated_embedding)[0]
+    assert needs_rephrase("And for managers?", HISTORY, unrelated_embedding) == (True, "continuation")
+    for question in ("Why?", "How much?", "Any exceptions?", "Tell me more"):
+        assert needs_rephrase(question, HISTORY, unrelated_embedding) == (True, "terse")
+
+
+def test_short_unrephrased_questions_skip_the_answer_cache():
+    assert not is_cacheable_question("Why?", rephrased=False)
+    assert is_cacheable_question("Why?", rephrased=True)
+    assert is_cacheable_question("What is the policy that applies to contractors?", rephrased=False)
+
+
+class RecordingEmbeddings:
+    """Stands in for the embedding model and records what it was asked to embed."""
+
+    def __init__(self):
+        self.embedded = []
+
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def embed_query(self, text):
+        return [float(len(text)), 1.0]
+
+
+def test_reindexing_a_revision_only_embeds_changed_chunks(monkeypatch):
+    embeddings = RecordingEmbeddings()
+    monkeypatch.setattr(chroma_utils, "_cached_embedding_function", embeddings)
+    monkeypatch.setattr(chroma_utils, "_vectorstores", {})
+    tenant_id, file_id = "test-revisions", 1
+    chroma_utils.delete_files_from_chroma([file_id], tenant_id)
+
+    def index(texts):
+        chunks = [Document(page_content=text) for text in texts]
+        monkeypatch.setattr(chroma_utils, "iter_document_chunks", lambda path: iter([(1, chunks)]))
+        progress = {}
+        assert chroma_utils.index_document_to_chroma("manual.pdf", file_id, "manual.pdf",
+                                                     progress.update, tenant_id)
+        return progress, set(chroma_utils.get_chunk_ids(file_id, tenant_id))
+
+    _, first_ids = index(["Scope of the policy.", "Refunds within 30 days.", "Contact support."])
+    embeddings.embedded.clear()
+    progress, second_ids = index(["Scope of the policy.", "Refunds within 14 days.", "Contact support."])
+    assert embeddings.embedded == ["Refunds within 14 days."]
+    assert (progress["chunks_embedded"], progress["chunks_unchanged"]) == (1, 2)
+    # The changed chunk replaces the stale one; the others keep their ids
+    assert len(second_ids) == 3 and len(first_ids & second_ids) == 2
+
+
+def test_answer_cache_drops_entries_of_changed_files():
+    cache = SemanticAnswerCache(threshold=0.9)
+    cache.store([1.0, 0.0], "model", "from file 1", [], [1])
+    cache.store([0.0, 1.0], "model", "from file 2", [], [2])
+    assert cache.lookup([1.0, 0.1], "model")["answer"] == "from file 1"
+    cache.invalidate_file_ids([1])
+    assert cache.lookup([1.0, 0.0], "model") is None
+    assert cache.lookup([0.0, 1.0], "model")["answer"] == "from file 2"
+
+
+def test_deleting_a_file_invalidates_its_cached_answers():
+    answer_cache.store([0.3, 0.2, 0.9], "test-model", "stale", [], [424242])
+    chroma_utils.delete_files_from_chroma([424242], "test-revisions")
+    assert answer_cache.lookup([0.3, 0.2, 0.9], "test-model") is None
+
+
+def test_history_window_keeps_the_newest_turns_within_budget():
+    turns = [(i, f"Question {i}: " + "word " * 50, "Answer " * 50) for i in range(1, 6)]
+    turn_cost = count_tokens(turns[0][1]) + count_tokens(turns[0][2])
+    assert select_window(turns, budget=2 * turn_cost) == turns[-2:]
+    # The latest turn is kept even when it alone is over budget
+    assert select_window(turns, budget=1) == turns[-1:]
+
+
+def test_session_history_cache_evicts_least_recent_and_appends_new_turns():
+    cache = SessionHistoryCache(max_sessions=2)
+    cache.put("a", [(1, "q1", "a1")], None, 0)
+    cache.put("b", [], None, 0)
+    assert cache.get("a")["turns"] == [(1, "q1", "a1")]
+    cache.put("c", [], None, 0)
+    assert cache.get("b") is None
+    cache.append_turn("a", (2, "q2", "a2"))
+    # Already read from the database by a concurrent load, so not added twice
+    cache.append_turn("a", (2, "q2", "a2"))
+    assert [turn[0] for turn in cache.get("a")["turns"]] == [1, 2]
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (2, 1)
+
+
+def test_rolling_summary_covers_turns_outside_the_window():
+    session_id = f"test-summary-{uuid.uuid4()}"
+    # Each turn alone is over the history budget, so only the latest is in the window
+    filler = "word " * (HISTORY_TOKEN_BUDGET * 4)
+    for i in range(4):
+        insert_application_logs(session_id, f"q{i} {filler}", f"a{i}", "test-model")
+    summary, turns = get_turns_to_summarize(session_id)
+    assert summary is None and [turn[2] for turn in turns] == ["a0", "a1", "a2"]
+    update_session_summary(session_id, "Asked about q0.", turns[0][0])
+    summary, turns = get_turns_to_summarize(session_id)
+    assert summary == "Asked about q0." and [turn[2] for turn in turns] == ["a1", "a2"]
+    messages = get_chat_history(session_id)
+    assert isinstance(messages[0], SystemMessage) and "Asked about q0." in messages[0].content
+    assert [message.content for message in messages[1:]][-1] == "a3" and len(messages) == 3
+
+
+def test_group_commit_batches_rows_and_flushes_on_close(tmp_path):
+    pool = SQLitePool(str(tmp_path / "logs.db"), setup=lambda conn: conn.execute(
+        "CREATE TABLE logs (id INTEGER PRIMARY KEY, value TEXT)"))
+    writer = GroupCommitWriter(pool, "INSERT INTO logs (value) VALUES (?)", max_delay_ms=50)
+    futures = [writer.submit((str(i),)) for i in range(20)]
+    writer.close()
+    # Everything queued before close() is committed by the time it returns
+    assert all(future.done() for future in futures)
+    assert sorted(future.result() for future in futures) == list(range(1, 21))
+    assert writer.stats()["rows"] == 20 and writer.stats()["batches"] < 20
+    with pool.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM logs").fetchone()[0] == 20
+    pool.close()
+
+
+def test_pack_context_merges_dedups_and_fits_the_budget():
+    first = " ".join(f"alpha{i}" for i in range(30))
+    # The next chunk of the same file, starting with the splitter's overlap
+    following = first[-60:] + " " + " ".join(f"beta{i}" for i in range(10))
+    near_duplicate = first + " gamma"
+    too_large = " ".join(f"delta{i}" for i in range(400))
+    small = "epsilon zeta eta"
+    docs = [Document(page_content=first, metadata={"file_id": 1}),
+            Document(page_content=following, metadata={"file_id": 1}),
+            Document(page_content=near_duplicate, metadata={"file_id": 2}),
+            Document(page_content=too_large, metadata={"file_id": 3}),
+            Document(page_content=small, metadata={"file_id": 4})]
+    merged = first + following[60:]
+    budget = count_tokens(merged) + count_tokens(CONTEXT_SEPARATOR) + count_tokens(small)
+    packed = pack_context(docs, top_n=5, budget=budget)
+    assert [doc.page_content for doc in packed] == [merged, small]
+    # The best chunk is kept even when it alone is over budget
+    assert pack_context(docs[3:], top_n=5, budget=1)[0].page_content == too_large
@@ -0,0 +1,94 @@
+import os
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Local Hugging Face tokenizer used for budgets; the embedding model's tokenizer
+# is already in the local cache, so no extra download is needed
+TOKENIZER_NAME = os.getenv(
+    "TOKENIZER_NAME", "sentence-transformers/all-MiniLM-L6-v2")
+# Seconds before retrying a failed tokenizer load, doubled after each failure up to the max
+TOKENIZER_RETRY_SECONDS = float(os.getenv("TOKENIZER_RETRY_SECONDS", "30"))
+TOKENIZER_RETRY_MAX_SECONDS = float(os.getenv("TOKENIZER_RETRY_MAX_SECONDS", "900"))
+
+# Held while a load is in progress; counting never waits on it
+_lock = threading.Lock()
+_tokenizer = None
+_tokenizer_unavailable = False
+_failures = 0
+_retry_at = 0.0
+_approximation_logged = False
+
+
+def _load(local_files_only: bool):
+    global _tokenizer, _tokenizer_unavailable, _failures, _retry_at, _approximation_logged
+    # Only one thread loads; the others count with the estimate meanwhile
+    if _tokenizer is not None or not _lock.acquire(blocking=False):
+        return _tokenizer
+    try:
+        from tokenizers import Tokenizer
+        if local_files_only:
+            from huggingface_hub import hf_hub_download
+            tokenizer = Tokenizer.from_file(
+                hf_hub_download(TOKENIZER_NAME, "tokenizer.json", local_files_only=True))
+        else:
+            tokenizer = Tokenizer.from_pretrained(TOKENIZER_NAME)
+        # Budgets need the full length, not the embedding model's 256-token cut
+        tokenizer.no_truncation()
+        tokenizer.no_padding()
+        _tokenizer = tokenizer
+        _tokenizer_unavailable = False
+        if _failures:
+            logger.info(f"Tokenizer {TOKENIZER_NAME} loaded after {_failures} failed attempts")
+    except Exception as e:
+        delay = min(TOKENIZER_RETRY_SECONDS * 2 ** _failures, TOKENIZER_RETRY_MAX_SECONDS)
+        _failures += 1
+        _retry_at = time.monotonic() + delay
+        _tokenizer_unavailable = True
+        _approximation_logged = False
+        logger.warning(
+            f"Tokenizer {TOKENIZER_NAME} unavailable, retrying in {delay:.0f}s: {str(e)}")
+    finally:
+        _lock.release()
+    return _tokenizer
+
+
+def load_tokenizer():
+    """Loads the tokenizer, downloading it if it isn't cached (run by the warm-up)."""
+    return _load(local_files_only=False)
+
+
+def get_tokenizer():
+    """Returns the tokenizer, or None if it isn't available. Called on the
+    request path, so it only ever reads the local cache (at most once per
+    backoff after a failure) and never waits on another thread's load."""
+    if _tokenizer is None and time.monotonic() >= _retry_at:
+        _load(local_files_only=True)
+    return _tokenizer
+
+
+def tokenizer_status() -> str:
+    if _tokenizer_unavailable:
+        return "unavailable"
+    return "loaded" if _tokenizer is not None else "not_loaded"
+
+
+def _log_approximation():
+    """Logs once per failed load (or before the first load) that token counts are estimated."""
+    global _approximation_logged
+    if not _approximation_logged:
+        _approximation_logged = True
+        logger.warning("Estimating token counts as ~4 characters per token until the tokenizer loads")
+
+
+def count_tokens(text: str) -> int:
+    """Token count from the local tokenizer (~4 characters per token until it has loaded)."""
+    if not text:
+        return 0
+    tokenizer = get_tokenizer()
+    if tokenizer is None:
+        _log_approximation()
+        return max(1, len(text) // 4)
+    return len(tokenizer.encode(text, add_special_tokens=False).ids)
@@ -0,0 +1,205 @@
+import os
+import uuid
+import asyncio
+import hashlib
+import threading
+from contextlib import contextmanager
+from typing import AsyncIterator, Optional
+from api.db_utils import (
+    insert_upload_session, get_upload_session, delete_upload_session, get_expired_upload_sessions
+)
+from api.ingestion_utils import (
+    UPLOAD_DIR, MAX_UPLOAD_BYTES, UploadTooLarge, IngestionQueueFull, enqueue_file, upload_path
+)
+from api.tenant_utils import DEFAULT_TENANT
+
+# Chunk size suggested to clients of the chunked upload API
+UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", str(8 * 1024 * 1024)))
+# Uploads receiving data at once; beyond this, requests get a 503 and retry later
+MAX_CONCURRENT_UPLOADS = int(os.getenv("MAX_CONCURRENT_UPLOADS", "8"))
+# Chunked uploads never completed are discarded after this many hours
+UPLOAD_SESSION_TTL_HOURS = int(os.getenv("UPLOAD_SESSION_TTL_HOURS", "24"))
+_WRITE_BUFFER_SIZE = 1024 * 1024
+
+_lock = threading.Lock()
+_receiving = set()
+# Running sha256 per chunked upload with the byte count it covers, so completing
+# doesn't re-read the file; lost on restart, in which case the file is hashed once
+_hashers = {}
+
+
+class UploadsBusy(RuntimeError):
+    """Raised when MAX_CONCURRENT_UPLOADS uploads are already receiving data."""
+
+
+class UploadConflict(RuntimeError):
+    """Raised when a chunk doesn't continue the upload where it stands, or the
+    upload is already being written by another request."""
+
+    def __init__(self, message: str, offset: Optional[int] = None):
+        super().__init__(message)
+        self.offset = offset
+
+
+@contextmanager
+def upload_slot(upload_id: Optional[str] = None, counted: bool = True):
+    """Holds one of the MAX_CONCURRENT_UPLOADS slots (unless `counted` is False)
+    and, for a chunked upload, exclusive access to it."""
+    key = upload_id or uuid.uuid4().hex
+    with _lock:
+        if key in _receiving:
+            raise UploadConflict("Another request is writing to this upload.")
+        if counted and len(_receiving) >= MAX_CONCURRENT_UPLOADS:
+            raise UploadsBusy(f"{MAX_CONCURRENT_UPLOADS} uploads are already in progress.")
+        _receiving.add(key)
+    try:
+        yield
+    finally:
+        with _lock:
+            _receiving.discard(key)
+
+
+def _part_path(upload_id: str) -> str:
+    return os.path.join(UPLOAD_DIR, f"{upload_id}.part")
+
+
+def _received(upload_id: str) -> int:
+    part = _part_path(upload_id)
+    return os.path.getsize(part) if os.path.exists(part) else 0
+
+
+def _status(session: dict) -> dict:
+    return {"upload_id": session['id'], "filename": session['filename'],
+            "tenant_id": session['tenant_id'], "size": session['size'],
+            "offset": _received(session['id']), "chunk_size": UPLOAD_CHUNK_BYTES}
+
+
+def create_upload_session(filename: str, size: int, tenant_id: str = DEFAULT_TENANT) -> dict:
+    """Starts a chunked upload of `size` bytes; the data is appended to a .part
+    file in UPLOAD_DIR, which becomes the ingestion job's file once complete."""
+    if size > MAX_UPLOAD_BYTES:
+        raise UploadTooLarge()
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    upload_id = str(uuid.uuid4())
+    open(_part_path(upload_id), "wb").close()
+    insert_upload_session(upload_id, os.path.basename(filename), tenant_id, size)
+    return _status(get_upload_session(upload_id))
+
+
+def upload_status(upload_id: str) -> Optional[dict]:
+    session = get_upload_session(upload_id)
+    return _status(session) if session else None
+
+
+def _write(file, hasher, block):
+    file.write(block)
+    if hasher is not None:
+        hasher.update(block)
+
+
+async def append_chunk(upload_id: str, offset: int, stream: AsyncIterator[bytes]) -> Optional[dict]:
+    """Appends the bytes of `stream` to the upload, which must currently hold
+    exactly `offset` bytes. Data is written as it arrives, so an interrupted
+    chunk keeps what was received and the client resumes from the new offset.
+
+    Returns the upload's status, or None if it doesn't exist.
+    """
+    session = await asyncio.to_thread(get_upload_session, upload_id)
+    if session is None:
+        return None
+    with upload_slot(upload_id):
+        written = _received(upload_id)
+        if offset != written:
+            raise UploadConflict(f"Upload is at offset {written}, not {offset}.", offset=written)
+        hasher, hashed = _hashers.pop(upload_id, (None, None))
+        if hashed != written:
+            hasher = hashlib.sha256() if written == 0 else None
+        received = written
+        with open(_part_path(upload_id), "ab") as file:
+            buffer = bytearray()
+            try:
+                async for block in stream:
+                    received += len(block)
+                    if received > session['size']:
+                        # Drop this chunk entirely so the upload stays resumable
+                        file.truncate(offset)
+                        written, hasher = offset, None
+                        raise UploadConflict(
+                            f"Chunk runs past the declared size of {session['size']} bytes.", offset=offset)
+                    buffer += block
+                    if len(buffer) >= _WRITE_BUFFER_SIZE:
+                        block, buffer = buffer, bytearray()
+                        # Disk writes and hashing stay off the event loop
+                        await asyncio.to_thread(_write, file, hasher, block)
+                        written += len(block)
+                if buffer:
+                    await asyncio.to_thread(_write, file, hasher, buffer)
+                    written += len(buffer)
+            finally:
+                if hasher is not None:
+                    _hashers[upload_id] = (hasher, written)
+    return _status(session)
+
+
+def _hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        while block := file.read(_WRITE_BUFFER_SIZE):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def complete_upload(upload_id: str) -> Optional[dict]:
+    """Queues a fully received upload for indexing (see `enqueue_file`). The
+    .part file is renamed into the job's file, not copied.
+
+    Returns the `enqueue_file` result plus the filename, or None if the upload
+    doesn't exist. If the ingestion queue is full the upload is left as it
+    was, so completing can be retried.
+    """
+    session = get_upload_session(upload_id)
+    if session is None:
+        return None
+    with upload_slot(upload_id, counted=False):
+        received = _received(upload_id)
+        if received != session['size']:
+            raise UploadConflict(
+                f"Upload is incomplete: {received} of {session['size']} bytes received.", offset=received)
+        hasher, hashed = _hashers.pop(upload_id, (None, None))
+        content_hash = hasher.hexdigest() if hashed == received else _hash_file(_part_path(upload_id))
+        file_path = upload_path(upload_id, session['filename'])
+        os.replace(_part_path(upload_id), file_path)
+        try:
+            result = enqueue_file(upload_id, file_path, session['filename'], content_hash,
+                                  session['tenant_id'])
+        except IngestionQueueFull:
+            os.replace(file_path, _part_path(upload_id))
+            if hasher is not None:
+                _hashers[upload_id] = (hasher, hashed)
+            raise
+        delete_upload_session(upload_id)
+        return {**result, "filename": session['filename']}
+
+
+def abort_upload(upload_id: str) -> bool:
+    session = get_upload_session(upload_id)
+    if session is None:
+        return False
+    with upload_slot(upload_id, counted=False):
+        _discard(upload_id)
+    return True
+
+
+def _discard(upload_id: str):
+    _hashers.pop(upload_id, None)
+    if os.path.exists(_part_path(upload_id)):
+        os.remove(_part_path(upload_id))
+    delete_upload_session(upload_id)
+
+
+def expire_stale_uploads() -> int:
+    """Removes chunked uploads older than UPLOAD_SESSION_TTL_HOURS (run at startup)."""
+    sessions = get_expired_upload_sessions(UPLOAD_SESSION_TTL_HOURS)
+    for session in sessions:
+        _discard(session['id'])
+    return len(sessions)
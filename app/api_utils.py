@@ -1,15 +1,32 @@
 import requests
 import streamlit as st
 import os
+import json
+import time
 
 # Using a variable makes it easy to change if you deploy to a real server later
 BASE_URL = os.getenv("BACKEND_URL", "http://localhost:8000")
+# Attempts per chunk before an upload is given up
+UPLOAD_CHUNK_RETRIES = 3
+# Document list pages kept per browser session for revalidation
+DOCUMENT_PAGE_CACHE_SIZE = 20
+
+
+def current_tenant():
+    # Workspace chosen in the sidebar; each one has its own document collection
+    return st.session_state.get("tenant_id") or "default"
+
+
+def show_busy(response):
+    # 429 (rate limited) and 503 (overloaded) come with a Retry-After in seconds
+    st.warning(f"The server is busy, please try again in "
+               f"{response.headers.get('Retry-After', 'a few')} seconds.")
 
 
 def get_api_response(question, session_id, model):
     headers = {'accept': 'application/json',
                'Content-Type': 'application/json'}
-    payload = {"question": question, "model": model}
+    payload = {"question": question, "model": model, "tenant_id": current_tenant()}
     if session_id:
         payload["session_id"] = session_id
 
@@ -18,6 +35,9 @@ def get_api_response(question, session_id, model):
             f"{BASE_URL}/chat", headers=headers, json=payload)
         if response.status_code == 200:
             return response.json()
+        elif response.status_code in (429, 503):
+            show_busy(response)
+            return None
         else:
             st.error(f"Chat Error ({response.status_code}): {response.text}")
             return None
@@ -26,31 +46,151 @@ def get_api_response(question, session_id, model):
         return None
 
 
+def stream_api_response(question, session_id, model, metadata):
+    """Yields answer tokens from /chat/stream as they arrive.
+
+    Server-Sent Event metadata (session_id, model, sources) is written into the
+    `metadata` dict so the caller can use it once the stream is consumed.
+    """
+    payload = {"question": question, "model": model, "tenant_id": current_tenant()}
+    if session_id:
+        payload["session_id"] = session_id
+
+    try:
+        with requests.post(f"{BASE_URL}/chat/stream", json=payload, stream=True,
+                           headers={'accept': 'text/event-stream'}) as response:
+            if response.status_code in (429, 503):
+                show_busy(response)
+                return
+            if response.status_code != 200:
+                st.error(
+                    f"Chat Error ({response.status_code}): {response.text}")
+                return
+
+            event = None
+            for line in response.iter_lines(decode_unicode=True):
+                if line.startswith("event:"):
+                    event = line[len("event:"):].strip()
+                elif line.startswith("data:"):
+                    data = json.loads(line[len("data:"):])
+                    if event == "token":
+                        yield data["text"]
+                    elif event == "error":
+                        st.error(f"Chat Error: {data['detail']}")
+                        return
+                    else:
+                        metadata.update(data)
+    except Exception as e:
+        st.error(f"Connection Error: {str(e)}")
+
+
+def _send_chunks(upload, file):
+    """Sends the file in chunks starting from the upload's offset. After a
+    dropped connection or a 409/503, the offset is read back from the backend
+    and sending resumes from there."""
+    url = f"{BASE_URL}/uploads/{upload['upload_id']}"
+    offset, retries = upload['offset'], 0
+    while offset < upload['size']:
+        file.seek(offset)
+        try:
+            response = requests.put(url, params={"offset": offset},
+                                    data=file.read(upload['chunk_size']))
+        except requests.ConnectionError:
+            response = None
+        if response is not None and response.status_code == 200:
+            offset, retries = response.json()['offset'], 0
+            continue
+        if response is not None and response.status_code not in (409, 503) \
+                and response.status_code < 500:
+            response.raise_for_status()
+        retries += 1
+        if retries > UPLOAD_CHUNK_RETRIES:
+            raise RuntimeError(f"gave up after {UPLOAD_CHUNK_RETRIES} retries")
+        if response is not None:
+            time.sleep(int(response.headers.get("Retry-After", "1")))
+        offset = requests.get(url).json()['offset']
+
+
+def _chunked_upload(file):
+    """Uploads one file through the chunked upload API; returns the response
+    of completing it (job_id, file_id, duplicate), or None if it was refused."""
+    response = requests.post(f"{BASE_URL}/uploads", json={
+        "filename": file.name, "size": file.size, "tenant_id": current_tenant()})
+    if response.status_code != 201:
+        st.error(f"Upload of {file.name} failed: {response.text}")
+        return None
+    upload = response.json()
+    _send_chunks(upload, file)
+    response = requests.post(f"{BASE_URL}/uploads/{upload['upload_id']}/complete")
+    if response.status_code == 202:
+        return response.json()
+    st.error(f"Upload of {file.name} failed: {response.text}")
+    return None
+
+
 def upload_document(file):
     try:
-        files = {"file": (file.name, file, file.type)}
-        response = requests.post(f"{BASE_URL}/upload-doc", files=files)
+        return _chunked_upload(file)
+    except Exception as e:
+        st.error(f"Upload Error: {str(e)}")
+        return None
+
+
+def upload_documents(files):
+    # One chunked upload per file, so a large batch never has to fit in one request
+    result = {"job_ids": [], "duplicates": {}, "rejected": []}
+    for file in files:
+        response = upload_document(file)
+        if response is None:
+            result["rejected"].append(file.name)
+        elif response['duplicate']:
+            result["duplicates"][file.name] = response['file_id']
+        else:
+            result["job_ids"].append(response['job_id'])
+    return result
+
+
+def get_job_status(job_id):
+    try:
+        response = requests.get(f"{BASE_URL}/jobs/{job_id}")
         if response.status_code == 200:
             return response.json()
         else:
-            st.error(f"Upload failed: {response.text}")
             return None
     except Exception as e:
-        st.error(f"Upload Error: {str(e)}")
+        st.error(f"Job Status Error: {str(e)}")
         return None
 
 
-def list_documents():
+def list_documents(cursor=None, search=None, limit=50):
+    """One page of documents ({"documents", "next_cursor"}). Pages already
+    fetched are revalidated with their ETag, so unchanged ones aren't re-sent."""
+    params = {"tenant_id": current_tenant(), "limit": limit}
+    if cursor:
+        params["cursor"] = cursor
+    if search:
+        params["search"] = search
+    cache = st.session_state.setdefault("document_pages", {})
+    key = tuple(sorted(params.items()))
+    cached = cache.get(key)
     try:
-        response = requests.get(f"{BASE_URL}/list-docs")
+        response = requests.get(f"{BASE_URL}/list-docs", params=params,
+                                headers={"If-None-Match": cached[0]} if cached else {})
+        if response.status_code == 304:
+            return cached[1]
         if response.status_code == 200:
-            return response.json()
+            page = response.json()
+            if response.headers.get("ETag"):
+                if len(cache) >= DOCUMENT_PAGE_CACHE_SIZE:
+                    cache.pop(next(iter(cache)))
+                cache[key] = (response.headers["ETag"], page)
+            return page
         else:
             st.error("Could not fetch document list.")
-            return []
+            return {"documents": [], "next_cursor": None}
     except Exception as e:
         st.error(f"List Error: {str(e)}")
-        return []
+        return {"documents": [], "next_cursor": None}
 
 
 def delete_document(file_id):
@@ -58,7 +198,23 @@ def delete_document(file_id):
                'Content-Type': 'application/json'}
     try:
         response = requests.post(
-            f"{BASE_URL}/delete-doc", headers=headers, json={"file_id": file_id})
+            f"{BASE_URL}/delete-doc", headers=headers,
+            json={"file_id": file_id, "tenant_id": current_tenant()})
+        if response.status_code == 200:
+            return response.json()
+        else:
+            st.error(f"Delete failed: {response.text}")
+            return None
+    except Exception as e:
+        st.error(f"Delete Error: {str(e)}")
+        return None
+
+
+def delete_documents(file_ids):
+    try:
+        response = requests.post(
+            f"{BASE_URL}/delete-docs",
+            json={"file_ids": file_ids, "tenant_id": current_tenant()})
         if response.status_code == 200:
             return response.json()
         else:
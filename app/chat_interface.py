@@ -1,5 +1,5 @@
 import streamlit as st
-from api_utils import get_api_response
+from api_utils import stream_api_response
 
 
 def display_chat_interface():
@@ -15,31 +15,35 @@ def display_chat_interface():
         with st.chat_message("user"):
             st.markdown(prompt)
 
-        # 3. Generate response from the FastAPI backend
-        with st.spinner("Generating response (Groq/Llama-3.3)..."):
-            response = get_api_response(
-                prompt, st.session_state.session_id, st.session_state.model)
+        # 3. Stream the response from the FastAPI backend token by token
+        with st.chat_message("assistant"):
+            metadata = {}
+            answer = st.write_stream(stream_api_response(
+                prompt, st.session_state.session_id, st.session_state.model, metadata))
 
-            if response:
+            if answer and metadata.get('session_id'):
                 # Update session state with the backend response
-                st.session_state.session_id = response.get('session_id')
+                st.session_state.session_id = metadata['session_id']
                 st.session_state.messages.append(
-                    {"role": "assistant", "content": response['answer']})
+                    {"role": "assistant", "content": answer})
 
-                # Display the assistant's message
-                with st.chat_message("assistant"):
-                    st.markdown(response['answer'])
+                # 4. ADDED: Traceability Expander (from reference project)
+                with st.expander("Details & Metadata"):
+                    st.subheader("Final Answer")
+                    st.code(answer)
 
-                    # 4. ADDED: Traceability Expander (from reference project)
-                    with st.expander("Details & Metadata"):
-                        st.subheader("Final Answer")
-                        st.code(response['answer'])
+                    st.subheader("Sources")
+                    st.info(", ".join(metadata.get('sources') or []) or "None")
 
-                        st.subheader("Model Configuration")
-                        st.info(f"Using: {response['model']}")
+                    st.subheader("Model Configuration")
+                    st.info(f"Using: {metadata.get('model')}")
+                    st.caption(
+                        f"Question rephrasing: {metadata.get('rephrase_path')}")
+                    st.caption(
+                        f"Context tokens: {metadata.get('context_tokens')}")
 
-                        st.subheader("Session Tracking")
-                        st.info(f"ID: {response['session_id']}")
+                    st.subheader("Session Tracking")
+                    st.info(f"ID: {metadata['session_id']}")
             else:
                 # Error handling if the API is unreachable
                 st.error(
@@ -1,5 +1,5 @@
 import streamlit as st
-from api_utils import upload_document, list_documents, delete_document
+from api_utils import upload_document, upload_documents, list_documents, delete_documents, get_job_status
 
 
 def display_sidebar():
@@ -8,57 +8,108 @@ def display_sidebar():
     # We use your Llama model instead of GPT-4
     model_options = ["llama-3.3-70b-versatile"]
     st.sidebar.selectbox("Select Model", options=model_options, key="model")
+    # Documents are uploaded to, searched in and listed from this workspace only
+    st.sidebar.text_input("Workspace", value="default", key="tenant_id",
+                          on_change=lambda: st.session_state.pop("document_cursors", None))
 
     # 2. Upload Document Section (With Spinner and Success Messages)
     st.sidebar.header("Upload Document")
-    uploaded_file = st.sidebar.file_uploader(
-        "Choose a file", type=["pdf", "docx"])
+    uploaded_files = st.sidebar.file_uploader(
+        "Choose files", type=["pdf", "docx"], accept_multiple_files=True)
 
-    if uploaded_file is not None:
+    if uploaded_files:
         if st.sidebar.button("Upload & Index"):
             with st.spinner("Processing document..."):
-                upload_response = upload_document(uploaded_file)
-                if upload_response:
+                if len(uploaded_files) == 1:
+                    upload_response = upload_document(uploaded_files[0])
+                    job_ids = [upload_response['job_id']] if upload_response and upload_response['job_id'] else []
+                    duplicates = {uploaded_files[0].name: upload_response['file_id']} \
+                        if upload_response and upload_response['duplicate'] else {}
+                else:
+                    # Each file goes up as its own chunked upload; the queued jobs are parsed in parallel
+                    upload_response = upload_documents(uploaded_files)
+                    job_ids = upload_response['job_ids'] if upload_response else []
+                    duplicates = upload_response['duplicates'] if upload_response else {}
+                    for name in (upload_response or {}).get('rejected', []):
+                        st.sidebar.warning(f"File '{name}' was not queued.")
+                for name, file_id in duplicates.items():
+                    st.sidebar.info(
+                        f"File '{name}' is already indexed (ID: {file_id}).")
+                if job_ids:
                     st.sidebar.success(
-                        f"File '{uploaded_file.name}' indexed successfully!")
-                    # Refresh the document list automatically after upload
-                    st.session_state.documents = list_documents()
+                        f"{len(job_ids)} file(s) queued for indexing.")
+                    st.session_state.setdefault("pending_jobs", []).extend(job_ids)
 
-    # 3. Document List Section
-    st.sidebar.header("Uploaded Documents")
-    if st.sidebar.button("Refresh Document List"):
-        with st.spinner("Refreshing..."):
-            st.session_state.documents = list_documents()
-
-    # Initialize document list in session state if not already there
-    if "documents" not in st.session_state:
-        st.session_state.documents = list_documents()
+    # Background ingestion progress (jobs are polled on every rerun until they finish)
+    if st.session_state.get("pending_jobs"):
+        st.sidebar.subheader("Indexing Progress")
+        still_pending = []
+        for job_id in st.session_state.pending_jobs:
+            job = get_job_status(job_id)
+            if job is None:
+                continue
+            if job['status'] == "completed":
+                st.sidebar.success(f"'{job['filename']}' indexed.")
+            elif job['status'] == "failed":
+                st.sidebar.error(f"'{job['filename']}' failed: {job['error']}")
+            elif job['status'] == "cancelled":
+                st.sidebar.warning(f"'{job['filename']}' was deleted before indexing finished.")
+            else:
+                total = job['chunks_total'] or 0
+                done = (job['chunks_embedded'] or 0) + (job.get('chunks_unchanged') or 0)
+                st.sidebar.progress(
+                    done / total if total else 0.0,
+                    text=f"{job['filename']}: {job['stage']} ({done}/{total} chunks)")
+                still_pending.append(job_id)
+        st.session_state.pending_jobs = still_pending
+        if still_pending and st.sidebar.button("Refresh Progress"):
+            st.rerun()
 
-    documents = st.session_state.documents
+    # 3. Document List Section (fetched on every rerun; unchanged pages come back as a cheap 304)
+    st.sidebar.header("Uploaded Documents")
+    search = st.sidebar.text_input("Search documents", key="document_search",
+                                   on_change=lambda: st.session_state.pop("document_cursors", None))
+    # Cursors of the pages visited so far; the last one is the page shown
+    cursors = st.session_state.setdefault("document_cursors", [None])
+    page = list_documents(cursors[-1], search)
+    documents = page['documents']
 
     if documents:
-        # Display each document currently in the system
+        # Display each document on this page
         for doc in documents:
             # We show the filename and ID so the user knows what is indexed
-            st.sidebar.text(f" {doc['filename']} (ID: {doc['id']})")
+            details = f"ID: {doc['id']}"
+            if doc.get('file_size'):
+                details += f", {doc['file_size'] / 1e6:.1f} MB"
+            if doc.get('chunk_count') is not None:
+                details += f", {doc['chunk_count']} chunks"
+            st.sidebar.text(f" {doc['filename']} ({details})")
+
+        previous_column, next_column = st.sidebar.columns(2)
+        if len(cursors) > 1 and previous_column.button("Previous"):
+            cursors.pop()
+            st.rerun()
+        if page['next_cursor'] and next_column.button("Next"):
+            cursors.append(page['next_cursor'])
+            st.rerun()
 
         # 4. Delete Document Section (Critical for management)
-        st.sidebar.subheader("Delete Document")
+        st.sidebar.subheader("Delete Documents")
 
-        # Create a dropdown to select which file to delete by its ID
-        selected_file_id = st.sidebar.selectbox(
-            "Select file to remove",
-            options=[doc['id'] for doc in documents],
-            format_func=lambda x: next(doc['filename']
-                                       for doc in documents if doc['id'] == x)
-        )
+        # Several files can be removed in one request
+        filenames = {doc['id']: doc['filename'] for doc in documents}
+        selected_file_ids = st.sidebar.multiselect(
+            "Select files to remove", options=list(filenames), format_func=filenames.get)
 
-        if st.sidebar.button("Delete Selected Document"):
+        if selected_file_ids and st.sidebar.button("Delete Selected Documents"):
             with st.spinner("Deleting from system..."):
-                delete_response = delete_document(selected_file_id)
-                # Note: Even if delete_response is an empty dict, we refresh on success
-                st.sidebar.success(f"Document {selected_file_id} removed.")
-                st.session_state.documents = list_documents()  # Refresh list after deletion
+                delete_response = delete_documents(selected_file_ids)
+                if delete_response:
+                    st.sidebar.success(delete_response['message'])
                 st.rerun()  # Refresh the whole UI to clear deleted items
+    elif len(cursors) > 1:
+        # Everything on this page was deleted; go back one
+        cursors.pop()
+        st.rerun()
     else:
-        st.sidebar.info("No documents uploaded yet.")
+        st.sidebar.info("No documents match the search." if search else "No documents uploaded yet.")
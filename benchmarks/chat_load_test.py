@@ -0,0 +1,130 @@
+"""Concurrency load test for the /chat path, fully offline.
+
+The Groq client is replaced by `StubChatModel` (fixed latency) and the retriever by a
+static one, so the numbers isolate the request-handling model: the async
+`/chat` endpoint versus a sync reference endpoint that reproduces the old
+threadpool-bound implementation. With a 1 s stub latency the sync endpoint
+needs ~ceil(users / 40) s (Starlette's threadpool has 40 threads), while the
+async endpoint should stay close to 1 s regardless of concurrency.
+
+Run from the repository root:
+
+    python -m benchmarks.chat_load_test --users 10,40,100,200 --latency 1.0
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.stub_llm import StubChatModel  # noqa: E402
+
+
+def load_app(latency: float, max_users: int):
+    """Imports the API inside a scratch directory with the LLM and retriever stubbed."""
+    os.chdir(tempfile.mkdtemp(prefix="rag-loadtest-"))
+    # The stub retriever returns one fixed chunk, so there is nothing to rerank
+    os.environ.setdefault("RERANK_ENABLED", "false")
+    # Questions repeat across levels and endpoints, so cache hits would skip the stub LLM;
+    # the semantic cache would also need the embedding model, which is unavailable offline
+    os.environ.setdefault("ANSWER_CACHE_ENABLED", "false")
+    # Every simulated user comes from the same address, and the request-handling model
+    # is what's measured, so rate limits are off and admission control never queues
+    os.environ.setdefault("CHAT_CLIENT_RATE_PER_MINUTE", "0")
+    os.environ.setdefault("CHAT_SESSION_RATE_PER_MINUTE", "0")
+    os.environ.setdefault("CHAT_MAX_CONCURRENCY", str(max_users + 1))
+    os.environ.setdefault("CHAT_QUEUE_SIZE", str(max_users + 1))
+    from langchain_core.documents import Document
+    from langchain_core.runnables import RunnableLambda
+    import api.langchain_utils as langchain_utils
+    from api import main
+    from api.db_utils import get_chat_history, insert_application_logs
+    from api.pydantic_models import QueryInput
+
+    langchain_utils.get_llm = lambda model: StubChatModel(
+        model_name=model, latency=latency)
+    docs = [Document(page_content="Stub context for load testing.",
+                     metadata={"filename": "stub.pdf"})]
+
+    async def aretrieve(_, **kwargs):
+        return docs
+    stub_retriever = RunnableLambda(lambda _, **kwargs: docs, afunc=aretrieve)
+    langchain_utils.get_retriever = lambda tenant_ids=None: stub_retriever
+
+    # Reference endpoint mirroring the original sync implementation
+    @main.app.post("/chat-sync-baseline")
+    def chat_sync_baseline(query_input: QueryInput):
+        session_id = query_input.session_id or "baseline"
+        result = langchain_utils.get_rag_chain(query_input.model.value).invoke({
+            "input": query_input.question,
+            "chat_history": get_chat_history(session_id)
+        })
+        insert_application_logs(session_id, query_input.question,
+                                result["answer"], query_input.model.value)
+        return {"answer": result["answer"]}
+
+    return main.app
+
+
+async def run_level(app, path: str, users: int) -> dict:
+    import httpx
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as client:
+        async def one(i):
+            start = time.perf_counter()
+            # Fresh sessions so every request is a single (non-rephrased) LLM call
+            response = await client.post(path, json={"question": f"question {i}",
+                                                     "session_id": f"{path}-{users}-{i}"})
+            response.raise_for_status()
+            return time.perf_counter() - start
+
+        start = time.perf_counter()
+        latencies = sorted(await asyncio.gather(*(one(i) for i in range(users))))
+        wall = time.perf_counter() - start
+
+    return {
+        "endpoint": path,
+        "users": users,
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(users / wall, 2),
+        "p50_s": round(latencies[len(latencies) // 2], 3),
+        "max_s": round(latencies[-1], 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", default="10,40,100,200",
+                        help="Comma-separated concurrency levels")
+    parser.add_argument("--latency", type=float, default=1.0,
+                        help="Stub LLM latency per call (seconds)")
+    parser.add_argument("--mode", choices=["async", "sync", "both"], default="both")
+    parser.add_argument("--json", help="Optional path to write results as JSON")
+    args = parser.parse_args()
+    json_path = os.path.abspath(args.json) if args.json else None
+
+    levels = [int(level) for level in args.users.split(",")]
+    app = load_app(args.latency, max(levels))
+    paths = {"async": ["/chat"], "sync": ["/chat-sync-baseline"],
+             "both": ["/chat-sync-baseline", "/chat"]}[args.mode]
+
+    results = []
+    for users in levels:
+        for path in paths:
+            result = asyncio.run(run_level(app, path, users))
+            results.append(result)
+            print(f"{path:<22} users={users:<5} wall={result['wall_s']:>7}s "
+                  f"rps={result['throughput_rps']:>8} p50={result['p50_s']}s max={result['max_s']}s")
+
+    if json_path:
+        with open(json_path, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
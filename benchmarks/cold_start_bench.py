@@ -0,0 +1,100 @@
+"""Cold start of the API: import time, startup time, time to ready and RSS.
+
+Each run starts a fresh interpreter in an empty scratch directory, imports
+`api.main`, enters the FastAPI lifespan and polls /readyz, once per
+WARMUP_MODE. "blocking" matches the old eager start (every model loaded
+before the first request is served); "background" opens the port first;
+"off" leaves loading to the first request, whose retrieval latency is
+reported as the price of skipping the warm-up. RSS is the process peak.
+
+Run from the repository root:
+
+    python -m benchmarks.cold_start_bench --modes off,background,blocking --runs 3
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import statistics
+import subprocess
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+METRICS = ["import_s", "import_rss_mb", "startup_s", "ready_s", "first_retrieval_ms", "peak_rss_mb"]
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def child(timeout: float):
+    """Runs inside the fresh interpreter and prints one JSON line of timings."""
+    start = time.perf_counter()
+    import api.main
+    result = {"import_s": time.perf_counter() - start, "import_rss_mb": peak_rss_mb()}
+
+    from fastapi.testclient import TestClient
+    from api.langchain_utils import retrieve_documents
+    with TestClient(api.main.app) as client:
+        result["startup_s"] = time.perf_counter() - start
+        while client.get("/readyz").status_code != 200:
+            if time.perf_counter() - start > timeout:
+                break
+            time.sleep(0.05)
+        result["ready_s"] = time.perf_counter() - start
+        request_start = time.perf_counter()
+        retrieve_documents("how long does a cold start take", {})
+        result["first_retrieval_ms"] = (time.perf_counter() - request_start) * 1000
+        result["peak_rss_mb"] = peak_rss_mb()
+    print(json.dumps(result))
+
+
+def run_once(mode: str, timeout: float) -> dict:
+    env = dict(os.environ, WARMUP_MODE=mode,
+               PYTHONPATH=os.pathsep.join(filter(None, [REPO_ROOT, os.environ.get("PYTHONPATH")])))
+    completed = subprocess.run(
+        [sys.executable, "-m", "benchmarks.cold_start_bench", "--child", "--timeout", str(timeout)],
+        cwd=tempfile.mkdtemp(prefix="rag-coldstart-"), env=env, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"{mode} run failed:\n{completed.stderr[-2000:]}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modes", default="off,background,blocking",
+                        help="comma-separated WARMUP_MODE values")
+    parser.add_argument("--runs", type=int, default=3, help="fresh processes per mode (median reported)")
+    parser.add_argument("--timeout", type=float, default=300, help="seconds to wait for /readyz")
+    parser.add_argument("--json", action="store_true", help="print raw JSON results")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.timeout)
+        return
+
+    results = {}
+    for mode in args.modes.split(","):
+        runs = [run_once(mode, args.timeout) for _ in range(args.runs)]
+        results[mode] = {metric: round(statistics.median(run[metric] for run in runs), 2)
+                         for metric in METRICS}
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"median of {args.runs} fresh processes per mode")
+    print(f"{'mode':>10} {'import s':>9} {'import RSS MB':>14} {'startup s':>10} {'ready s':>8} "
+          f"{'1st retrieval ms':>17} {'peak RSS MB':>12}")
+    for mode, row in results.items():
+        print(f"{mode:>10} {row['import_s']:>9} {row['import_rss_mb']:>14} {row['startup_s']:>10} "
+              f"{row['ready_s']:>8} {row['first_retrieval_ms']:>17} {row['peak_rss_mb']:>12}")
+
+
+if __name__ == "__main__":
+    main()
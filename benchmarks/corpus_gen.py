@@ -0,0 +1,135 @@
+"""Synthetic PDF/DOCX corpus for benchmarks, written with the standard library only.
+
+Documents are filled with the seeded look-alike passages of
+`benchmarks.retrieval_bench.build_corpus` (part spec sheets, contract
+clauses, staff entries), so every document comes with questions whose answer
+is in it. PDFs are minimal multi-page PDF 1.4 files with Helvetica text, and
+DOCX files hold one paragraph per passage; both parse with the loaders the
+API uses.
+
+Run from the repository root:
+
+    python -m benchmarks.corpus_gen --out /tmp/corpus --documents 20 --passages 80
+"""
+import os
+import sys
+import json
+import random
+import zipfile
+import argparse
+import textwrap
+from typing import List, Tuple
+from xml.sax.saxutils import escape
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.retrieval_bench import build_corpus  # noqa: E402
+
+PDF_LINES_PER_PAGE = 60
+PDF_LINE_WIDTH = 95
+# build_corpus draws its names from 100 combinations, for a third of the passages
+MAX_PASSAGES = 250
+
+
+def _pdf_text(line: str) -> str:
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path: str, paragraphs: List[str]):
+    lines = []
+    for paragraph in paragraphs:
+        lines.extend(textwrap.wrap(paragraph, PDF_LINE_WIDTH) + [""])
+    pages = [lines[start:start + PDF_LINES_PER_PAGE]
+             for start in range(0, len(lines), PDF_LINES_PER_PAGE)] or [[]]
+
+    # Objects: 1 catalog, 2 page tree, 3 font, then a page and its content stream per page
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None,
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for page in pages:
+        text = "".join(f"({_pdf_text(line)}) Tj T*\n" for line in page)
+        stream = f"BT /F1 10 Tf 12 TL 50 770 Td\n{text}ET".encode("latin-1", "replace")
+        kids.append(f"{len(objects) + 1} 0 R")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects) + 2} 0 R >>".encode())
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(pages)} >>".encode()
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def write_docx(path: str, paragraphs: List[str]):
+    body = "".join(f"<w:p><w:r><w:t>{escape(paragraph)}</w:t></w:r></w:p>" for paragraph in paragraphs)
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as docx:
+        docx.writestr("[Content_Types].xml", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/word/document.xml" ContentType="application/'
+            'vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/></Types>'))
+        docx.writestr("_rels/.rels", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/'
+            'relationships/officeDocument" Target="word/document.xml"/></Relationships>'))
+        docx.writestr("word/document.xml", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+            f'<w:body>{body}</w:body></w:document>'))
+
+
+def generate_corpus(directory: str, documents: int, passages: int = 80, pdf_ratio: float = 0.5,
+                    seed: int = 7) -> Tuple[List[str], List[str]]:
+    """Writes `documents` files of `passages` passages each into `directory`.
+
+    Returns (paths, questions): one question per passage, in passage order.
+    Identifiers are unique within a document but may repeat across documents.
+    """
+    if passages > MAX_PASSAGES:
+        raise ValueError(f"At most {MAX_PASSAGES} passages per document")
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(seed)
+    paths, questions = [], []
+    for n in range(documents):
+        texts, queries = build_corpus(passages, seed + n)
+        paragraphs = [text for _, text in texts]
+        questions.extend(question for question, _ in queries)
+        if rng.random() < pdf_ratio:
+            path = os.path.join(directory, f"doc-{n:04d}.pdf")
+            write_pdf(path, paragraphs)
+        else:
+            path = os.path.join(directory, f"doc-{n:04d}.docx")
+            write_docx(path, paragraphs)
+        paths.append(path)
+    return paths, questions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--out", required=True, help="directory to write the documents into")
+    parser.add_argument("--documents", type=int, default=20)
+    parser.add_argument("--passages", type=int, default=80, help="passages per document")
+    parser.add_argument("--pdf-ratio", type=float, default=0.5, help="share of documents written as PDF")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    paths, questions = generate_corpus(args.out, args.documents, args.passages, args.pdf_ratio, args.seed)
+    with open(os.path.join(args.out, "questions.json"), "w") as f:
+        json.dump(questions, f, indent=2)
+    print(f"wrote {len(paths)} documents and {len(questions)} questions to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
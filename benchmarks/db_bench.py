@@ -0,0 +1,123 @@
+"""Micro-benchmark for the SQLite chat-log path: inserts/sec and history reads/sec.
+
+"before" reproduces the old access pattern (a fresh `sqlite3.connect` per call,
+default rollback journal, one commit per row); "after" goes through
+`api.db_utils` (pooled WAL connections, group-commit log writer). History
+reads bypass the in-memory session cache so both sides hit SQLite.
+
+Run from the repository root:
+
+    python -m benchmarks.db_bench --threads 1,8,32 --ops 2000
+"""
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+SESSIONS = 50
+LEGACY_DB = "legacy.db"
+
+
+def legacy_setup():
+    conn = sqlite3.connect(LEGACY_DB)
+    conn.execute('''CREATE TABLE IF NOT EXISTS application_logs
+                    (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                     session_id TEXT, user_query TEXT, gpt_response TEXT,
+                     model TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+    conn.execute(
+        'CREATE INDEX IF NOT EXISTS idx_application_logs_session ON application_logs (session_id, created_at)')
+    conn.commit()
+    conn.close()
+
+
+def legacy_insert(session_id, user_query, gpt_response, model):
+    conn = sqlite3.connect(LEGACY_DB)
+    conn.execute('INSERT INTO application_logs (session_id, user_query, gpt_response, model) VALUES (?, ?, ?, ?)',
+                 (session_id, user_query, gpt_response, model))
+    conn.commit()
+    conn.close()
+
+
+def legacy_read(session_id):
+    conn = sqlite3.connect(LEGACY_DB)
+    conn.row_factory = sqlite3.Row
+    rows = conn.execute('SELECT id, user_query, gpt_response FROM application_logs WHERE session_id = ? ORDER BY created_at DESC, id DESC LIMIT 20',
+                        (session_id,)).fetchall()
+    conn.close()
+    return rows
+
+
+def timed(fn, ops: int, threads: int) -> dict:
+    """Runs `fn(i)` for i in range(ops) on `threads` threads; failures are counted."""
+    errors = 0
+
+    def run(i):
+        nonlocal errors
+        try:
+            fn(i)
+        except sqlite3.OperationalError:
+            errors += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(run, range(ops)))
+    elapsed = time.perf_counter() - started
+    return {"ops_per_sec": round(ops / elapsed, 1), "errors": errors}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", default="1,8,32",
+                        help="comma-separated thread counts")
+    parser.add_argument("--ops", type=int, default=2000,
+                        help="operations per measurement")
+    parser.add_argument("--json", action="store_true",
+                        help="print raw JSON results")
+    args = parser.parse_args()
+
+    os.chdir(tempfile.mkdtemp(prefix="rag-dbbench-"))
+    from api import db_utils
+
+    legacy_setup()
+    answer = "x" * 400
+
+    def after_read(i):
+        db_utils._load_session(f"s{i % SESSIONS}")
+
+    results = []
+    for threads in [int(n) for n in args.threads.split(",")]:
+        row = {"threads": threads}
+        row["insert_before"] = timed(lambda i: legacy_insert(
+            f"s{i % SESSIONS}", f"q{i}", answer, "bench"), args.ops, threads)
+        row["insert_after"] = timed(lambda i: db_utils.insert_application_logs(
+            f"s{i % SESSIONS}", f"q{i}", answer, "bench"), args.ops, threads)
+        row["read_before"] = timed(
+            lambda i: legacy_read(f"s{i % SESSIONS}"), args.ops, threads)
+        row["read_after"] = timed(after_read, args.ops, threads)
+        results.append(row)
+    writer_stats = db_utils.log_writer.stats()
+    db_utils.close_db()
+
+    if args.json:
+        print(json.dumps({"results": results, "log_writer": writer_stats}, indent=2))
+        return
+    print(f"{'threads':>7} {'insert/s before':>16} {'insert/s after':>15} "
+          f"{'read/s before':>14} {'read/s after':>13} {'errors':>7}")
+    for row in results:
+        errors = sum(row[key]["errors"] for key in row if key != "threads")
+        print(f"{row['threads']:>7} {row['insert_before']['ops_per_sec']:>16} "
+              f"{row['insert_after']['ops_per_sec']:>15} {row['read_before']['ops_per_sec']:>14} "
+              f"{row['read_after']['ops_per_sec']:>13} {errors:>7}")
+    print(f"log writer: {writer_stats['batches']} commits for {writer_stats['rows']} rows "
+          f"(avg batch {writer_stats['avg_batch_size']:.1f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""End-to-end benchmark: ingestion throughput and /chat latency under concurrent sessions, offline.
+
+Generates a synthetic PDF/DOCX corpus (`benchmarks.corpus_gen`), uploads it
+through /upload-docs and waits for the ingestion jobs, then runs scripted
+chat sessions against /chat at each concurrency level: every user keeps one
+session and asks `--turns` questions about the corpus in a row, so later
+turns carry history. Groq is replaced by `StubChatModel` (`--latency` before
+the first token, then `--token-rate` tokens/s); parsing, embeddings, Chroma,
+BM25, reranking and SQLite are the ones the API is configured with. The app
+runs in-process over ASGI, so peak RSS covers the whole stack.
+
+Results are written as JSON (`--output`) together with the git commit and
+the API settings from the environment; `--compare` prints the change against
+an earlier result file.
+
+Run from the repository root:
+
+    python -m benchmarks.e2e_bench --documents 20 --users 1,8,32 --turns 3 --output e2e.json
+"""
+import os
+import sys
+import json
+import math
+import time
+import asyncio
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime, timezone
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.cold_start_bench import peak_rss_mb  # noqa: E402
+from benchmarks.corpus_gen import generate_corpus  # noqa: E402
+from benchmarks.stub_llm import StubChatModel  # noqa: E402
+
+# Environment variables recorded with the results, so runs under different settings aren't confused
+SETTING_PREFIXES = ("ANSWER_CACHE", "CHAT_", "CHROMA_", "CONTEXT_", "EMBED", "HISTORY_", "INGEST_", "LLM_",
+                    "PARSE_", "REPHRASE_", "RERANK_", "RETRIEVAL_", "RRF_", "SQLITE_", "UPLOAD_", "WARMUP_")
+# Files sent per /upload-docs request
+UPLOAD_BATCH = 8
+
+
+def load_app(latency: float, token_rate: float, answer_tokens: int):
+    """Imports the API inside a scratch directory with Groq replaced by the stub."""
+    os.chdir(tempfile.mkdtemp(prefix="rag-e2e-"))
+    # Models are loaded before the first request, so chat latencies don't include them
+    os.environ.setdefault("WARMUP_MODE", "blocking")
+    # Every simulated user comes from the same address, so per-client limits are off by default
+    for setting in ("CHAT_CLIENT_RATE_PER_MINUTE", "CHAT_SESSION_RATE_PER_MINUTE", "UPLOAD_CLIENT_RATE_PER_MINUTE"):
+        os.environ.setdefault(setting, "0")
+    import api.langchain_utils as langchain_utils
+    from api import main
+
+    langchain_utils.get_llm = lambda model: StubChatModel(
+        model_name=model, latency=latency, tokens_per_second=token_rate, answer_tokens=answer_tokens)
+    return main.app
+
+
+def percentile(values, pct: float) -> float:
+    """Nearest-rank percentile of sorted `values`."""
+    return values[max(0, math.ceil(pct / 100 * len(values)) - 1)]
+
+
+async def ingest(client, paths) -> dict:
+    """Uploads every file and waits until all ingestion jobs are done."""
+    queue, jobs, chunks = list(paths), {}, 0
+    start = time.perf_counter()
+    while queue or jobs:
+        if queue:
+            batch, queue = queue[:UPLOAD_BATCH], queue[UPLOAD_BATCH:]
+            files = [("files", (os.path.basename(path), open(path, "rb"))) for path in batch]
+            response = await client.post("/upload-docs", files=files)
+            for _, (_, handle) in files:
+                handle.close()
+            if response.status_code in (429, 503):
+                # Rate limited or ingestion queue full: try the batch again once jobs finish
+                queue = batch + queue
+            else:
+                response.raise_for_status()
+                body = response.json()
+                jobs.update(dict.fromkeys(body["job_ids"]))
+                queue = [path for path in batch if os.path.basename(path) in body["rejected"]] + queue
+        for job_id in list(jobs):
+            job = (await client.get(f"/jobs/{job_id}")).json()
+            if job["status"] == "failed":
+                raise RuntimeError(f"Ingestion of {job['filename']} failed: {job['error']}")
+            if job["status"] == "completed":
+                chunks += job["chunks_total"] or 0
+            if job["status"] not in ("queued", "running"):
+                # Finished; a cancelled job's document was deleted while indexing and adds no chunks
+                del jobs[job_id]
+        await asyncio.sleep(0.05)
+    wall = time.perf_counter() - start
+    return {"documents": len(paths), "chunks": chunks, "wall_s": round(wall, 2),
+            "chunks_per_sec": round(chunks / wall, 1), "docs_per_sec": round(len(paths) / wall, 2)}
+
+
+async def run_level(client, users: int, turns: int, questions, offset: int) -> dict:
+    async def session(user):
+        latencies = []
+        for turn in range(turns):
+            question = questions[(offset + user * turns + turn) % len(questions)]
+            start = time.perf_counter()
+            response = await client.post("/chat", json={"question": question,
+                                                        "session_id": f"bench-{users}-{user}"})
+            response.raise_for_status()
+            latencies.append((time.perf_counter() - start) * 1000)
+        return latencies
+
+    start = time.perf_counter()
+    per_user = await asyncio.gather(*(session(user) for user in range(users)))
+    wall = time.perf_counter() - start
+    latencies = sorted(latency for session_latencies in per_user for latency in session_latencies)
+    return {
+        "users": users,
+        "requests": len(latencies),
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(len(latencies) / wall, 2),
+        "p50_ms": round(percentile(latencies, 50), 1),
+        "p95_ms": round(percentile(latencies, 95), 1),
+        "p99_ms": round(percentile(latencies, 99), 1),
+        "max_ms": round(latencies[-1], 1),
+    }
+
+
+async def run(args) -> dict:
+    import httpx
+    app = load_app(args.latency, args.token_rate, args.answer_tokens)
+    paths, questions = generate_corpus("corpus", args.documents, args.passages, args.pdf_ratio, args.seed)
+    results = {}
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as client:
+            results["ingestion"] = await ingest(client, paths)
+            results["ingestion"]["peak_rss_mb"] = peak_rss_mb()
+            results["chat"], offset = [], 0
+            for users in (int(level) for level in args.users.split(",")):
+                results["chat"].append(await run_level(client, users, args.turns, questions, offset))
+                offset += users * args.turns
+            results["cache_stats"] = (await client.get("/cache-stats")).json()
+    results["peak_rss_mb"] = peak_rss_mb()
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(old: dict, new: dict):
+    """Prints each headline metric of `old` next to `new` with the relative change."""
+    rows = [("ingestion chunks/s", old["ingestion"]["chunks_per_sec"], new["ingestion"]["chunks_per_sec"]),
+            ("peak RSS MB", old["peak_rss_mb"], new["peak_rss_mb"])]
+    old_levels = {level["users"]: level for level in old["chat"]}
+    for level in new["chat"]:
+        before = old_levels.get(level["users"])
+        if before:
+            for metric in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms"):
+                rows.append((f"{level['users']} users {metric}", before[metric], level[metric]))
+    print(f"\ncompared with {old['meta'].get('git_commit')} ({old['meta']['timestamp']})")
+    print(f"{'metric':<28} {'before':>10} {'after':>10} {'change':>8}")
+    for name, before, after in rows:
+        change = f"{(after - before) / before * 100:+.1f}%" if before else "-"
+        print(f"{name:<28} {before:>10} {after:>10} {change:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--documents", type=int, default=20, help="synthetic documents to ingest")
+    parser.add_argument("--passages", type=int, default=80, help="passages per document")
+    parser.add_argument("--pdf-ratio", type=float, default=0.5, help="share of documents written as PDF")
+    parser.add_argument("--users", default="1,8,32", help="comma-separated concurrent chat sessions")
+    parser.add_argument("--turns", type=int, default=3, help="questions asked per session")
+    parser.add_argument("--latency", type=float, default=0.5, help="stub LLM time to first token (seconds)")
+    parser.add_argument("--token-rate", type=float, default=200.0, help="stub LLM tokens/s (0 = instant)")
+    parser.add_argument("--answer-tokens", type=int, default=60, help="tokens per stub answer")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="path to write the results as JSON")
+    parser.add_argument("--compare", help="earlier JSON result to compare against")
+    args = parser.parse_args()
+    output = os.path.abspath(args.output) if args.output else None
+    baseline = os.path.abspath(args.compare) if args.compare else None
+
+    meta = {"timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_commit": git_commit(), "python": platform.python_version(),
+            "platform": platform.platform(), "cpus": os.cpu_count(),
+            "args": {name: value for name, value in vars(args).items() if name not in ("output", "compare")},
+            "settings": {name: value for name, value in sorted(os.environ.items())
+                         if name.startswith(SETTING_PREFIXES)}}
+    results = {"meta": meta, **asyncio.run(run(args))}
+
+    ingestion = results["ingestion"]
+    print(f"ingestion: {ingestion['documents']} documents, {ingestion['chunks']} chunks in "
+          f"{ingestion['wall_s']}s = {ingestion['chunks_per_sec']} chunks/s")
+    print(f"{'users':>6} {'requests':>9} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for level in results["chat"]:
+        print(f"{level['users']:>6} {level['requests']:>9} {level['throughput_rps']:>8} {level['p50_ms']:>9} "
+              f"{level['p95_ms']:>9} {level['p99_ms']:>9} {level['max_ms']:>9}")
+    print(f"peak RSS: {results['peak_rss_mb']} MB")
+
+    if output:
+        with open(output, "w") as f:
+            json.dump(results, f, indent=2)
+    if baseline:
+        with open(baseline) as f:
+            compare(json.load(f), results)
+
+
+if __name__ == "__main__":
+    main()
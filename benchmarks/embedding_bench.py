@@ -0,0 +1,102 @@
+"""Throughput, latency and cosine drift of the ONNX embedding backend vs. PyTorch.
+
+Embeds the same chunk-sized texts with both backends from
+`api.embedding_backends` (no cache in front) and reports documents/sec,
+single-query latency and the cosine similarity between the two backends'
+vectors for each text (1.0 = identical). Options map onto the
+EMBEDDING_* environment variables the API reads.
+
+Run from the repository root:
+
+    python -m benchmarks.embedding_bench --texts 512 --batch-size 32 --threads 4
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import statistics
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.retrieval_bench import build_corpus  # noqa: E402
+
+
+def make_texts(count: int, seed: int = 11):
+    """Fixture passages joined into chunks of mixed length (one to eight passages)."""
+    rng = random.Random(seed)
+    passages = [text for _, text in build_corpus(max(count, 50), seed)[0]]
+    return [" ".join(rng.sample(passages, rng.randint(1, 8))) for _ in range(count)]
+
+
+def measure(embeddings, texts, queries):
+    embeddings.embed_documents(texts[:8])  # warm-up
+    start = time.perf_counter()
+    vectors = embeddings.embed_documents(texts)
+    throughput = len(texts) / (time.perf_counter() - start)
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        embeddings.embed_query(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return vectors, {
+        "docs_per_sec": round(throughput, 1),
+        "query_p50_ms": round(statistics.median(latencies), 2),
+        "query_p95_ms": round(latencies[int(len(latencies) * 0.95) - 1], 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--texts", type=int, default=512, help="documents to embed")
+    parser.add_argument("--queries", type=int, default=100, help="single queries to time")
+    parser.add_argument("--batch-size", type=int, help="EMBEDDING_BATCH_SIZE")
+    parser.add_argument("--threads", type=int, help="EMBEDDING_THREADS")
+    parser.add_argument("--onnx-file", help="EMBEDDING_ONNX_FILE (path inside the model repo)")
+    parser.add_argument("--onnx-path", help="EMBEDDING_ONNX_PATH (local model directory or file)")
+    parser.add_argument("--json", action="store_true", help="print raw JSON results")
+    args = parser.parse_args()
+
+    for option, variable in [("batch_size", "EMBEDDING_BATCH_SIZE"), ("threads", "EMBEDDING_THREADS"),
+                             ("onnx_file", "EMBEDDING_ONNX_FILE"), ("onnx_path", "EMBEDDING_ONNX_PATH")]:
+        if getattr(args, option) is not None:
+            os.environ[variable] = str(getattr(args, option))
+    import numpy as np
+    from api.embedding_backends import create_embeddings
+
+    texts = make_texts(args.texts)
+    queries = [question for question, _ in build_corpus(args.queries, seed=3)[1]]
+
+    results, vectors = {}, {}
+    for backend in ("torch", "onnx"):
+        embeddings, name = create_embeddings(backend)
+        vectors[backend], results[backend] = measure(embeddings, texts, queries)
+        results[backend]["model"] = name
+
+    cosines = np.sum(np.asarray(vectors["torch"]) * np.asarray(vectors["onnx"]), axis=1)
+    results["drift"] = {
+        "mean_cosine": round(float(cosines.mean()), 5),
+        "min_cosine": round(float(cosines.min()), 5),
+        "p1_cosine": round(float(np.percentile(cosines, 1)), 5),
+    }
+    results["speedup"] = round(results["onnx"]["docs_per_sec"] / results["torch"]["docs_per_sec"], 2)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{len(texts)} documents, {len(queries)} queries")
+    print(f"{'backend':>8} {'docs/s':>9} {'query p50 ms':>13} {'query p95 ms':>13}  model")
+    for backend in ("torch", "onnx"):
+        row = results[backend]
+        print(f"{backend:>8} {row['docs_per_sec']:>9} {row['query_p50_ms']:>13} "
+              f"{row['query_p95_ms']:>13}  {row['model']}")
+    drift = results["drift"]
+    print(f"onnx/torch throughput: {results['speedup']}x; cosine(torch, onnx) "
+          f"mean {drift['mean_cosine']}, p1 {drift['p1_cosine']}, min {drift['min_cosine']}")
+
+
+if __name__ == "__main__":
+    main()
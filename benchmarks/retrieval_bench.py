@@ -0,0 +1,141 @@
+"""Recall/latency benchmark for vector, lexical (BM25), hybrid and reranked retrieval.
+
+Builds a seeded fixture corpus of look-alike passages (part spec sheets,
+contract clauses, staff entries) that differ mainly in identifiers such as
+part numbers, clause ids and names, then asks one question per passage and
+checks whether that passage is retrieved. "hybrid+rerank" reranks
+RERANK_CANDIDATES hybrid candidates with the cross-encoder from
+`api.rerank_utils`. Everything runs in a scratch directory with the models
+configured in the API.
+
+Run from the repository root:
+
+    python -m benchmarks.retrieval_bench --k 1,2,5 --passages 100
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import statistics
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+MODES = ("vector", "lexical", "hybrid", "hybrid+rerank")
+MATERIALS = ["steel", "aluminium", "brass", "titanium", "nylon"]
+KINDS = ["flange coupling", "hex bolt", "bearing housing", "hydraulic valve", "drive shaft"]
+SUPPLIERS = ["Acme Industrial", "Northwind Parts", "Globex Supply", "Initech Metals"]
+PARTIES = ["Supplier", "Customer", "Contractor", "Licensee"]
+OBLIGATIONS = ["deliver a written notice", "return all confidential material",
+               "pay the outstanding invoice", "provide an audit report", "replace defective goods"]
+EVENTS = ["termination", "the delivery date", "a written request", "the end of each quarter"]
+FIRST = ["Alice", "Bruno", "Chen", "Dana", "Emeka", "Farah", "Goran", "Hana", "Ivan", "Jia"]
+LAST = ["Okafor", "Lindqvist", "Moreau", "Tanaka", "Novak", "Reyes", "Haddad", "Kowalski", "Singh", "Brennan"]
+DEPARTMENTS = ["procurement", "quality", "logistics", "finance", "safety"]
+CITIES = ["Leeds", "Lyon", "Osaka", "Porto", "Denver"]
+
+
+def build_corpus(passages: int, seed: int = 7):
+    """Returns (texts, queries): texts is [(chunk_id, text)], queries is [(question, chunk_id)]."""
+    rng = random.Random(seed)
+    texts, queries, used = [], [], set()
+
+    def unique(make):
+        while True:
+            value = make()
+            if value not in used:
+                used.add(value)
+                return value
+
+    for n in range(passages):
+        chunk_id = f"fixture-{n}"
+        kind = n % 3
+        if kind == 0:
+            part = unique(lambda: f"HX-{rng.randint(1000, 9999)}-{rng.choice('ABCDEF')}")
+            text = (f"Part {part} is a {rng.choice(MATERIALS)} {rng.choice(KINDS)} rated for "
+                    f"{rng.randint(20, 400)} Nm of torque and operating temperatures up to "
+                    f"{rng.randint(60, 250)} C. It is supplied by {rng.choice(SUPPLIERS)}.")
+            question = f"What torque is part {part} rated for?"
+        elif kind == 1:
+            clause = unique(lambda: f"{rng.randint(1, 12)}.{rng.randint(1, 9)}.{rng.randint(1, 9)}")
+            text = (f"Clause {clause}: The {rng.choice(PARTIES)} shall {rng.choice(OBLIGATIONS)} "
+                    f"within {rng.randint(5, 90)} days of {rng.choice(EVENTS)}.")
+            question = f"What does clause {clause} require?"
+        else:
+            name = unique(lambda: f"{rng.choice(FIRST)} {rng.choice(LAST)}")
+            text = (f"{name} leads the {rng.choice(DEPARTMENTS)} team in the {rng.choice(CITIES)} "
+                    f"office and approves purchase orders above {rng.randint(5, 50)}k EUR.")
+            question = f"Which team does {name} lead?"
+        texts.append((chunk_id, text))
+        queries.append((question, chunk_id))
+    return texts, queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--k", default="1,2,5", help="comma-separated k values")
+    parser.add_argument("--passages", type=int, default=150,
+                        help="fixture corpus size")
+    parser.add_argument("--json", action="store_true",
+                        help="print raw JSON results")
+    args = parser.parse_args()
+
+    os.chdir(tempfile.mkdtemp(prefix="rag-retrievalbench-"))
+    from langchain_core.documents import Document
+    from api.chroma_utils import get_vectorstore, get_lexical_index
+    from api.retrieval_utils import HybridRetriever, chunk_key
+    from api.rerank_utils import reranker, RERANK_CANDIDATES
+
+    vectorstore, lexical_index = get_vectorstore(), get_lexical_index()
+    texts, queries = build_corpus(args.passages)
+    docs = [Document(page_content=text, metadata={"file_id": 1, "chunk_id": chunk_id})
+            for chunk_id, text in texts]
+    vectorstore.add_documents(docs, ids=[chunk_id for chunk_id, _ in texts])
+    lexical_index.add_chunks(1, texts)
+    retriever = HybridRetriever(vectorstore=vectorstore, lexical_index=lexical_index)
+    reranker.warm_up()
+
+    def search(question, k, mode):
+        if mode != "hybrid+rerank":
+            return retriever.invoke(question, k=k, mode=mode), None
+        candidates = retriever.invoke(
+            question, k=max(RERANK_CANDIDATES, k), mode="hybrid")
+        reranked, status = reranker.rerank(question, candidates)
+        return reranked[:k], status
+
+    results = []
+    for k in [int(value) for value in args.k.split(",")]:
+        for mode in MODES:
+            hits, latencies, statuses = 0, [], set()
+            for question, expected in queries:
+                start = time.perf_counter()
+                found, status = search(question, k, mode)
+                latencies.append((time.perf_counter() - start) * 1000)
+                hits += expected in {chunk_key(doc) for doc in found}
+                if status:
+                    statuses.add(status)
+            latencies.sort()
+            results.append({
+                "k": k,
+                "mode": mode,
+                "recall": round(hits / len(queries), 3),
+                "p50_ms": round(statistics.median(latencies), 2),
+                "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1], 2),
+                "rerank": ",".join(sorted(statuses)) or None,
+            })
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{len(queries)} queries over {len(texts)} passages")
+    print(f"{'k':>3} {'mode':>14} {'recall':>7} {'p50 ms':>8} {'p95 ms':>8}  rerank")
+    for row in results:
+        print(f"{row['k']:>3} {row['mode']:>14} {row['recall']:>7} "
+              f"{row['p50_ms']:>8} {row['p95_ms']:>8}  {row['rerank'] or '-'}")
+
+
+if __name__ == "__main__":
+    main()